@@ -258,6 +258,11 @@ export function saveModel(model: {
   stmt.run(model);
 }
 
+export function deleteModel(model_id: string) {
+  const stmt = db.prepare('DELETE FROM models WHERE model_id = ?');
+  stmt.run(model_id);
+}
+
 export function getModels() {
   const stmt = db.prepare('SELECT * FROM models ORDER BY download_date DESC');
   return stmt.all();
@@ -16,6 +16,7 @@ import {
   getConversations,
   clearConversations,
   saveModel,
+  deleteModel,
   getModels,
   setActiveModel,
   getActiveModel,
@@ -189,51 +190,202 @@ app.whenReady().then(() => {
     return true;
   });
 
-  ipcMain.handle('start-host', (_event) => {
-    console.log("Starting Host...");
+  // Every python_bridge script writes NDJSON events (see python_bridge/bridge_events.py).
+  // Any other line is output a library or child process wrote to stdout directly.
+  interface BridgeEvent { v: number; seq: number; ts: number; type: string; data: any }
+
+  function parseBridgeEvent(message: string): BridgeEvent | null {
+    if (!message.startsWith('{')) return null;
+    try {
+      const event = JSON.parse(message);
+      return typeof event?.type === 'string' && typeof event?.seq === 'number' ? event : null;
+    } catch (e) {
+      return null;
+    }
+  }
+
+  // The log panel keeps the last 20 lines, so only the tail of a big relayed batch is sent to it
+  const LOG_PANEL_LINES = 20;
+
+  // Logs plain lines and 'log' events, and forwards the events every script may send:
+  // 'scheduler' (supervisor status) and 'parallax' (model_load, layer_allocation, throughput,
+  // node_join, node_leave, parsed out of Parallax's logs). Returns the event, if the line was one.
+  function routeBridgeOutput(message: string, label: string, logChannel: string | null): BridgeEvent | null {
+    const event = parseBridgeEvent(message);
+    let lines: string[] | null = null;
+    if (!event) {
+      lines = [message];
+    } else if (event.type === 'log') {
+      const prefix = event.data?.level === 'error' ? 'ERROR: ' : '';
+      lines = (event.data?.lines ?? []).map((line: string) => prefix + line);
+    } else if (event.type === 'scheduler') {
+      win?.webContents.send('scheduler-status', event.data);
+    } else if (event.type === 'parallax') {
+      win?.webContents.send('parallax-event', event.data);
+    }
+    if (lines) {
+      console.log(lines.map((line) => (label ? `${label}: ${line}` : line)).join('\n'));
+      if (logChannel) {
+        for (const line of lines.slice(-LOG_PANEL_LINES)) {
+          win?.webContents.send(logChannel, line);
+        }
+      }
+    }
+    return event;
+  }
 
-    let scriptPath = path.join(__dirname, '../python_bridge/host.py');
+  // A single bridge_daemon.py process hosts every Python service (host, client, discovery,
+  // voice, models), so each pays interpreter startup and its imports once. Requests are
+  // JSON-RPC lines on its stdin; replies come back as 'rpc' events and component state
+  // changes as 'service' events.
+  let bridge: PythonShell | null = null;
+  let bridgeRequestId = 0;
+  const pendingBridgeRequests = new Map<number, { resolve: (value: any) => void, reject: (err: Error) => void }>();
+  // Last reported state of each service ('starting', 'running', 'stopping', 'stopped', 'failed')
+  const serviceStates = new Map<string, string>();
+  // Sequence number of the daemon's last line, to spot missed ones
+  let lastBridgeSeq: number | null = null;
+  const serviceEndMessages: Record<string, string> = {
+    host: 'Host process terminated.',
+    client: 'Client process terminated.',
+    voice: 'Voice Assistant terminated.'
+  };
+
+  function handleServiceState(data: { service: string, state: string, error?: string }) {
+    serviceStates.set(data.service, data.state);
+    if (data.state === 'failed' && data.error) {
+      win?.webContents.send('log-update', `ERROR: ${data.service}: ${data.error}`);
+    }
+    if ((data.state === 'stopped' || data.state === 'failed') && serviceEndMessages[data.service]) {
+      win?.webContents.send('log-update', serviceEndMessages[data.service]);
+      if (data.service === 'voice') {
+        win?.webContents.send('state-update', 'IDLE');
+      }
+    }
+  }
+
+  const getBridge = (): PythonShell => {
+    if (bridge) {
+      return bridge;
+    }
+
+    let scriptPath = path.join(__dirname, '../python_bridge/bridge_daemon.py');
     if (app.isPackaged) {
-      scriptPath = path.join(process.resourcesPath, 'python_bridge/host.py');
+      scriptPath = path.join(process.resourcesPath, 'python_bridge/bridge_daemon.py');
     }
 
     // Use Parallax venv Python 3.12 for proper package support
     const pythonPath = findPythonPath();
-    console.log(`Using Python: ${pythonPath}`);
+    console.log(`Starting bridge daemon with Python: ${pythonPath}`);
 
-    let pyshell = new PythonShell(scriptPath, {
+    const daemon = new PythonShell(scriptPath, {
       mode: 'text',
       pythonPath: pythonPath,
-      pythonOptions: ['-u'], // get print results in real-time
-      args: ['--model', 'Qwen/Qwen3-0.6B']  // Use Qwen3 - smallest model supported by Parallax
+      pythonOptions: ['-u'] // get print results in real-time
     });
 
-    pyshell.on('message', function (message) {
-      // received a message sent from the Python script (a simple "print" statement)
-      console.log(message);
-      win?.webContents.send('log-update', message);
+    daemon.on('message', (message: string) => {
+      // Supervisor status (starting, live, ready, unhealthy, restarting, stopped) goes out as 'scheduler-status'
+      const event = routeBridgeOutput(message, '', 'log-update');
+      if (!event) return;
+
+      // Discovery only streams changes (a device's rapid updates coalesced into the latest);
+      // if a line went missing, ask for the full list
+      if (lastBridgeSeq !== null && event.seq !== lastBridgeSeq + 1 && serviceStates.get('discovery') === 'running') {
+        callBridge('discovery.snapshot').promise.catch((err) => {
+          console.error(`Could not request a discovery snapshot: ${err.message}`);
+        });
+      }
+      lastBridgeSeq = event.seq;
+
+      if (event.type === 'rpc') {
+        handleBridgeRpc(event.data);
+      } else if (event.type === 'service') {
+        handleServiceState(event.data);
+      } else if (event.type === 'voice.state') {
+        win?.webContents.send('state-update', event.data.state);
+      } else if (event.type.startsWith('discovery.')) {
+        win?.webContents.send('network-discovery-update', message);
+        handleDiscoveryEvent(event);
+      }
+    });
+
+    // Tracebacks from the interpreter itself; everything else arrives as events
+    daemon.on('stderr', (message: string) => {
+      console.log(`Bridge: ${message}`);
     });
 
-    pyshell.end(function (err) {
+    daemon.end((err) => {
       if (err) {
-        console.error('Python Host Error:', err);
+        console.error('Bridge Daemon Error:', err);
         win?.webContents.send('log-update', `ERROR: ${err.message}`);
       }
-      console.log('Python Host finished');
-      win?.webContents.send('log-update', 'Host process terminated.');
+      console.log('Bridge daemon finished');
+      for (const pending of pendingBridgeRequests.values()) {
+        pending.reject(new Error('Bridge daemon exited'));
+      }
+      pendingBridgeRequests.clear();
+      for (const [service, state] of serviceStates) {
+        if (state !== 'stopped' && state !== 'failed') {
+          handleServiceState({ service, state: 'stopped' });
+        }
+      }
+      serviceStates.clear();
+      bridge = null;
     });
 
+    bridge = daemon;
+    lastBridgeSeq = null;
+    if (modelPeers.size) {
+      // A restarted daemon starts without the peers discovery already found
+      callModelService('set_peers', { peers: [...modelPeers.values()] }).promise.catch((err) => {
+        console.error(`Could not update model download peers: ${err.message}`);
+      });
+    }
+    return daemon;
+  };
+
+  const callBridge = (method: string, params: Record<string, any> = {}) => {
+    const id = ++bridgeRequestId;
+    const promise = new Promise<any>((resolve, reject) => {
+      pendingBridgeRequests.set(id, { resolve, reject });
+    });
+    getBridge().send(JSON.stringify({ jsonrpc: '2.0', id, method, params }));
+    return { id, promise };
+  };
+
+  function handleBridgeRpc(data: any) {
+    if (data.method) {
+      handleModelNotification(data);
+    } else if (data.id !== undefined && pendingBridgeRequests.has(data.id)) {
+      const pending = pendingBridgeRequests.get(data.id)!;
+      pendingBridgeRequests.delete(data.id);
+      if (data.error) {
+        pending.reject(new Error(data.error.message));
+      } else {
+        pending.resolve(data.result);
+      }
+    } else if (data.error) {
+      console.error(`Bridge daemon error: ${data.error.message}`);
+    }
+  }
+
+  // Start a bridge service without waiting for it; failures land in the log panel
+  const startService = (service: string, options: Record<string, any> = {}) => {
+    callBridge('start', { service, options }).promise.catch((err) => {
+      win?.webContents.send('log-update', `ERROR: ${err.message}`);
+    });
+  };
+
+  ipcMain.handle('start-host', (_event) => {
+    console.log("Starting Host...");
+    // Use Qwen3 - smallest model supported by Parallax
+    startService('host', { model: 'Qwen/Qwen3-0.6B' });
     return "Host process initiated";
   });
 
   ipcMain.handle('start-client', (_event) => {
     console.log("Starting Client...");
-    let scriptPath = path.join(__dirname, '../python_bridge/client.py');
-    if (app.isPackaged) {
-      scriptPath = path.join(process.resourcesPath, 'python_bridge/client.py');
-    }
-    const pythonPath = findPythonPath();
-
     // For local network, no scheduler address needed (auto-discovery)
     // For remote, pass the scheduler peer ID from settings
     // OR use the PARALLAX_HOST env var if available (from run-client.sh)
@@ -269,46 +421,16 @@ app.whenReady().then(() => {
       }
     }
 
-    let pyshell = new PythonShell(scriptPath, {
-      mode: 'text',
-      pythonPath: pythonPath,
-      pythonOptions: ['-u'],
-      args: schedulerAddr ? ['--scheduler-addr', schedulerAddr] : []
-    });
-
-    pyshell.on('message', function (message) {
-      console.log(message);
-      win?.webContents.send('log-update', message);
-    });
-
-    pyshell.end(function (err) {
-      if (err) {
-        console.error('Python Client Error:', err);
-        win?.webContents.send('log-update', `ERROR: ${err.message}`);
-      }
-      console.log('Python Client finished');
-      win?.webContents.send('log-update', 'Client process terminated.');
-    });
+    if (schedulerAddr) {
+      schedulerAddr = fastestPathTo(schedulerAddr);
+    }
 
+    startService('client', { scheduler_addr: schedulerAddr || null });
     return "Client process initiated";
   });
 
   ipcMain.handle('start-voice', async (_event) => {
     console.log("Starting Voice Assistant...");
-
-    // Stop any existing voice assistant process
-    if (voiceAssistantProcess) {
-      try {
-        voiceAssistantProcess.kill();
-      } catch (e) { }
-      voiceAssistantProcess = null;
-    }
-
-    let scriptPath = path.join(__dirname, '../python_bridge/voice_assistant.py');
-    if (app.isPackaged) {
-      scriptPath = path.join(process.resourcesPath, 'python_bridge/voice_assistant.py');
-    }
-    const pythonPath = findPythonPath();
     const fs = require('fs');
 
     // Get personality settings from database
@@ -389,49 +511,22 @@ app.whenReady().then(() => {
     if (!parallaxHost) {
       parallaxHost = 'localhost';
     }
+    parallaxHost = fastestPathTo(parallaxHost);
 
-    console.log(`Voice Assistant using Python: ${pythonPath}`);
     console.log(`Voice Assistant connecting to Parallax at: ${parallaxHost}:3001`);
 
-    voiceAssistantProcess = new PythonShell(scriptPath, {
-      mode: 'text',
-      pythonPath: pythonPath,
-      pythonOptions: ['-u'],
-      args: ['--system-prompt', systemPrompt, '--name', assistantName],
-      env: {
-        ...process.env,
-        PARALLAX_HOST: parallaxHost
-      }
-    });
-
-    voiceAssistantProcess.on('message', function (message) {
-      console.log(message);
-      if (message.startsWith('STATE:')) {
-        win?.webContents.send('state-update', message.replace('STATE:', ''));
-      } else if (message.startsWith('LOG:')) {
-        win?.webContents.send('log-update', message.replace('LOG:', ''));
-      } else {
-        win?.webContents.send('log-update', message);
-      }
-    });
-
-    voiceAssistantProcess.end(function (err) {
-      if (err) {
-        console.error('Voice Assistant Error:', err);
-        win?.webContents.send('log-update', `ERROR: ${err.message}`);
-      }
-      win?.webContents.send('log-update', 'Voice Assistant terminated.');
-      win?.webContents.send('state-update', 'IDLE');
-      voiceAssistantProcess = null;
-    });
-
+    // Starting a running assistant restarts it with the new settings
+    startService('voice', { system_prompt: systemPrompt, name: assistantName, parallax_host: parallaxHost });
     return "Voice Assistant initiated";
   });
 
   ipcMain.handle('stop-voice', () => {
-    if (voiceAssistantProcess) {
-      voiceAssistantProcess.kill();
-      voiceAssistantProcess = null;
+    const state = serviceStates.get('voice');
+    if (state === 'starting' || state === 'running') {
+      // The assistant finishes its current utterance first, then reports 'stopped'
+      callBridge('stop', { service: 'voice' }).promise.catch((err) => {
+        console.error(`Could not stop the voice assistant: ${err.message}`);
+      });
       win?.webContents.send('log-update', 'Voice Assistant stopped.');
       win?.webContents.send('state-update', 'IDLE');
       return "Voice Assistant stopped";
@@ -443,73 +538,93 @@ app.whenReady().then(() => {
     app.quit();
   });
 
-  // Voice Assistant Process Tracking
-  let voiceAssistantProcess: PythonShell | null = null;
-
   // Network Discovery IPC Handlers
-  let networkDiscoveryProcess: PythonShell | null = null;
-
-  ipcMain.handle('start-network-discovery', (_event, deviceName, role, _personality, _model) => {
-    console.log("Starting Network Discovery...");
-    console.log(`  Device: ${deviceName}, Role: ${role}`);
-
-    // Stop any existing discovery process
-    if (networkDiscoveryProcess) {
-      try {
-        networkDiscoveryProcess.kill();
-      } catch (e) { }
-      networkDiscoveryProcess = null;
+  // Blob servers of discovered peers, keyed by device name; model downloads try these before Hugging Face
+  const modelPeers = new Map<string, string>();
+
+  // Latest discovery record per device, for picking the fastest path to a known host
+  const discoveredDevices = new Map<string, any>();
+
+  // Discovery probes every address a device advertises; use whichever it found fastest
+  function fastestPathTo(host: string): string {
+    for (const device of discoveredDevices.values()) {
+      if (device.status === 'online' && device.addresses?.includes(host) && device.address !== host) {
+        console.log(`Reaching ${host} via faster path ${device.address}`);
+        return device.address;
+      }
     }
+    return host;
+  }
 
-    let scriptPath = path.join(__dirname, '../python_bridge/network_discovery.py');
-    if (app.isPackaged) {
-      scriptPath = path.join(process.resourcesPath, 'python_bridge/network_discovery.py');
+  function applyDiscoveredDevice(data: any, present: boolean) {
+    if (present) {
+      discoveredDevices.set(data.name, data);
+    } else {
+      discoveredDevices.delete(data.name);
     }
+    const previousPeer = modelPeers.get(data.name);
+    // Peers remembered from the last run are listed at once but only used once confirmed
+    if (present && data.blob_port && data.status !== 'probable') {
+      const host = data.address.includes(':') ? `[${data.address}]` : data.address;
+      modelPeers.set(data.name, `http://${host}:${data.blob_port}`);
+    } else {
+      modelPeers.delete(data.name);
+    }
+    // Load updates re-announce the same record; only resend peers when one changed
+    if (previousPeer !== modelPeers.get(data.name)) {
+      callModelService('set_peers', { peers: [...modelPeers.values()] }).promise.catch((err) => {
+        console.error(`Could not update model download peers: ${err.message}`);
+      });
+    }
+    if (present) {
+      upsertDevice({
+        device_id: data.name,
+        name: data.name,
+        address: data.address,
+        port: data.port,
+        role: data.role,
+        status: data.status || 'online',
+        personality: data.personality,
+        model: data.model
+      });
+    } else {
+      updateDeviceStatus(data.name, 'offline');
+    }
+  }
 
-    // Use the same Python path as other scripts
-    const pythonPath = findPythonPath();
-    console.log(`  Using Python: ${pythonPath}`);
-
-    networkDiscoveryProcess = new PythonShell(scriptPath, {
-      mode: 'text',
-      pythonPath: pythonPath,
-      pythonOptions: ['-u'],
-      args: [deviceName || 'Spark', role || 'client']
-    });
-
-    networkDiscoveryProcess.on('message', function (message) {
-      console.log(`Network Discovery: ${message}`);
-      win?.webContents.send('network-discovery-update', message);
-
-      // Parse device updates and save to database
-      if (message.startsWith('FOUND:') || message.startsWith('LOST:')) {
-        try {
-          const jsonStart = message.indexOf('{');
-          if (jsonStart !== -1) {
-            const data = JSON.parse(message.substring(jsonStart));
-            if (message.startsWith('FOUND:')) {
-              upsertDevice({
-                device_id: data.name,
-                name: data.name,
-                address: data.address,
-                port: data.port,
-                role: data.role,
-                status: 'online',
-                personality: data.personality,
-                model: data.model
-              });
-            } else {
-              updateDeviceStatus(data.name, 'offline');
-            }
-            win?.webContents.send('devices-updated', getAllDevices());
+  function handleDiscoveryEvent(event: BridgeEvent) {
+    // Save device changes to the database
+    if (['discovery.probable', 'discovery.found', 'discovery.updated', 'discovery.lost'].includes(event.type)) {
+      applyDiscoveredDevice(event.data, event.type !== 'discovery.lost');
+      win?.webContents.send('devices-updated', getAllDevices());
+    } else if (event.type === 'discovery.snapshot') {
+      try {
+        const snapshot = event.data;
+        const listed = new Set<string>(snapshot.devices.map((d: any) => d.name));
+        for (const device of getAllDevices() as any[]) {
+          if (device.status !== 'offline' && !listed.has(device.device_id)) {
+            applyDiscoveredDevice({ name: device.device_id }, false);
           }
-        } catch (e) {
-          console.error('Error parsing network discovery message:', e);
         }
+        for (const device of snapshot.devices) {
+          applyDiscoveredDevice(device, true);
+        }
+        win?.webContents.send('devices-updated', getAllDevices());
+      } catch (e) {
+        console.error('Error parsing network discovery snapshot:', e);
       }
-    });
+    }
+  }
 
-    networkDiscoveryProcess.on('error', function (err) {
+  ipcMain.handle('start-network-discovery', (_event, deviceName, role, personality, model) => {
+    console.log("Starting Network Discovery...");
+    console.log(`  Device: ${deviceName}, Role: ${role}`);
+
+    // Starting it again restarts it under the new name and role
+    callBridge('start', {
+      service: 'discovery',
+      options: { device_name: deviceName || 'Spark', role: role || 'client', personality: personality || '', model: model || '' }
+    }).promise.catch((err) => {
       console.error('Network Discovery Error:', err);
     });
 
@@ -517,9 +632,10 @@ app.whenReady().then(() => {
   });
 
   ipcMain.handle('stop-network-discovery', () => {
-    if (networkDiscoveryProcess) {
-      networkDiscoveryProcess.kill();
-      networkDiscoveryProcess = null;
+    if (bridge) {
+      callBridge('stop', { service: 'discovery' }).promise.catch((err) => {
+        console.error(`Could not stop network discovery: ${err.message}`);
+      });
     }
     return "Network discovery stopped";
   });
@@ -533,79 +649,95 @@ app.whenReady().then(() => {
   });
 
   // Model Management IPC Handlers
-  let modelManagerProcess: PythonShell | null = null;
+  // The daemon's 'models' service answers these, starting on the first call,
+  // so repeat calls don't pay Python startup and Hugging Face imports again.
+  const formatBytes = (bytes: number) => `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+  const formatDuration = (seconds: number) => {
+    const s = Math.round(seconds);
+    return s >= 3600 ? `${Math.floor(s / 3600)}h ${Math.floor((s % 3600) / 60)}m`
+      : s >= 60 ? `${Math.floor(s / 60)}m ${s % 60}s` : `${s}s`;
+  };
 
-  ipcMain.handle('browse-models', async (_event, task = 'text-generation', limit = 20) => {
-    return new Promise((resolve, reject) => {
-      let scriptPath = path.join(__dirname, '../python_bridge/model_manager.py');
-      if (app.isPackaged) {
-        scriptPath = path.join(process.resourcesPath, 'python_bridge/model_manager.py');
+  // Notifications the model service sends without a request
+  function handleModelNotification(data: any) {
+    if (data.method === 'evicted') {
+      // The cache budget pushed this model out; keep our table in step
+      deleteModel(data.params.model_id);
+      win?.webContents.send('model-evicted', data.params.model_id);
+    } else if (data.method === 'progress') {
+      const p = data.params;
+      const percent = p.total_bytes ? ((p.downloaded_bytes / p.total_bytes) * 100).toFixed(1) : '0.0';
+      win?.webContents.send(
+        'model-download-progress',
+        `${percent}% - ${formatBytes(p.downloaded_bytes)} / ${formatBytes(p.total_bytes)} (${formatBytes(p.bytes_per_sec)}/s)`
+      );
+    } else if (data.method === 'queue_progress') {
+      const p = data.params;
+      const percent = p.total_bytes ? ((p.downloaded_bytes / p.total_bytes) * 100).toFixed(1) : '0.0';
+      const eta = p.eta_seconds != null ? `, ${formatDuration(p.eta_seconds)} left` : '';
+      win?.webContents.send(
+        'model-download-progress',
+        `${p.model_id}: ${percent}% - ${formatBytes(p.downloaded_bytes)} / ${formatBytes(p.total_bytes)} (${formatBytes(p.bytes_per_sec)}/s${eta})`
+      );
+    } else if (data.method === 'queue_update') {
+      const item = data.params;
+      if (item.status === 'done' && item.path) {
+        saveModel({
+          model_id: item.model_id,
+          name: item.model_id.split('/').pop() || item.model_id,
+          local_path: item.path
+        });
+        win?.webContents.send('model-download-complete', item.model_id);
+      } else if (item.status === 'failed') {
+        win?.webContents.send('model-download-progress', `ERROR: ${item.model_id}: ${item.error}`);
       }
+      win?.webContents.send('model-queue-update', item);
+    }
+  }
 
-      const pythonPath = 'python3';
-      let output = '';
-
-      const pyshell = new PythonShell(scriptPath, {
-        mode: 'text',
-        pythonPath: pythonPath,
-        pythonOptions: ['-u'],
-        args: ['browse', task, String(limit)]
-      });
+  const callModelService = (method: string, params: Record<string, any> = {}) => {
+    return callBridge(`models.${method}`, params);
+  };
 
-      pyshell.on('message', (message) => {
-        output += message + '\n';
-      });
+  ipcMain.handle('browse-models', async (_event, task = 'text-generation', limit = 20) => {
+    return callModelService('browse', { task, limit }).promise;
+  });
 
-      pyshell.end((err) => {
-        if (err) {
-          reject(err);
-        } else {
-          try {
-            const models = JSON.parse(output);
-            resolve(models);
-          } catch (e) {
-            reject(new Error('Failed to parse model list'));
-          }
-        }
-      });
-    });
+  // Downloads go through the service's persistent queue: it runs them by
+  // priority under a shared bandwidth cap and resumes them after a restart.
+  ipcMain.handle('download-model', async (_event, modelId, priority = 0) => {
+    console.log(`Queueing download of model: ${modelId}`);
+    const item = await callModelService('enqueue', { model_id: modelId, priority }).promise;
+    return item.status === 'active' ? "Model download already in progress" : "Model download queued";
   });
 
-  ipcMain.handle('download-model', (_event, modelId) => {
-    console.log(`Starting download of model: ${modelId}`);
+  ipcMain.handle('cancel-model-download', (_event, modelId) => {
+    return callModelService('remove', { model_id: modelId }).promise;
+  });
 
-    let scriptPath = path.join(__dirname, '../python_bridge/model_manager.py');
-    if (app.isPackaged) {
-      scriptPath = path.join(process.resourcesPath, 'python_bridge/model_manager.py');
-    }
+  ipcMain.handle('pause-model-download', (_event, modelId?: string) => {
+    return callModelService('pause', { model_id: modelId ?? null }).promise;
+  });
 
-    const pythonPath = 'python3';
+  ipcMain.handle('resume-model-download', (_event, modelId?: string) => {
+    return callModelService('resume', { model_id: modelId ?? null }).promise;
+  });
 
-    modelManagerProcess = new PythonShell(scriptPath, {
-      mode: 'text',
-      pythonPath: pythonPath,
-      pythonOptions: ['-u'],
-      args: ['download', modelId]
-    });
+  ipcMain.handle('get-model-download-queue', () => {
+    return callModelService('queue').promise;
+  });
 
-    modelManagerProcess.on('message', (message) => {
-      console.log(message);
-      win?.webContents.send('model-download-progress', message);
-    });
+  ipcMain.handle('set-model-download-priority', (_event, modelId: string, priority: number) => {
+    return callModelService('set_priority', { model_id: modelId, priority }).promise;
+  });
 
-    modelManagerProcess.end((err) => {
-      if (!err) {
-        // Save model to database
-        saveModel({
-          model_id: modelId,
-          name: modelId.split('/').pop() || modelId,
-          local_path: `~/.cache/spark-models/${modelId.replace('/', '_')}`
-        });
-        win?.webContents.send('model-download-complete', modelId);
-      }
-    });
+  ipcMain.handle('set-model-download-bandwidth', (_event, mbPerSec: number | null) => {
+    return callModelService('set_bandwidth', { mb_per_sec: mbPerSec }).promise;
+  });
 
-    return "Model download initiated";
+  app.on('will-quit', () => {
+    // The daemon stops every service, draining the scheduler, then exits
+    bridge?.send(JSON.stringify({ jsonrpc: '2.0', method: 'shutdown' }));
   });
 
   ipcMain.handle('get-local-models', () => {
@@ -614,6 +746,10 @@ app.whenReady().then(() => {
 
   ipcMain.handle('set-active-model', (_event, modelId) => {
     setActiveModel(modelId);
+    // The model cache must never evict the active model
+    callModelService('set_active', { model_id: modelId }).promise.catch((err) => {
+      console.error(`Could not mark ${modelId} active in the model cache: ${err.message}`);
+    });
     return getActiveModel();
   });
 
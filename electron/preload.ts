@@ -41,7 +41,13 @@ try {
 
     // Model Management
     browseModels: (task?: string, limit?: number) => ipcRenderer.invoke('browse-models', task, limit),
-    downloadModel: (modelId: string) => ipcRenderer.invoke('download-model', modelId),
+    downloadModel: (modelId: string, priority?: number) => ipcRenderer.invoke('download-model', modelId, priority),
+    cancelModelDownload: (modelId: string) => ipcRenderer.invoke('cancel-model-download', modelId),
+    pauseModelDownload: (modelId?: string) => ipcRenderer.invoke('pause-model-download', modelId),
+    resumeModelDownload: (modelId?: string) => ipcRenderer.invoke('resume-model-download', modelId),
+    getModelDownloadQueue: () => ipcRenderer.invoke('get-model-download-queue'),
+    setModelDownloadPriority: (modelId: string, priority: number) => ipcRenderer.invoke('set-model-download-priority', modelId, priority),
+    setModelDownloadBandwidth: (mbPerSec: number | null) => ipcRenderer.invoke('set-model-download-bandwidth', mbPerSec),
     getLocalModels: () => ipcRenderer.invoke('get-local-models'),
     setActiveModel: (modelId: string) => ipcRenderer.invoke('set-active-model', modelId),
     getActiveModel: () => ipcRenderer.invoke('get-active-model'),
@@ -0,0 +1,93 @@
+"""
+Content-Addressed Blob Store
+Keeps one copy of each file under blobs/<key> and exposes model directories
+as hardlink (or symlink) views over it
+"""
+import hashlib
+import mmap
+import os
+from pathlib import Path
+from typing import Optional
+
+
+HASH_BLOCK_SIZE = 16 * 1024 * 1024
+
+
+def is_sha256_key(key: Optional[str]) -> bool:
+    """LFS keys are sha256 hex digests; other Hub keys are git (sha1) blob ids"""
+    return key is not None and len(key) == 64
+
+
+def hash_file(path: Path, git_blob: bool = False) -> str:
+    """
+    Hash a file with large mmap'd reads (hashlib releases the GIL, so threads run in parallel)
+
+    Args:
+        git_blob: Compute the git blob id (sha1 of "blob <size>\\0" + content) instead of sha256
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(f"blob {size}\0".encode()) if git_blob else hashlib.sha256()
+    if size == 0:
+        return digest.hexdigest()
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mm)
+        try:
+            for offset in range(0, size, HASH_BLOCK_SIZE):
+                digest.update(view[offset:offset + HASH_BLOCK_SIZE])
+        finally:
+            view.release()
+    return digest.hexdigest()
+
+
+class BlobStore:
+    """Stores file contents by key (LFS sha256 or git blob id)"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key_for(sibling) -> Optional[str]:
+        """Content key for a Hub repo file: the LFS sha256, else the git blob id"""
+        lfs = getattr(sibling, 'lfs', None)
+        if lfs is not None:
+            sha256 = lfs.get('sha256') if isinstance(lfs, dict) else getattr(lfs, 'sha256', None)
+            if sha256:
+                return sha256
+        return getattr(sibling, 'blob_id', None)
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def has(self, key: str, size: int = 0) -> bool:
+        """True if the blob is fully present (size is checked when known)"""
+        try:
+            st = self.path(key).stat()
+        except FileNotFoundError:
+            return False
+        return size <= 0 or st.st_size == size
+
+    def link(self, key: str, dest: Path):
+        """Make dest a view of the blob: a hardlink, or a symlink across filesystems"""
+        blob = self.path(key)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists() or dest.is_symlink():
+            if dest.exists() and os.path.samefile(dest, blob):
+                return
+            dest.unlink()
+        try:
+            os.link(blob, dest)
+        except OSError:
+            os.symlink(os.path.relpath(blob, dest.parent), dest)
+
+    def remove(self, key: str) -> int:
+        """Delete a blob. Returns the number of bytes freed"""
+        blob = self.path(key)
+        try:
+            size = blob.stat().st_size
+            blob.unlink()
+            return size
+        except FileNotFoundError:
+            return 0
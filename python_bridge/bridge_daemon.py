@@ -0,0 +1,504 @@
+"""
+Bridge Daemon
+One long-lived Python process hosting every bridge service (host, client,
+discovery, voice, models) as a component Electron starts and stops over a
+single channel. A component's modules are only imported when it first starts,
+and all components share the event stream, one resource sampler, one HTTP
+connection pool and this process's event loop.
+
+Requests are JSON-RPC 2.0 lines on stdin:
+    start {service, options}   stop {service}   status   shutdown
+    <service>.<method> {...}   e.g. models.browse, discovery.snapshot
+Replies are 'rpc' bridge events; component state changes are 'service' events.
+
+Usage: python bridge_daemon.py
+"""
+import asyncio
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+import bridge_events
+from bridge_events import EventStream
+
+if TYPE_CHECKING:
+    from network_discovery import NetworkDiscovery
+
+HTTP_POOL_SIZE = 16  # Connections kept per host in the shared HTTP session
+CLIENT_STOP_TIMEOUT = 15.0  # Seconds `parallax join` gets after SIGTERM
+VOICE_STOP_TIMEOUT = 20.0  # The voice loop only checks for stop between utterances
+
+# Returned by a component call that answers on its own (the model service replies itself)
+NO_REPLY = object()
+
+
+class SharedResources:
+    """What every component uses one copy of, each created on first use"""
+
+    def __init__(self, events: EventStream, loop: asyncio.AbstractEventLoop):
+        self.events = events
+        self.loop = loop
+        self._sampler = None
+        self._http = None
+        self._lock = threading.Lock()
+        # Inference load reported by the host and client components; discovery announces it while running
+        self.load: Dict = {}
+        self.discovery: Optional['NetworkDiscovery'] = None
+
+    @property
+    def sampler(self):
+        """The running ResourceSampler"""
+        with self._lock:
+            if self._sampler is None:
+                from resource_sampler import ResourceSampler
+                self._sampler = ResourceSampler()
+                self._sampler.start()
+            return self._sampler
+
+    @property
+    def http(self):
+        """A requests.Session whose connection pool every component reuses"""
+        with self._lock:
+            if self._http is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._http = session
+            return self._http
+
+    def set_load(self, **load):
+        """Record inference load (NetworkDiscovery.set_load arguments) and pass it on to discovery"""
+        with self._lock:
+            self.load.update(load)
+            if self.discovery is not None:
+                self.discovery.set_load(**load)
+
+    def attach_discovery(self, discovery: Optional['NetworkDiscovery']):
+        """Have discovery announce the load reported so far and from now on; None detaches it"""
+        with self._lock:
+            self.discovery = discovery
+            if discovery is not None and self.load:
+                discovery.set_load(**self.load)
+
+    def on_parallax_event(self, event: Dict):
+        """Feed throughput parsed from Parallax's log into the announced load"""
+        if event['type'] == 'throughput':
+            self.set_load(tokens_per_sec=event['tokens_per_sec'])
+
+    def resources(self) -> Optional[Dict]:
+        """Latest sampler snapshot, if anything has started the sampler"""
+        return self._sampler.snapshot() if self._sampler is not None else None
+
+    def close(self):
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._http is not None:
+            self._http.close()
+
+
+class Component:
+    """
+    A service the daemon can start and stop
+
+    Subclasses import their modules inside _start, so a component that never
+    runs costs nothing. start and stop block and run on executor threads.
+    """
+
+    name = ''
+    auto_start = False  # Start on the first <service>.<method> call
+
+    def __init__(self, shared: SharedResources):
+        self.shared = shared
+        self.state = 'stopped'
+        self._thread: Optional[threading.Thread] = None
+
+    def _set_state(self, state: str, **fields):
+        self.state = state
+        self.shared.events.emit('service', {'service': self.name, 'state': state, **fields})
+
+    def start(self, options: Dict):
+        """Start the component, restarting it if it is already running"""
+        if self.state in ('starting', 'running'):
+            self.stop()
+        self._set_state('starting')
+        try:
+            self._start(options)
+        except Exception as e:
+            self._set_state('failed', error=str(e))
+            raise
+        if self.state == 'starting':
+            self._set_state('running')
+
+    def stop(self):
+        if self.state in ('stopped', 'failed'):
+            return
+        self._set_state('stopping')
+        try:
+            self._stop()
+        finally:
+            if self._thread is not None:
+                self._thread.join(timeout=self.stop_timeout())
+                self._thread = None
+            self._set_state('stopped')
+
+    def stop_timeout(self) -> float:
+        return 5.0
+
+    def call(self, request_id: Any, method: str, params: Dict) -> Any:
+        raise ValueError(f"Unknown method: {self.name}.{method}")
+
+    def _run_in_thread(self, target: Callable[[], Any]):
+        """Run the component's blocking main loop; when it ends by itself, report why"""
+        def run():
+            error = None
+            try:
+                target()
+            except Exception as e:
+                error = str(e)
+                print(f"ERROR: {self.name} stopped: {e}")
+            if self.state == 'running':
+                if error:
+                    self._set_state('failed', error=error)
+                else:
+                    self._set_state('stopped')
+        self._thread = threading.Thread(target=run, name=f"bridge-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _start(self, options: Dict):
+        raise NotImplementedError
+
+    def _stop(self):
+        pass
+
+
+class HostComponent(Component):
+    """Supervised Parallax scheduler (host.py)"""
+
+    name = 'host'
+
+    def _start(self, options: Dict):
+        import host
+        from scheduler_supervisor import DRAIN_TIMEOUT, SchedulerSupervisor
+
+        parallax_path = host.find_parallax_cli()
+        if not parallax_path:
+            host.print_parallax_missing()
+            raise RuntimeError("Parallax CLI not found")
+        print(f"PYTHON_BRIDGE: Found Parallax CLI at: {parallax_path}")
+        model = options.get('model', 'Qwen/Qwen3-0.6B')
+        nodes = int(options.get('nodes', 1))
+        cmd = host.scheduler_command(parallax_path, model, nodes, options.get('host', '0.0.0.0'),
+                                     options.get('extra_args', []))
+        host.announce_scheduler(cmd, model, nodes)
+        if options.get('prewarm', True):
+            host.start_prewarm(model)
+        self.drain_timeout = float(options.get('drain_timeout', DRAIN_TIMEOUT))
+        self.supervisor = SchedulerSupervisor(cmd, model, ready_timeout=float(options.get('ready_timeout', 0)),
+                                              drain_timeout=self.drain_timeout, session=self.shared.http,
+                                              on_state=lambda state: self._on_scheduler_state(state, model),
+                                              on_event=self.shared.on_parallax_event)
+        self._run_in_thread(self.supervisor.run)
+
+    def _on_scheduler_state(self, state: str, model: str):
+        # Peers see the model as loaded only while the scheduler can serve it
+        if state == 'ready':
+            self.shared.set_load(loaded_model=model)
+        elif state in ('unhealthy', 'stopped'):
+            self.shared.set_load(loaded_model='', tokens_per_sec=0.0)
+
+    def _stop(self):
+        self.supervisor.stop()
+
+    def stop_timeout(self) -> float:
+        return self.drain_timeout + 5
+
+
+class ClientComponent(Component):
+    """`parallax join` worker node (client.py)"""
+
+    name = 'client'
+
+    def _start(self, options: Dict):
+        import client
+        from log_relay import LogRelay
+
+        if not shutil.which("parallax"):
+            client.print_parallax_missing()
+            raise RuntimeError("Parallax CLI not found")
+        cmd = client.join_command(options.get('scheduler_addr'), options.get('extra_args', []), http=self.shared.http)
+        self.process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            start_new_session=True
+        )
+        relay = LogRelay(self.process.stdout, events=self.shared.events,
+                         on_event=self.shared.on_parallax_event).start()
+
+        def wait():
+            self.process.wait()
+            relay.join()
+        self._run_in_thread(wait)
+
+    def _stop(self):
+        print("PYTHON_BRIDGE: Stopping Parallax Node...")
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=CLIENT_STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def stop_timeout(self) -> float:
+        return 5.0
+
+
+class DiscoveryComponent(Component):
+    """mDNS discovery and broadcasting (network_discovery.py) on the daemon's event loop"""
+
+    name = 'discovery'
+
+    def _start(self, options: Dict):
+        from network_discovery import NetworkDiscovery, stream_device_events
+        from peer_share import shared_blob_port
+
+        self.discovery = NetworkDiscovery(options.get('device_name') or 'Spark', role=options.get('role') or 'client',
+                                          sampler=self.shared.sampler, loop=self.shared.loop)
+        stream_device_events(self.discovery, self.shared.events)
+        # The model service shares blobs on this port when sharing is opted into
+        blob_port = shared_blob_port()
+        self.discovery.start_broadcasting(personality=options.get('personality', ''),
+                                          model=options.get('model', ''), blob_port=blob_port)
+        self.shared.attach_discovery(self.discovery)
+        self.discovery.start_discovery()
+
+    def _stop(self):
+        self.shared.attach_discovery(None)
+        self.discovery.stop()
+
+    def call(self, request_id: Any, method: str, params: Dict) -> Any:
+        if method == 'snapshot':
+            # Sent as its own event so it lands in order with the discovery.* changes
+            self.shared.events.emit('discovery.snapshot', self.discovery.snapshot())
+            return True
+        if method == 'devices':
+            return self.discovery.get_discovered_devices(sort=params.get('sort'))
+        return super().call(request_id, method, params)
+
+
+class VoiceComponent(Component):
+    """Voice assistant loop (voice_assistant.py) on its own thread"""
+
+    name = 'voice'
+
+    def _start(self, options: Dict):
+        import voice_assistant
+
+        self._stop_event = threading.Event()
+        self._run_in_thread(lambda: asyncio.run(voice_assistant.run_assistant(
+            name=options.get('name') or 'Spark',
+            voice=options.get('voice') or 'en-US-AriaNeural',
+            system_prompt=options.get('system_prompt'),
+            parallax_host=options.get('parallax_host'),
+            stop_event=self._stop_event,
+            http=self.shared.http
+        )))
+
+    def _stop(self):
+        self._stop_event.set()
+
+    def stop_timeout(self) -> float:
+        return VOICE_STOP_TIMEOUT
+
+
+class ModelsComponent(Component):
+    """Model manager JSON-RPC service (model_service.py); it answers its own requests"""
+
+    name = 'models'
+    auto_start = True
+
+    def _start(self, options: Dict):
+        from model_manager import ModelManager
+        from model_service import ModelService, share_blobs_from_env
+
+        self.manager = ModelManager()
+        share_blobs_from_env(self.manager)
+        self.service = ModelService(self.manager, events=self.shared.events)
+        self.service.start()
+
+    def _stop(self):
+        self.service.close()
+        if self.manager.blob_server is not None:
+            self.manager.blob_server.stop()
+            self.manager.blob_server = None
+
+    def call(self, request_id: Any, method: str, params: Dict) -> Any:
+        self.service.handle({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params})
+        return NO_REPLY
+
+
+COMPONENTS = {c.name: c for c in (HostComponent, ClientComponent, DiscoveryComponent, VoiceComponent, ModelsComponent)}
+
+
+class BridgeDaemon:
+    """Reads requests from stdin and dispatches them to components"""
+
+    def __init__(self, events: EventStream):
+        self.events = events
+        self.started_at = time.time()
+        self.components: Dict[str, Component] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._shutdown = None  # asyncio.Event, made on the running loop
+        self.shared: Optional[SharedResources] = None
+
+    def reply(self, request_id: Any, result: Any = None, error: Optional[str] = None, code: int = -32000):
+        if request_id is None:
+            return
+        message = {'jsonrpc': '2.0', 'id': request_id}
+        if error is not None:
+            message['error'] = {'code': code, 'message': error}
+        else:
+            message['result'] = result
+        self.events.emit('rpc', message)
+
+    def _component(self, name: str) -> Component:
+        if name not in COMPONENTS:
+            raise KeyError(f"Unknown service: {name}")
+        if name not in self.components:
+            self.components[name] = COMPONENTS[name](self.shared)
+            self._locks[name] = asyncio.Lock()
+        return self.components[name]
+
+    def status(self) -> Dict:
+        try:
+            import resource
+            peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != 'darwin' else 1024 ** 2)
+        except ImportError:
+            peak_rss_mb = None
+        return {
+            'pid': os.getpid(),
+            'uptime': round(time.time() - self.started_at, 1),
+            'services': {name: self.components[name].state if name in self.components else 'stopped'
+                         for name in COMPONENTS},
+            'peak_rss_mb': round(peak_rss_mb, 1) if peak_rss_mb is not None else None,
+            'resources': self.shared.resources()
+        }
+
+    async def _blocking(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def _dispatch(self, request_id: Any, method: str, params: Dict):
+        try:
+            if method in ('start', 'stop'):
+                component = self._component(params.get('service', ''))
+                async with self._locks[component.name]:
+                    if method == 'start':
+                        await self._blocking(component.start, params.get('options') or {})
+                    else:
+                        await self._blocking(component.stop)
+                self.reply(request_id, {'service': component.name, 'state': component.state})
+            elif method == 'status':
+                self.reply(request_id, self.status())
+            elif '.' in method:
+                service, _, name = method.partition('.')
+                component = self._component(service)
+                if component.state != 'running':
+                    if not component.auto_start:
+                        raise RuntimeError(f"{service} is not running")
+                    async with self._locks[service]:
+                        if component.state != 'running':
+                            await self._blocking(component.start, {})
+                result = await self._blocking(component.call, request_id, name, params)
+                if result is not NO_REPLY:
+                    self.reply(request_id, result)
+            else:
+                self.reply(request_id, error=f"Unknown method: {method}", code=-32601)
+        except KeyError as e:
+            self.reply(request_id, error=str(e.args[0]), code=-32602)
+        except Exception as e:
+            self.reply(request_id, error=str(e))
+
+    def _read_stdin(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        # A plain thread, since an executor thread stuck in readline would hold up shutdown
+        for line in sys.stdin:
+            loop.call_soon_threadsafe(queue.put_nowait, line)
+        loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    async def serve(self):
+        """Handle requests until stdin closes, a shutdown request arrives or SIGTERM"""
+        loop = asyncio.get_running_loop()
+        self.shared = SharedResources(self.events, loop)
+        self._shutdown = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._shutdown.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        queue: asyncio.Queue = asyncio.Queue()
+        threading.Thread(target=self._read_stdin, args=(loop, queue), name="bridge-stdin", daemon=True).start()
+        self.events.emit('rpc', {'jsonrpc': '2.0', 'method': 'ready', 'params': {'services': sorted(COMPONENTS)}})
+
+        tasks = set()
+        shutdown_id = None
+        while not self._shutdown.is_set():
+            next_line = asyncio.ensure_future(queue.get())
+            stopping = asyncio.ensure_future(self._shutdown.wait())
+            await asyncio.wait({next_line, stopping}, return_when=asyncio.FIRST_COMPLETED)
+            stopping.cancel()
+            if not next_line.done():
+                next_line.cancel()
+                break
+            line = next_line.result()
+            if line is None:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError as e:
+                self.events.emit('rpc', {'jsonrpc': '2.0', 'id': None,
+                                         'error': {'code': -32700, 'message': f"Parse error: {e}"}})
+                continue
+            if message.get('method') == 'shutdown':
+                shutdown_id = message.get('id')
+                break
+            # Requests run concurrently; each component's start/stop are serialised by its lock
+            task = asyncio.ensure_future(self._dispatch(message.get('id'), message.get('method', ''),
+                                                        message.get('params') or {}))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await self.shutdown()
+        self.reply(shutdown_id, True)
+        for task in tasks:
+            task.cancel()
+
+    async def shutdown(self):
+        """Stop every component, newest first, then the shared resources"""
+        for component in reversed(list(self.components.values())):
+            try:
+                await self._blocking(component.stop)
+            except Exception as e:
+                print(f"ERROR: Could not stop {component.name}: {e}")
+        self.shared.close()
+
+
+def main():
+    events = bridge_events.install("bridge")
+    asyncio.run(BridgeDaemon(events).serve())
+    events.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Bridge Events
+NDJSON framing for everything a python_bridge script tells Electron. Each
+stdout line is one JSON object:
+
+    {"v": 1, "seq": 12, "ts": 1700000000.123, "type": "discovery.found", "data": {...}}
+
+seq counts the lines a process has written, so a gap means lines went
+missing. Events are written in batches every FLUSH_INTERVAL, and an event
+emitted with a key replaces any queued event of the same type and key, so
+progress and metrics never queue up faster than the UI reads them.
+"""
+import atexit
+import io
+import itertools
+import json
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import IO, Any, Hashable, Optional
+
+PROTOCOL_VERSION = 1
+FLUSH_INTERVAL = 0.05  # Seconds events are batched before one write and flush
+
+# Prefixes the scripts used to print before this framing existed; they now set a log event's level
+_LOG_PREFIX_RE = re.compile(r'^(?:PYTHON_BRIDGE|LOG|ERROR|WARNING):\s?')
+_ERROR_RE = re.compile(r'^(?:PYTHON_BRIDGE:\s*)?ERROR\b\W*')
+
+
+class EventStream:
+    """Batches events and writes them as NDJSON lines from one place"""
+
+    def __init__(self, out: Optional[IO[str]] = None, flush_interval: float = FLUSH_INTERVAL):
+        """
+        Args:
+            out: Where lines go; sys.stdout by default
+            flush_interval: Seconds an event may wait to share a write with others
+        """
+        self.out = out or sys.stdout
+        self.flush_interval = flush_interval
+        self.seq = 0
+        self._pending: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._unkeyed = itertools.count()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def emit(self, event_type: str, data: Any = None, key: Optional[Hashable] = None, immediate: bool = False):
+        """
+        Queue one event
+
+        Args:
+            event_type: Dotted name, e.g. 'discovery.found' or 'voice.state'
+            data: JSON-serialisable payload
+            key: Coalescing key. A queued event with the same type and key is
+                dropped and this one goes to the back of the queue
+            immediate: Write everything queued now instead of at the next flush
+        """
+        with self._cond:
+            if key is None:
+                slot = next(self._unkeyed)
+            else:
+                slot = (event_type, key)
+                self._pending.pop(slot, None)
+            self._pending[slot] = (event_type, data, time.time())
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name="bridge-events", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        if immediate:
+            self.flush()
+
+    def log(self, message: str, level: str = 'info', source: Optional[str] = None):
+        """Queue a log line; errors are written straight away"""
+        self.emit('log', {'level': level, 'source': source, 'lines': [message]}, immediate=level == 'error')
+
+    def flush(self):
+        """Write every queued event now"""
+        # One writer at a time, so seq order is output order
+        with self._write_lock:
+            with self._cond:
+                events = list(self._pending.values())
+                self._pending.clear()
+            if not events:
+                return
+            lines = []
+            for event_type, data, timestamp in events:
+                self.seq += 1
+                lines.append(json.dumps({'v': PROTOCOL_VERSION, 'seq': self.seq, 'ts': round(timestamp, 3),
+                                         'type': event_type, 'data': data}))
+            try:
+                self.out.write('\n'.join(lines) + '\n')
+                self.out.flush()
+            except (OSError, ValueError):
+                pass
+
+    def close(self):
+        """Write whatever is queued and stop the flush thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            # Let more events arrive so they share one write and flush
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+class _PrintedLines(io.TextIOBase):
+    """Stands in for sys.stdout and turns every printed line into a log event"""
+
+    def __init__(self, events: EventStream, source: str):
+        self.events = events
+        self.source = source
+        self._partial = ''
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self) -> str:
+        return 'utf-8'
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        with self._lock:
+            lines = (self._partial + text).split('\n')
+            self._partial = lines.pop()
+        for line in lines:
+            self._log(line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def _log(self, line: str):
+        level = 'error' if _ERROR_RE.match(line) else 'info'
+        message = _ERROR_RE.sub('', line) if level == 'error' else _LOG_PREFIX_RE.sub('', line)
+        if message.strip():  # Spacer lines like "PYTHON_BRIDGE: " carry nothing
+            self.events.log(message, level=level, source=self.source)
+
+
+_stream: Optional[EventStream] = None
+_stream_lock = threading.Lock()
+
+
+def install(source: str) -> EventStream:
+    """
+    Make stdout carry only events for the rest of this process
+
+    Anything printed afterwards, by this script or a module it uses, becomes a
+    'log' event. Call once from a script's entry point.
+
+    Args:
+        source: Name put on log events, e.g. 'host' or 'network_discovery'
+
+    Returns:
+        The process-wide stream
+    """
+    global _stream
+    with _stream_lock:
+        if isinstance(sys.stdout, _PrintedLines):
+            return sys.stdout.events
+        if _stream is None:
+            _stream = EventStream(sys.stdout)
+            atexit.register(_stream.close)
+        sys.stdout = _PrintedLines(_stream, source)
+        return _stream
+
+
+def get_stream() -> EventStream:
+    """The process-wide stream, writing to the current stdout if install() wasn't called"""
+    global _stream
+    with _stream_lock:
+        if _stream is None:
+            _stream = EventStream(sys.stdout)
+            atexit.register(_stream.close)
+        return _stream
+
@@ -4,69 +4,77 @@ import subprocess
 import argparse
 import shutil
 
-def main():
-    parser = argparse.ArgumentParser(description="Start Parallax Client (Node Worker)")
-    parser.add_argument("--scheduler-addr", type=str, default=None, 
-                        help="Scheduler address (peer ID) for remote connection. Leave empty for local network auto-discovery.")
-    args, unknown = parser.parse_known_args()
+import bridge_events
+from log_relay import LogRelay
 
-    # Check if parallax CLI is available
-    parallax_path = shutil.which("parallax")
-    
-    if not parallax_path:
-        print("PYTHON_BRIDGE: ERROR - Parallax CLI not found!")
-        print("PYTHON_BRIDGE: Please install Parallax first:")
-        print("PYTHON_BRIDGE:   git clone https://github.com/GradientHQ/parallax.git")
-        print("PYTHON_BRIDGE:   cd parallax")
-        print("PYTHON_BRIDGE:   pip install -e '.[mac]'  # For macOS")
-        print("PYTHON_BRIDGE:   pip install -e '.[gpu]'  # For Linux with GPU")
-        sys.exit(1)
+def print_parallax_missing():
+    print("PYTHON_BRIDGE: ERROR - Parallax CLI not found!")
+    print("PYTHON_BRIDGE: Please install Parallax first:")
+    print("PYTHON_BRIDGE:   git clone https://github.com/GradientHQ/parallax.git")
+    print("PYTHON_BRIDGE:   cd parallax")
+    print("PYTHON_BRIDGE:   pip install -e '.[mac]'  # For macOS")
+    print("PYTHON_BRIDGE:   pip install -e '.[gpu]'  # For Linux with GPU")
 
-    # Use the Parallax CLI to join as a node
+def resolve_scheduler(scheduler_addr, http=None):
+    """
+    Turn a host IP into the scheduler's peer ID by asking the host's API
+
+    Args:
+        scheduler_addr: Peer ID, IP address or "localhost"
+        http: Shared HTTP session; plain requests by default
+
+    Returns:
+        The peer ID if the host told us one, otherwise scheduler_addr unchanged
+    """
+    # Check if it's an IP address (simple check)
+    is_ip = False
+    try:
+        import ipaddress
+        is_ip = ipaddress.ip_address(scheduler_addr).version in (4, 6)
+    except:
+        pass
+    # Discovery may hand over the fastest path to the host, which can be IPv6
+    api_host = f"[{scheduler_addr}]" if ':' in scheduler_addr else scheduler_addr
+        
+    if is_ip or scheduler_addr == "localhost":
+        print(f"PYTHON_BRIDGE: Detected IP address: {scheduler_addr}")
+        print(f"PYTHON_BRIDGE: Fetching join command from host API...")
+        try:
+            if http is None:
+                import requests as http
+            response = http.get(f"http://{api_host}:3001/node/join/command", timeout=5)
+            if response.status_code == 200:
+                data = response.json()
+                # data['data'] contains the full command, e.g. "parallax join -s PEER_ID"
+                # We just want the peer ID usually, but let's see what it returns
+                # Actually, let's just use the peer ID if we can extract it, or use the full command logic?
+                # The join command might be complex.
+                # Let's try to extract the peer ID from the response if possible, 
+                # or just use the IP if parallax supports it (unlikely).
+                # Wait, the /node/join/command returns a string command.
+                # Let's try to parse it.
+                join_cmd = data.get('data', '')
+                print(f"PYTHON_BRIDGE: Received join command: {join_cmd}")
+                
+                # Extract -s argument
+                parts = join_cmd.split()
+                if '-s' in parts:
+                    idx = parts.index('-s')
+                    if idx + 1 < len(parts):
+                        scheduler_addr = parts[idx + 1]
+                        print(f"PYTHON_BRIDGE: Extracted Peer ID: {scheduler_addr}")
+        except Exception as e:
+            print(f"PYTHON_BRIDGE: Error fetching from host API: {e}")
+            print(f"PYTHON_BRIDGE: Falling back to using {scheduler_addr} directly")
+    return scheduler_addr
+
+def join_command(scheduler_addr=None, extra=(), http=None):
+    """The `parallax join` command, announced the way Electron shows it"""
     # parallax join [-s scheduler-address]
     cmd = ["parallax", "join", "-u"]  # -u disables telemetry
     
-    if args.scheduler_addr:
-        scheduler_addr = args.scheduler_addr
-        
-        # Check if it's an IP address (simple check)
-        is_ip = False
-        try:
-            import socket
-            socket.inet_aton(scheduler_addr)
-            is_ip = True
-        except:
-            pass
-            
-        if is_ip or scheduler_addr == "localhost":
-            print(f"PYTHON_BRIDGE: Detected IP address: {scheduler_addr}")
-            print(f"PYTHON_BRIDGE: Fetching join command from host API...")
-            try:
-                import requests
-                response = requests.get(f"http://{scheduler_addr}:3001/node/join/command", timeout=5)
-                if response.status_code == 200:
-                    data = response.json()
-                    # data['data'] contains the full command, e.g. "parallax join -s PEER_ID"
-                    # We just want the peer ID usually, but let's see what it returns
-                    # Actually, let's just use the peer ID if we can extract it, or use the full command logic?
-                    # The join command might be complex.
-                    # Let's try to extract the peer ID from the response if possible, 
-                    # or just use the IP if parallax supports it (unlikely).
-                    # Wait, the /node/join/command returns a string command.
-                    # Let's try to parse it.
-                    join_cmd = data.get('data', '')
-                    print(f"PYTHON_BRIDGE: Received join command: {join_cmd}")
-                    
-                    # Extract -s argument
-                    parts = join_cmd.split()
-                    if '-s' in parts:
-                        idx = parts.index('-s')
-                        if idx + 1 < len(parts):
-                            scheduler_addr = parts[idx + 1]
-                            print(f"PYTHON_BRIDGE: Extracted Peer ID: {scheduler_addr}")
-            except Exception as e:
-                print(f"PYTHON_BRIDGE: Error fetching from host API: {e}")
-                print(f"PYTHON_BRIDGE: Falling back to using {scheduler_addr} directly")
+    if scheduler_addr:
+        scheduler_addr = resolve_scheduler(scheduler_addr, http)
 
         # Remote connection with explicit scheduler address
         cmd.extend(["-s", scheduler_addr])
@@ -79,7 +87,7 @@ def main():
         # Local network auto-discovery
         print(f"PYTHON_BRIDGE: Joining Parallax network (local auto-discovery)")
     
-    cmd.extend(unknown)
+    cmd.extend(extra)
     
     print(f"PYTHON_BRIDGE: Command: {' '.join(cmd)}")
     print(f"PYTHON_BRIDGE: ")
@@ -87,6 +95,21 @@ def main():
     print(f"PYTHON_BRIDGE: Node API will be available at http://localhost:3000")
     print(f"PYTHON_BRIDGE: ")
     sys.stdout.flush()
+    return cmd
+
+def main():
+    parser = argparse.ArgumentParser(description="Start Parallax Client (Node Worker)")
+    parser.add_argument("--scheduler-addr", type=str, default=None, 
+                        help="Scheduler address (peer ID) for remote connection. Leave empty for local network auto-discovery.")
+    args, unknown = parser.parse_known_args()
+
+    # Check if parallax CLI is available
+    if not shutil.which("parallax"):
+        print_parallax_missing()
+        sys.exit(1)
+
+    # Use the Parallax CLI to join as a node
+    cmd = join_command(args.scheduler_addr, unknown)
 
     try:
         # Run the process and stream output
@@ -94,15 +117,12 @@ def main():
             cmd, 
             stdout=subprocess.PIPE, 
             stderr=subprocess.STDOUT, 
-            text=True, 
-            bufsize=1
+            bufsize=0
         )
 
-        for line in process.stdout:
-            print(line, end='')
-            sys.stdout.flush()
-
+        relay = LogRelay(process.stdout).start()
         process.wait()
+        relay.join()
     except FileNotFoundError:
         print("PYTHON_BRIDGE: ERROR - Could not run 'parallax' command")
         print("PYTHON_BRIDGE: Make sure Parallax is installed and in your PATH")
@@ -111,4 +131,5 @@ def main():
         process.terminate()
 
 if __name__ == "__main__":
+    bridge_events.install("client")
     main()
@@ -0,0 +1,284 @@
+"""
+Discovery Scale Benchmark
+Starts many simulated Spark devices on loopback, points a NetworkDiscovery
+listener at them, and measures convergence time, update latency and the
+listener's CPU and memory. Results are written as JSON so runs can be compared.
+
+Usage: python discovery_benchmark.py [--devices 50,100,200] [--scenario browse|join] [--max-resolves 32,1]
+                                    [--processes 4] [--output results.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import psutil
+
+from network_discovery import MAX_CONCURRENT_RESOLVES
+
+LOOPBACK = "127.0.0.1"  # mDNS traffic stays on this interface
+SERVICE_TYPE = "_spark._tcp.local."
+DEFAULT_SIZES = [25, 100, 200]
+DEFAULT_TIMEOUT = 60.0  # Seconds to wait for convergence before giving up
+BASE_PORT = 40000
+
+
+def _percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {'p50': None, 'p95': None, 'max': None}
+    ordered = sorted(values)
+
+    def rank(fraction: float) -> float:
+        return round(ordered[min(len(ordered), max(1, math.ceil(fraction * len(ordered)))) - 1], 2)
+    return {'p50': rank(0.50), 'p95': rank(0.95), 'max': round(ordered[-1], 2)}
+
+
+def _service_info(run_id: str, index: int, cpu: int):
+    from zeroconf import ServiceInfo
+    return ServiceInfo(
+        SERVICE_TYPE,
+        f"bench-{run_id}-{index}.{SERVICE_TYPE}",
+        # Discovery ignores loopback peers, so devices advertise addresses from
+        # the benchmarking range (198.18.0.0/15); nothing ever connects to them
+        addresses=[socket.inet_aton(f"198.18.{(index + 1) // 256}.{(index + 1) % 256}")],
+        port=BASE_PORT + index,
+        properties={b'role': b'client', b'cpu': str(cpu).encode('utf-8'), b'mem': b'10', b'hb': b'1'},
+        server=f"bench-{run_id}-{index}.local."
+    )
+
+
+def _broadcaster(run_id: str, indices: List[int], conn):
+    """
+    Worker process owning a slice of the simulated devices
+
+    Commands arrive on the pipe: 'register', 'update' (answers with the send
+    time of each device's re-announce) and 'stop'.
+    """
+    from zeroconf.asyncio import AsyncZeroconf
+
+    async def main():
+        aiozc = AsyncZeroconf(interfaces=[LOOPBACK])
+        infos = {i: _service_info(run_id, i, cpu=1) for i in indices}
+        loop = asyncio.get_running_loop()
+        while True:
+            command = await loop.run_in_executor(None, conn.recv)
+            if command == 'register':
+                tasks = await asyncio.gather(*(aiozc.async_register_service(info) for info in infos.values()))
+                await asyncio.gather(*tasks)
+                conn.send('registered')
+            elif command == 'update':
+                sent = {}
+                for i in indices:
+                    infos[i] = _service_info(run_id, i, cpu=50)
+                    sent[infos[i].name] = time.time()
+                    await aiozc.async_update_service(infos[i])
+                conn.send(sent)
+            elif command == 'stop':
+                await aiozc.async_unregister_all_services()
+                await aiozc.async_close()
+                conn.send('stopped')
+                return
+
+    asyncio.run(main())
+
+
+class _PeakRss:
+    """Samples this process's RSS in the background and keeps the peak"""
+
+    def __init__(self, interval: float = 0.05):
+        self.process = psutil.Process()
+        self.peak = self.process.memory_info().rss
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def _wait_for(condition, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def run_scenario(devices: int, processes: int, timeout: float = DEFAULT_TIMEOUT, join: bool = False,
+                 max_resolves: int = MAX_CONCURRENT_RESOLVES) -> Dict:
+    """
+    Benchmark one fleet size
+
+    Args:
+        devices: Simulated devices to announce
+        processes: Broadcaster processes to spread them over
+        timeout: Seconds to wait for all devices to be found, and again for all updates
+        join: Register every device at once after the listener starts browsing, instead of
+            browsing a fleet that's already announced. Convergence then includes mDNS probing
+        max_resolves: Services the listener resolves at once (1 resolves them one by one)
+
+    Returns:
+        Convergence, update latency and listener resource figures for this size
+    """
+    from network_discovery import NetworkDiscovery
+    from peer_cache import PeerCache
+
+    run_id = f"{os.getpid()}-{devices}-{int(time.time())}"
+    context = multiprocessing.get_context('spawn')
+    workers = []
+    for p in range(max(1, min(processes, devices))):
+        parent, child = context.Pipe()
+        indices = list(range(p, devices, max(1, min(processes, devices))))
+        worker = context.Process(target=_broadcaster, args=(run_id, indices, child), daemon=True)
+        worker.start()
+        workers.append((worker, parent))
+
+    def register():
+        for _, conn in workers:
+            conn.send('register')
+        for _, conn in workers:
+            conn.recv()
+
+    if not join:
+        register()
+
+    prefix = f"bench-{run_id}-"
+    found: Dict[str, float] = {}
+    updated: Dict[str, float] = {}
+    lost = [0]
+
+    def on_event(action: str, device: Dict):
+        if not device['name'].startswith(prefix):
+            return
+        now = time.time()
+        if action == 'found':
+            found.setdefault(device['name'], now)
+        elif action == 'updated' and device['load'].get('cpu') == 50:
+            updated.setdefault(device['name'], now)
+        elif action == 'lost':
+            lost[0] += 1
+
+    process = psutil.Process()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        discovery = NetworkDiscovery(f"bench-listener-{os.getpid()}", role='client', probe_interval=0,
+                                     interfaces=[LOOPBACK], max_concurrent_resolves=max_resolves,
+                                     peer_cache=PeerCache(os.path.join(cache_dir, 'peers.json')))
+        discovery.register_device_callback(on_event)
+        rss_before = process.memory_info().rss
+        cpu_before = sum(process.cpu_times()[:2])
+        with _PeakRss() as rss:
+            started = time.time()
+            discovery.start_discovery()
+            if join:
+                register()
+            converged = _wait_for(lambda: len(found) >= devices, timeout)
+            convergence = time.time() - started
+            cpu_converge = sum(process.cpu_times()[:2]) - cpu_before
+
+            for _, conn in workers:
+                conn.send('update')
+            sent: Dict[str, float] = {}
+            for _, conn in workers:
+                sent.update(conn.recv())
+            _wait_for(lambda: len(updated) >= devices, timeout)
+            cpu_total = sum(process.cpu_times()[:2]) - cpu_before
+            wall_total = time.time() - started
+        rss_after = process.memory_info().rss
+        discovery.stop()
+
+    for worker, conn in workers:
+        conn.send('stop')
+        conn.recv()
+        worker.join(timeout=10)
+
+    update_latencies = [(updated[name] - sent[name]) * 1000 for name in sent if name in updated]
+    return {
+        'devices': devices,
+        'scenario': 'join' if join else 'browse',
+        'max_concurrent_resolves': max_resolves,
+        'broadcaster_processes': len(workers),
+        'converged': converged,
+        'convergence_seconds': round(convergence, 3),
+        'found': len(found),
+        'found_seconds': _percentiles([t - started for t in found.values()]),
+        'updates_seen': len(updated),
+        'update_latency_ms': _percentiles(update_latencies),
+        'lost_events': lost[0],
+        'listener_cpu_seconds_to_converge': round(cpu_converge, 3),
+        'listener_cpu_percent': round(100 * cpu_total / max(wall_total, 1e-6), 1),
+        'listener_rss_mb_peak': round(rss.peak / (1024 * 1024), 1),
+        'listener_rss_growth_mb': round((rss_after - rss_before) / (1024 * 1024), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Spark discovery with simulated devices on loopback")
+    parser.add_argument("--devices", type=str, default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated fleet sizes to run")
+    parser.add_argument("--processes", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Broadcaster processes the simulated devices are spread over")
+    parser.add_argument("--scenario", choices=['browse', 'join'], default='browse',
+                        help="browse: find an already-announced fleet; join: the whole fleet registers at once")
+    parser.add_argument("--max-resolves", type=str, default=str(MAX_CONCURRENT_RESOLVES),
+                        help="Comma-separated listener resolve concurrencies to compare, e.g. 32,1")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--output", type=str, default=None, help="Write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    from zeroconf import __version__ as zeroconf_version
+    results = {
+        'benchmark': 'discovery',
+        'timestamp': time.time(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'zeroconf': zeroconf_version,
+        },
+        'runs': []
+    }
+    concurrencies = [int(c) for c in args.max_resolves.split(',') if c.strip()]
+    for size in [int(s) for s in args.devices.split(',') if s.strip()]:
+        for max_resolves in concurrencies:
+            print(f"LOG: Benchmarking discovery ({args.scenario}) with {size} simulated devices, "
+                  f"{max_resolves} concurrent resolve(s)", file=sys.stderr)
+            # Discovery logs every device on stdout; keep stdout for the results
+            with contextlib.redirect_stdout(sys.stderr):
+                run = run_scenario(size, args.processes, args.timeout, join=args.scenario == 'join',
+                                   max_resolves=max_resolves)
+            print(f"LOG: {size} devices: converged in {run['convergence_seconds']}s "
+                  f"(p95 found {run['found_seconds']['p95']}s), update p95 {run['update_latency_ms']['p95']} ms, "
+                  f"listener CPU {run['listener_cpu_percent']}%", file=sys.stderr)
+            results['runs'].append(run)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+        print(f"LOG: Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
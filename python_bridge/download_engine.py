@@ -0,0 +1,389 @@
+"""
+Concurrent Download Engine
+Fetches model files with a bounded worker pool, splits large files into ranged
+parts and reports real byte-level progress and throughput
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+# requests is imported by the functions that make requests, so a manager
+# that never downloads doesn't load it
+if TYPE_CHECKING:
+    import requests
+
+
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_PART_SIZE = 64 * 1024 * 1024  # Bytes per ranged request within a large file
+DEFAULT_SPLIT_THRESHOLD = 128 * 1024 * 1024  # Files larger than this are split into parts
+READ_CHUNK_SIZE = 1024 * 1024
+MAX_RETRIES = 5
+
+# progress_callback(downloaded_bytes, total_bytes, bytes_per_second)
+ProgressCallback = Callable[[int, int, float], None]
+
+
+@dataclass
+class DownloadTask:
+    """A single file to fetch"""
+    filename: str
+    url: str
+    dest: Path
+    size: int = 0  # 0 when the size is unknown; the file is then fetched in one part
+    mirrors: List[str] = field(default_factory=list)  # Same content on LAN peers, tried before url
+    error: Optional[str] = None
+    parts: List['_Part'] = field(default_factory=list, repr=False)
+    remaining: int = 0
+
+
+@dataclass
+class _Part:
+    """A byte range of a task, downloaded into its own resumable file"""
+    task: DownloadTask
+    index: int
+    start: int
+    end: int  # Inclusive; -1 when the size is unknown
+    path: Path
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1 if self.end >= 0 else -1
+
+
+class DownloadCancelled(Exception):
+    """Raised inside workers when the caller cancels a download"""
+
+
+class RangeNotSupportedError(IOError):
+    """The server ignored a Range header for a resumed or split download"""
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Client errors (except rate limiting) won't succeed on retry"""
+    import requests
+
+    if isinstance(error, RangeNotSupportedError):
+        return False
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return True
+
+
+class TokenBucket:
+    """Thread-safe token bucket that caps throughput in bytes per second"""
+
+    def __init__(self, rate_bytes_per_sec: float, burst_bytes: Optional[int] = None):
+        """
+        Args:
+            rate_bytes_per_sec: Sustained rate; 0 or less means unlimited
+            burst_bytes: Bucket size. Defaults to one second of traffic
+        """
+        self._lock = threading.Lock()
+        self.set_rate(rate_bytes_per_sec, burst_bytes)
+
+    def set_rate(self, rate_bytes_per_sec: float, burst_bytes: Optional[int] = None):
+        """Change the rate; takes effect for the next consume call"""
+        with self._lock:
+            self.rate = rate_bytes_per_sec
+            self.capacity = burst_bytes or max(int(rate_bytes_per_sec), READ_CHUNK_SIZE)
+            self.tokens = float(self.capacity)
+            self._last = time.monotonic()
+
+    def consume(self, n: int):
+        """Block until n bytes may be sent"""
+        while True:
+            with self._lock:
+                if self.rate <= 0:
+                    return
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+                self._last = now
+                # Allow requests larger than the bucket by letting tokens go negative
+                if self.tokens >= min(n, self.capacity):
+                    self.tokens -= n
+                    return
+                wait = (min(n, self.capacity) - self.tokens) / self.rate
+            time.sleep(min(wait, 0.5))
+
+
+class DownloadProgress:
+    """Thread-safe byte counter that reports progress at a bounded rate"""
+
+    def __init__(self, total_bytes: int, callback: Optional[ProgressCallback], interval: float = 0.25):
+        self.total_bytes = total_bytes
+        self.callback = callback
+        self.interval = interval
+        self.downloaded = 0
+        self.bytes_per_sec = 0.0
+        self._lock = threading.Lock()
+        self._last_time = time.monotonic()
+        self._last_bytes = 0
+
+    def add(self, n: int, transferred: bool = True):
+        """Count n bytes; transferred=False for bytes already on disk from an earlier run"""
+        with self._lock:
+            self.downloaded += n
+            if not transferred:
+                self._last_bytes += n
+            now = time.monotonic()
+            elapsed = now - self._last_time
+            if elapsed < self.interval:
+                return
+            rate = (self.downloaded - self._last_bytes) / elapsed
+            # Smooth the instantaneous rate so the UI doesn't jitter
+            self.bytes_per_sec = rate if self.bytes_per_sec == 0 else 0.7 * self.bytes_per_sec + 0.3 * rate
+            self._last_time = now
+            self._last_bytes = self.downloaded
+            downloaded, bytes_per_sec = self.downloaded, self.bytes_per_sec
+        self._emit(downloaded, bytes_per_sec)
+
+    def finish(self):
+        """Report the final totals regardless of the rate limit"""
+        with self._lock:
+            downloaded, bytes_per_sec = self.downloaded, self.bytes_per_sec
+        self._emit(downloaded, bytes_per_sec)
+
+    def _emit(self, downloaded: int, bytes_per_sec: float):
+        if self.callback:
+            try:
+                self.callback(downloaded, self.total_bytes, bytes_per_sec)
+            except Exception as e:
+                print(f"ERROR: Progress callback failed: {e}")
+
+
+class DownloadEngine:
+    """Downloads many files concurrently with resumable ranged requests"""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        part_size: int = DEFAULT_PART_SIZE,
+        split_threshold: int = DEFAULT_SPLIT_THRESHOLD,
+        headers: Optional[Dict[str, str]] = None,
+        mirror_headers: Optional[Dict[str, str]] = None,
+        timeout: float = 30.0,
+        rate_limiter: Optional[TokenBucket] = None,
+        connection_slots: Optional[threading.Semaphore] = None
+    ):
+        """
+        Args:
+            max_workers: Maximum number of concurrent HTTP transfers across all files
+            part_size: Size of each ranged request when a file is split
+            split_threshold: Files at least this large are fetched as parallel ranges
+            headers: Extra HTTP headers (e.g. authorization) sent with every request
+            mirror_headers: Headers sent to mirrors instead (e.g. the cluster token)
+            timeout: Socket timeout in seconds for each request
+            rate_limiter: Bandwidth cap shared with other engines
+            connection_slots: Semaphore bounding transfers across all engines that share it
+        """
+        self.max_workers = max(1, max_workers)
+        self.part_size = max(READ_CHUNK_SIZE, part_size)
+        self.split_threshold = split_threshold
+        self.headers = headers or {}
+        self.mirror_headers = mirror_headers or {}
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.connection_slots = connection_slots
+        self._local = threading.local()
+
+    def _session(self) -> 'requests.Session':
+        """One session per worker thread so connections are reused safely"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def _mirror_session(self) -> 'requests.Session':
+        """Per-thread session without the engine headers, so Hub tokens never go to LAN peers"""
+        session = getattr(self._local, 'mirror_session', None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers.update(self.mirror_headers)
+            self._local.mirror_session = session
+        return session
+
+    def _plan_parts(self, task: DownloadTask) -> List[_Part]:
+        """Split a task into byte ranges; part 0 always uses the .incomplete file"""
+        incomplete = task.dest.with_name(task.dest.name + '.incomplete')
+        if task.size <= 0 or task.size < self.split_threshold:
+            end = task.size - 1 if task.size > 0 else -1
+            return [_Part(task, 0, 0, end, incomplete)]
+
+        parts = []
+        for index, start in enumerate(range(0, task.size, self.part_size)):
+            end = min(start + self.part_size, task.size) - 1
+            path = incomplete if index == 0 else task.dest.with_name(f"{task.dest.name}.part{index}")
+            parts.append(_Part(task, index, start, end, path))
+        return parts
+
+    def _fetch_part(self, part: _Part, progress: DownloadProgress, cancel_event: Optional[threading.Event]):
+        """Download (or resume) one byte range into its part file, trying mirrors before the task URL"""
+        import requests
+
+        have = part.path.stat().st_size if part.path.exists() else 0
+        if part.length >= 0 and have > part.length:
+            # Leftover from a run with a different part layout
+            part.path.unlink()
+            have = 0
+        if have:
+            progress.add(have, transferred=False)
+        if part.length >= 0 and have == part.length:
+            return
+
+        # Spread the parts of one file across mirrors so several peers serve it at once
+        mirrors = part.task.mirrors
+        if mirrors:
+            offset = part.index % len(mirrors)
+            for url in mirrors[offset:] + mirrors[:offset]:
+                try:
+                    self._stream(part, url, progress, cancel_event, mirror=True)
+                    return
+                except (requests.RequestException, IOError) as e:
+                    print(f"LOG: Mirror {url} failed for {part.task.filename} part {part.index}: {e}")
+
+        attempt = 0
+        while True:
+            try:
+                self._stream(part, part.task.url, progress, cancel_event)
+                return
+            except (requests.RequestException, IOError) as e:
+                attempt += 1
+                if attempt > MAX_RETRIES or not _is_retryable(e):
+                    raise
+                print(f"LOG: Retrying {part.task.filename} part {part.index} ({attempt}/{MAX_RETRIES}): {e}")
+                time.sleep(min(2 ** attempt, 30))
+
+    def _stream(self, part: _Part, url: str, progress: DownloadProgress, cancel_event: Optional[threading.Event],
+                mirror: bool = False):
+        """
+        Make one request for the rest of a part, appending to its part file
+
+        Mirrors are LAN peers: they get no auth headers and don't count against the bandwidth cap.
+        """
+        have = part.path.stat().st_size if part.path.exists() else 0
+        headers = {}
+        if have or part.end >= 0:
+            end = str(part.end) if part.end >= 0 else ''
+            headers['Range'] = f"bytes={part.start + have}-{end}"
+        session = self._mirror_session() if mirror else self._session()
+        with session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416 and part.end < 0:
+                return  # Unknown-size file that is already complete
+            response.raise_for_status()
+            if 'Range' in headers and response.status_code != 206:
+                if part.start + have > 0:
+                    raise RangeNotSupportedError("Server does not support range requests")
+                # Full body returned for a range starting at 0: keep only what we asked for
+            mode = 'ab' if have else 'wb'
+            with open(part.path, mode) as f:
+                for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise DownloadCancelled()
+                    if not chunk:
+                        continue
+                    if self.rate_limiter is not None and not mirror:
+                        self.rate_limiter.consume(len(chunk))
+                    if part.length >= 0:
+                        chunk = chunk[:part.length - have]
+                    f.write(chunk)
+                    have += len(chunk)
+                    progress.add(len(chunk))
+                    if part.length >= 0 and have >= part.length:
+                        break
+        if part.length >= 0 and have != part.length:
+            raise IOError(f"Connection closed after {have} of {part.length} bytes")
+
+    def _finalize(self, task: DownloadTask):
+        """Join the part files of a task and move it into place"""
+        first = task.parts[0].path
+        if len(task.parts) > 1:
+            with open(first, 'ab') as out:
+                for part in task.parts[1:]:
+                    with open(part.path, 'rb') as src:
+                        while True:
+                            block = src.read(16 * READ_CHUNK_SIZE)
+                            if not block:
+                                break
+                            out.write(block)
+        if task.size > 0 and first.stat().st_size != task.size:
+            raise IOError(f"Size mismatch: expected {task.size} bytes, got {first.stat().st_size}")
+        os.replace(first, task.dest)
+        for part in task.parts[1:]:
+            part.path.unlink(missing_ok=True)
+
+    def download(
+        self,
+        tasks: List[DownloadTask],
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> List[DownloadTask]:
+        """
+        Download all tasks, resuming any partial files left by an earlier run
+
+        Args:
+            tasks: Files to download
+            progress_callback: Optional callback(downloaded_bytes, total_bytes, bytes_per_second)
+            cancel_event: When set, workers stop and leave their partial files for a later resume
+
+        Returns:
+            The tasks, with `error` set on any that failed
+        """
+        progress = DownloadProgress(sum(t.size for t in tasks), progress_callback)
+        lock = threading.Lock()
+        jobs: List[_Part] = []
+
+        # Largest files first so a big shard never starts last and holds up the whole download
+        for task in sorted(tasks, key=lambda t: t.size, reverse=True):
+            task.dest.parent.mkdir(parents=True, exist_ok=True)
+            if task.dest.exists() and (task.size <= 0 or task.dest.stat().st_size == task.size):
+                progress.add(task.dest.stat().st_size, transferred=False)
+                continue
+            task.parts = self._plan_parts(task)
+            task.remaining = len(task.parts)
+            jobs.extend(task.parts)
+
+        def run(part: _Part):
+            task = part.task
+            if task.error:
+                return
+            if cancel_event is not None and cancel_event.is_set():
+                task.error = 'cancelled'
+                return
+            try:
+                if self.connection_slots is not None:
+                    with self.connection_slots:
+                        self._fetch_part(part, progress, cancel_event)
+                else:
+                    self._fetch_part(part, progress, cancel_event)
+            except DownloadCancelled:
+                task.error = 'cancelled'
+                return
+            except Exception as e:
+                task.error = str(e)
+                print(f"ERROR: Failed to download {task.filename}: {e}")
+                return
+            with lock:
+                task.remaining -= 1
+                done = task.remaining == 0
+            if done:
+                try:
+                    self._finalize(task)
+                except Exception as e:
+                    task.error = str(e)
+                    print(f"ERROR: Failed to assemble {task.filename}: {e}")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for future in as_completed([pool.submit(run, job) for job in jobs]):
+                future.result()
+
+        progress.finish()
+        return tasks
@@ -0,0 +1,182 @@
+"""
+Download Planner
+Chooses the subset of a Hugging Face repo that Parallax actually loads: one
+weight format, the configs and tokenizer, and nothing else
+"""
+import fnmatch
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+
+# Weight formats in order of preference, with the patterns that identify them
+WEIGHT_FORMATS = {
+    'safetensors': ['*.safetensors', '*.safetensors.index.json'],
+    'pytorch': ['*.bin', '*.pt', '*.pth', '*.bin.index.json'],
+    'gguf': ['*.gguf'],
+    'onnx': ['*.onnx', '*.onnx_data', 'onnx/*'],
+    'flax': ['*.msgpack', '*.msgpack.index.json'],
+    'tensorflow': ['*.h5', '*.h5.index.json', 'tf_model*'],
+    'openvino': ['openvino/*', '*openvino*'],
+    'coreml': ['*.mlmodel', '*.mlpackage/*', 'coreml/*'],
+    'tflite': ['*.tflite'],
+    'rust': ['*.ot'],
+}
+DEFAULT_FORMAT_PREFERENCE = ['safetensors', 'pytorch']
+_MATCH_ORDER = ['onnx', 'openvino', 'coreml'] + [f for f in WEIGHT_FORMATS if f not in ('onnx', 'openvino', 'coreml')]
+
+# Repo extras Parallax never loads
+DEFAULT_DENY_PATTERNS = [
+    '*.md', '*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.webp', '*.pdf', '*.mp4',
+    '.gitattributes', 'training_args.bin', 'original/*', 'runs/*', 'logs/*',
+]
+
+# Transformer block number in a tensor name: model.layers.12.mlp..., transformer.h.3.attn..., blocks.7...
+_LAYER_RE = re.compile(r'(?:^|\.)(?:layers|layer|h|blocks|block)\.(\d+)\.')
+# Shared tensors only the first slice (embeddings) or the last slice (final norm, head) loads
+_EMBEDDING_RE = re.compile(r'(?:^|\.)(?:embed_tokens|wte|wpe|tok_embeddings|word_embeddings|embeddings)\.')
+_HEAD_RE = re.compile(r'(?:^|\.)(?:lm_head|norm|ln_f|final_layernorm|final_layer_norm|output)\.')
+
+
+@dataclass
+class DownloadPlan:
+    """Files selected for download and what was left out"""
+    weight_format: Optional[str]
+    files: List = field(default_factory=list)  # Hub siblings to download
+    skipped: List = field(default_factory=list)  # Hub siblings left out
+    layer_range: Optional[Tuple[int, int]] = None  # [start, end) of the layers kept, if restricted
+    layer_skipped: List = field(default_factory=list)  # Shards left out only because of layer_range
+
+    @property
+    def planned_bytes(self) -> int:
+        return sum(s.size or 0 for s in self.files)
+
+    @property
+    def skipped_bytes(self) -> int:
+        return sum(s.size or 0 for s in self.skipped)
+
+    @property
+    def layer_skipped_bytes(self) -> int:
+        return sum(s.size or 0 for s in self.layer_skipped)
+
+    def summary(self) -> Dict:
+        return {
+            'weight_format': self.weight_format,
+            'planned_files': [s.rfilename for s in self.files],
+            'skipped_files': [s.rfilename for s in self.skipped],
+            'planned_bytes': self.planned_bytes,
+            'skipped_bytes': self.skipped_bytes,
+            'layer_range': list(self.layer_range) if self.layer_range else None,
+            'layer_skipped_bytes': self.layer_skipped_bytes,
+        }
+
+
+def _matches(filename: str, patterns: Sequence[str]) -> bool:
+    return any(fnmatch.fnmatch(filename, p) for p in patterns)
+
+
+def weight_format_of(filename: str) -> Optional[str]:
+    """The weight format a file belongs to, or None for configs/tokenizers/extras"""
+    # Folder-based formats first: openvino/model.bin is not a PyTorch checkpoint
+    for name in _MATCH_ORDER:
+        if _matches(filename, WEIGHT_FORMATS[name]):
+            return name
+    return None
+
+
+def index_filename(siblings: Sequence, weight_format: str) -> Optional[str]:
+    """The shard index file (e.g. model.safetensors.index.json) for a format, if the repo has one"""
+    for s in siblings:
+        if s.rfilename.endswith('.index.json') and weight_format_of(s.rfilename) == weight_format \
+                and '/' not in s.rfilename:
+            return s.rfilename
+    return None
+
+
+def layer_of(tensor_name: str) -> Optional[int]:
+    """The transformer block a tensor belongs to, or None for shared tensors (embeddings, final norm, head)"""
+    match = _LAYER_RE.search(tensor_name)
+    return int(match.group(1)) if match else None
+
+
+def shards_for_layers(shard_index: Dict, layer_range: Tuple[int, int]) -> Set[str]:
+    """
+    Shards holding the tensors a node serving layers [start, end) needs
+
+    Embeddings go to the first slice and the final norm and head to the last;
+    with tied embeddings (no separate head tensor) the last slice needs the
+    embeddings too. Unrecognised shared tensors are always included.
+    """
+    weight_map = shard_index.get('weight_map', {})
+    layers = [layer for layer in map(layer_of, weight_map) if layer is not None]
+    num_layers = max(layers) + 1 if layers else 0
+    start, end = layer_range
+    is_first, is_last = start <= 0, end >= num_layers
+    tied = not any('lm_head' in tensor.split('.') for tensor in weight_map)
+
+    shards = set()
+    for tensor, shard in weight_map.items():
+        layer = layer_of(tensor)
+        if layer is not None:
+            needed = start <= layer < end
+        elif _EMBEDDING_RE.search(tensor):
+            needed = is_first or (is_last and tied)
+        elif _HEAD_RE.search(tensor):
+            needed = is_last
+        else:
+            needed = True
+        if needed:
+            shards.add(shard)
+    return shards
+
+
+def plan_download(
+    siblings: Sequence,
+    weight_format: Optional[str] = None,
+    allow_patterns: Optional[Sequence[str]] = None,
+    deny_patterns: Optional[Sequence[str]] = None,
+    shard_index: Optional[Dict] = None,
+    layer_range: Optional[Tuple[int, int]] = None
+) -> DownloadPlan:
+    """
+    Select the files to download from a repo listing
+
+    Args:
+        siblings: Hub repo files (objects with rfilename and size)
+        weight_format: Format to keep. Defaults to the first of DEFAULT_FORMAT_PREFERENCE present
+        allow_patterns: If given, only files matching one of these glob patterns are kept
+        deny_patterns: Extra glob patterns to leave out, on top of DEFAULT_DENY_PATTERNS
+        shard_index: Parsed shard index of the chosen format; shards not in its weight_map
+            (e.g. a duplicate consolidated.safetensors) are left out
+        layer_range: Only keep shards holding layers [start, end) plus the shared tensors.
+            Needs shard_index; without one the checkpoint can't be split and is kept whole
+
+    Returns:
+        The plan, with selected and skipped files
+    """
+    present = {weight_format_of(s.rfilename) for s in siblings} - {None}
+    if weight_format is None:
+        weight_format = next((f for f in DEFAULT_FORMAT_PREFERENCE if f in present), None)
+        if weight_format is None and present:
+            # Only an unusual format is available; take it rather than download no weights
+            weight_format = next(f for f in WEIGHT_FORMATS if f in present)
+
+    indexed_shards = set(shard_index.get('weight_map', {}).values()) if shard_index else None
+    layer_shards = shards_for_layers(shard_index, layer_range) if shard_index and layer_range else None
+    deny = list(DEFAULT_DENY_PATTERNS) + list(deny_patterns or [])
+    plan = DownloadPlan(weight_format=weight_format, layer_range=tuple(layer_range) if layer_shards is not None else None)
+
+    for s in siblings:
+        name = s.rfilename
+        fmt = weight_format_of(name)
+        keep = not _matches(name, deny) and (allow_patterns is None or _matches(name, allow_patterns))
+        if keep and fmt is not None:
+            keep = fmt == weight_format
+            if keep and indexed_shards is not None and not name.endswith('.index.json'):
+                keep = name in indexed_shards
+                if keep and layer_shards is not None and name not in layer_shards:
+                    keep = False
+                    plan.layer_skipped.append(s)
+        (plan.files if keep else plan.skipped).append(s)
+
+    return plan
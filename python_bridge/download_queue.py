@@ -0,0 +1,229 @@
+"""
+Download Scheduler
+Persistent priority queue of model downloads with a global concurrency limit,
+shared bandwidth cap, pause/resume and per-item progress with ETA
+"""
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from model_manager import ModelManager
+
+
+DEFAULT_MAX_ACTIVE = 1  # Models downloading at the same time
+
+# on_update(item) is called on every status change; on_progress(model_id, progress) while downloading
+UpdateCallback = Callable[[Dict], None]
+QueueProgressCallback = Callable[[str, Dict], None]
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    """True if a process with this id exists (os.kill(pid, 0) would terminate it on Windows)"""
+    if not pid:
+        return False
+    import psutil
+    return psutil.pid_exists(pid)
+
+
+class DownloadScheduler:
+    """Runs queued downloads from the metadata store, highest priority first"""
+
+    def __init__(
+        self,
+        manager: 'ModelManager',
+        max_active: int = DEFAULT_MAX_ACTIVE,
+        on_update: Optional[UpdateCallback] = None,
+        on_progress: Optional[QueueProgressCallback] = None
+    ):
+        """
+        Args:
+            manager: Model manager whose store holds the queue and which runs the downloads
+            max_active: Maximum number of models downloading at once
+            on_update: Called with the queue item after every status change
+            on_progress: Called with (model_id, progress dict) while an item downloads
+        """
+        self.manager = manager
+        self.store = manager.store
+        self.max_active = max(1, max_active)
+        self.on_update = on_update
+        self.on_progress = on_progress
+        self.paused = False
+        self._active: Dict[str, threading.Event] = {}
+        # Status an active download moves to once stopped: 'paused', 'queued', 'interrupted' or 'removed'
+        self._stop_reason: Dict[str, str] = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Recover items left active by a dead process and start dispatching"""
+        pid = os.getpid()
+        for item in self.store.queue_list():
+            if item['status'] == 'active' and (item['owner_pid'] == pid or not _pid_alive(item['owner_pid'])):
+                self.store.queue_update(item['model_id'], status='queued', owner_pid=None)
+                print(f"LOG: Resuming interrupted download of {item['model_id']}")
+        self._running = True
+        self._thread = threading.Thread(target=self._dispatch, name="download-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop dispatching; active downloads are paused and resume on the next start"""
+        with self._cond:
+            self._running = False
+            for model_id, event in self._active.items():
+                self._stop_reason[model_id] = 'interrupted'
+                event.set()
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _emit(self, model_id: str, **extra):
+        item = self.store.queue_get(model_id)
+        if item and self.on_update:
+            self.on_update({**item, **extra})
+
+    def enqueue(self, model_id: str, priority: int = 0, params: Optional[Dict] = None) -> Dict:
+        """
+        Queue a model download (or change the priority/params of a queued one)
+
+        Args:
+            model_id: Hugging Face model identifier
+            priority: Higher runs first
+            params: Extra download_model keyword arguments (revision, weight_format, patterns)
+        """
+        item = self.store.queue_put(model_id, priority, params)
+        self._emit(model_id)
+        with self._cond:
+            self._cond.notify_all()
+        return item
+
+    def set_priority(self, model_id: str, priority: int) -> bool:
+        if not self.store.queue_get(model_id):
+            return False
+        self.store.queue_update(model_id, priority=priority)
+        self._emit(model_id)
+        with self._cond:
+            self._cond.notify_all()
+        return True
+
+    def pause(self, model_id: Optional[str] = None) -> bool:
+        """Pause one item, or the whole queue when model_id is None. Partial files are kept"""
+        with self._cond:
+            if model_id is None:
+                self.paused = True
+                for active_id, event in self._active.items():
+                    self._stop_reason[active_id] = 'queued'
+                    event.set()
+                return True
+            item = self.store.queue_get(model_id)
+            if not item or item['status'] in ('done', 'paused'):
+                return False
+            if model_id in self._active:
+                self._stop_reason[model_id] = 'paused'
+                self._active[model_id].set()
+            else:
+                self.store.queue_update(model_id, status='paused')
+        self._emit(model_id)
+        return True
+
+    def resume(self, model_id: Optional[str] = None) -> bool:
+        """Resume one paused or failed item, or the whole queue when model_id is None"""
+        with self._cond:
+            if model_id is None:
+                self.paused = False
+            else:
+                item = self.store.queue_get(model_id)
+                if not item or item['status'] not in ('paused', 'failed'):
+                    return False
+                self.store.queue_update(model_id, status='queued', error=None)
+            self._cond.notify_all()
+        if model_id:
+            self._emit(model_id)
+        return True
+
+    def remove(self, model_id: str) -> bool:
+        """Drop an item from the queue, cancelling it if it is downloading"""
+        with self._cond:
+            if model_id in self._active:
+                self._stop_reason[model_id] = 'removed'
+                self._active[model_id].set()
+                return True
+        removed = self.store.queue_remove(model_id)
+        if removed and self.on_update:
+            self.on_update({'model_id': model_id, 'status': 'removed'})
+        return removed
+
+    def list(self) -> List[Dict]:
+        return self.store.queue_list()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while self._running and (self.paused or len(self._active) >= self.max_active):
+                    self._cond.wait()
+                if not self._running:
+                    return
+                item = self.store.queue_claim_next(os.getpid())
+                if item is None:
+                    self._cond.wait(timeout=5)  # Also picks up items queued by other processes
+                    continue
+                cancel_event = threading.Event()
+                self._active[item['model_id']] = cancel_event
+            self._emit(item['model_id'])
+            threading.Thread(
+                target=self._run_item, args=(item, cancel_event),
+                name=f"download-{item['model_id']}", daemon=True
+            ).start()
+
+    def _run_item(self, item: Dict, cancel_event: threading.Event):
+        model_id = item['model_id']
+        started = time.monotonic()
+        last_saved = [0.0]
+
+        def on_progress(downloaded: int, total: int, bytes_per_sec: float):
+            eta = (total - downloaded) / bytes_per_sec if bytes_per_sec > 0 and total else None
+            if self.on_progress:
+                self.on_progress(model_id, {
+                    'downloaded_bytes': downloaded,
+                    'total_bytes': total,
+                    'bytes_per_sec': round(bytes_per_sec, 1),
+                    'eta_seconds': round(eta, 1) if eta is not None else None,
+                    'elapsed_seconds': round(time.monotonic() - started, 1)
+                })
+            # Persist progress occasionally so a restarted UI shows where items stand
+            now = time.monotonic()
+            if now - last_saved[0] > 5:
+                last_saved[0] = now
+                self.store.queue_update(model_id, downloaded_bytes=downloaded, total_bytes=total)
+
+        error = None
+        path = None
+        try:
+            path = self.manager.download_model(model_id, on_progress, cancel_event=cancel_event, **item['params'])
+            if path is None and not cancel_event.is_set():
+                error = "download failed"
+        except Exception as e:
+            error = str(e)
+
+        with self._cond:
+            self._active.pop(model_id, None)
+            reason = self._stop_reason.pop(model_id, None)
+            if reason == 'removed':
+                self.store.queue_remove(model_id)
+            elif reason is not None:
+                # 'interrupted' items go back to queued so they resume on the next start
+                self.store.queue_update(model_id, status='queued' if reason == 'interrupted' else reason,
+                                        owner_pid=None)
+            elif error:
+                self.store.queue_update(model_id, status='failed', error=error, owner_pid=None)
+            else:
+                self.store.queue_update(model_id, status='done', owner_pid=None)
+            self._cond.notify_all()
+
+        if reason == 'removed':
+            if self.on_update:
+                self.on_update({'model_id': model_id, 'status': 'removed'})
+        else:
+            self._emit(model_id, path=path)
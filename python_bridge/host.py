@@ -3,6 +3,13 @@ import os
 import subprocess
 import argparse
 import shutil
+import signal
+import threading
+from typing import List, Sequence
+
+import bridge_events
+from log_relay import LogRelay
+from scheduler_supervisor import DRAIN_TIMEOUT, SchedulerSupervisor
 
 def find_parallax_cli():
     """Find the parallax CLI, checking venv first"""
@@ -29,49 +36,97 @@ def find_parallax_cli():
     # Finally check system PATH
     return shutil.which("parallax")
 
+def start_prewarm(model_id):
+    """Warm the model's shards into the page cache in the background while the scheduler starts"""
+    def run():
+        try:
+            from model_manager import ModelManager
+            report = ModelManager().prewarm_model(model_id)
+        except Exception as e:
+            print(f"PYTHON_BRIDGE: Prewarm skipped: {e}")
+            sys.stdout.flush()
+            return
+        if report:
+            print(f"PYTHON_BRIDGE: Prewarmed {report['warmed_bytes'] / (1024 * 1024):.0f} MB of {model_id} "
+                  f"in {report['seconds']}s ({report['mb_per_sec']} MB/s)")
+            sys.stdout.flush()
+
+    thread = threading.Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+def scheduler_command(parallax_path: str, model: str, nodes: int = 1, host: str = "0.0.0.0",
+                      extra: Sequence[str] = ()) -> List[str]:
+    """The `parallax run` command for a scheduler serving the model"""
+    # parallax run -m {model} -n {nodes} --host 0.0.0.0
+    return [
+        parallax_path, "run",
+        "-m", model,
+        "-n", str(nodes),
+        "--host", host,
+        "-u",  # Disable usage telemetry
+    ] + list(extra)
+
+def print_parallax_missing():
+    print("PYTHON_BRIDGE: ERROR - Parallax CLI not found!")
+    print("PYTHON_BRIDGE: Please install Parallax first:")
+    print("PYTHON_BRIDGE:   cd parallax-i-need-a-spark")
+    print("PYTHON_BRIDGE:   ./install.sh")
+    print("PYTHON_BRIDGE: Or manually:")
+    print("PYTHON_BRIDGE:   source parallax/venv/bin/activate")
+    print("PYTHON_BRIDGE:   pip install -e './parallax[mac]'")
+
+def announce_scheduler(cmd: List[str], model: str, nodes: int):
+    print(f"PYTHON_BRIDGE: Starting Parallax Scheduler...")
+    print(f"PYTHON_BRIDGE: Model: {model}")
+    print(f"PYTHON_BRIDGE: Expected nodes: {nodes}")
+    print(f"PYTHON_BRIDGE: Command: {' '.join(cmd)}")
+    print(f"PYTHON_BRIDGE: ")
+    print(f"PYTHON_BRIDGE: The Parallax setup UI will be available at http://localhost:3001")
+    print(f"PYTHON_BRIDGE: The chat API will be at http://localhost:3001/v1/chat/completions")
+    print(f"PYTHON_BRIDGE: ")
+    sys.stdout.flush()
+
 def main():
     parser = argparse.ArgumentParser(description="Start Parallax Host (Scheduler)")
     parser.add_argument("--model", type=str, default="Qwen/Qwen3-0.6B", help="Model to load")
     parser.add_argument("--nodes", type=int, default=1, help="Number of worker nodes expected")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host to bind to (0.0.0.0 for network access)")
+    parser.add_argument("--no-prewarm", action="store_true", help="Don't read the model into the page cache before it loads")
+    parser.add_argument("--no-supervise", action="store_true", help="Run the scheduler once, without health checks or restarts")
+    parser.add_argument("--ready-timeout", type=float, default=0,
+                        help="Restart the scheduler if it isn't serving completions after this many seconds (0 waits forever)")
+    parser.add_argument("--drain-timeout", type=float, default=DRAIN_TIMEOUT,
+                        help="Seconds the scheduler gets to finish requests on shutdown")
     args, unknown = parser.parse_known_args()
 
     # Check if parallax CLI is available
     parallax_path = find_parallax_cli()
     
     if not parallax_path:
-        print("PYTHON_BRIDGE: ERROR - Parallax CLI not found!")
-        print("PYTHON_BRIDGE: Please install Parallax first:")
-        print("PYTHON_BRIDGE:   cd parallax-i-need-a-spark")
-        print("PYTHON_BRIDGE:   ./install.sh")
-        print("PYTHON_BRIDGE: Or manually:")
-        print("PYTHON_BRIDGE:   source parallax/venv/bin/activate")
-        print("PYTHON_BRIDGE:   pip install -e './parallax[mac]'")
+        print_parallax_missing()
         sys.exit(1)
     
     print(f"PYTHON_BRIDGE: Found Parallax CLI at: {parallax_path}")
-    
-    print(f"PYTHON_BRIDGE: Found Parallax CLI at: {parallax_path}")
 
     # Use the Parallax CLI to run the scheduler
-    # parallax run -m {model} -n {nodes} --host 0.0.0.0
-    cmd = [
-        parallax_path, "run",
-        "-m", args.model,
-        "-n", str(args.nodes),
-        "--host", args.host,
-        "-u",  # Disable usage telemetry
-    ] + unknown
+    cmd = scheduler_command(parallax_path, args.model, args.nodes, args.host, unknown)
+    announce_scheduler(cmd, args.model, args.nodes)
 
-    print(f"PYTHON_BRIDGE: Starting Parallax Scheduler...")
-    print(f"PYTHON_BRIDGE: Model: {args.model}")
-    print(f"PYTHON_BRIDGE: Expected nodes: {args.nodes}")
-    print(f"PYTHON_BRIDGE: Command: {' '.join(cmd)}")
-    print(f"PYTHON_BRIDGE: ")
-    print(f"PYTHON_BRIDGE: The Parallax setup UI will be available at http://localhost:3001")
-    print(f"PYTHON_BRIDGE: The chat API will be at http://localhost:3001/v1/chat/completions")
-    print(f"PYTHON_BRIDGE: ")
-    sys.stdout.flush()
+    if not args.no_prewarm:
+        start_prewarm(args.model)
+
+    if not args.no_supervise:
+        supervisor = SchedulerSupervisor(cmd, args.model, ready_timeout=args.ready_timeout,
+                                         drain_timeout=args.drain_timeout)
+        signal.signal(signal.SIGTERM, lambda *_: supervisor.stop())
+        signal.signal(signal.SIGINT, lambda *_: supervisor.stop())
+        try:
+            sys.exit(supervisor.run())
+        except FileNotFoundError:
+            print("PYTHON_BRIDGE: ERROR - Could not run 'parallax' command")
+            print("PYTHON_BRIDGE: Make sure Parallax is installed and in your PATH")
+            sys.exit(1)
 
     try:
         # Run the process and stream output
@@ -79,15 +134,12 @@ def main():
             cmd, 
             stdout=subprocess.PIPE, 
             stderr=subprocess.STDOUT, 
-            text=True, 
-            bufsize=1
+            bufsize=0
         )
 
-        for line in process.stdout:
-            print(line, end='')
-            sys.stdout.flush()
-
+        relay = LogRelay(process.stdout).start()
         process.wait()
+        relay.join()
     except FileNotFoundError:
         print("PYTHON_BRIDGE: ERROR - Could not run 'parallax' command")
         print("PYTHON_BRIDGE: Make sure Parallax is installed and in your PATH")
@@ -96,4 +148,5 @@ def main():
         process.terminate()
 
 if __name__ == "__main__":
+    bridge_events.install("host")
     main()
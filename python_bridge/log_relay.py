@@ -0,0 +1,235 @@
+"""
+Log Relay
+Copies a child process's output to Electron without ever making the child
+wait: output is read in large chunks, sent as one log event per batch, and
+thinned out when it arrives faster than it can be written. Known Parallax log
+lines are also turned into structured events
+"""
+import codecs
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import IO, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from bridge_events import EventStream, get_stream
+
+RELAY_CHUNK_SIZE = 64 * 1024
+FLUSH_INTERVAL = 0.05  # Seconds output is batched before one write and flush
+# When writing a batch takes longer than FLUSH_INTERVAL our reader is falling behind,
+# so only every SAMPLE_EVERY-th ordinary line is kept; past DROP_AFTER seconds
+# (or DROP_ABOVE bytes waiting) none are
+SAMPLE_EVERY = 10
+DROP_AFTER = 1.0
+DROP_ABOVE = 4 * 1024 * 1024
+# The reader discards chunks rather than queue more than this for the writer
+MAX_PENDING_BYTES = 2 * DROP_ABOVE
+
+# Lines kept however far behind the relay is
+_IMPORTANT_RE = re.compile(r'error|exception|traceback|warn|fatal|critical', re.IGNORECASE)
+
+# Words at least one parser needs; lines without any skip the parsers, which
+# matters because almost every line relayed is one of those
+_KEYWORDS = ('%', 'allocat', 'assign', '/s', 'tps', 'join', 'connected', 'left', 'leaves', 'removed', 'timed out')
+_CANDIDATE_RE = re.compile('|'.join(map(re.escape, _KEYWORDS)), re.IGNORECASE)
+_NUMBER = r'(\d+(?:\.\d+)?)'
+_PARSERS = [
+    # "Loading checkpoint shards:  50%|#####     | 1/2" and "Loading model ... 42%"
+    ('model_load', re.compile(r'\bloading.*?(?:model|weights|checkpoint|shards?).*?' + _NUMBER + r'\s*%', re.IGNORECASE),
+     lambda m: {'percent': float(m.group(1))}),
+    # "allocated layers [0, 14)" / "assigned layers 0-13" with an optional node id before it
+    ('layer_allocation', re.compile(
+        r'(?:node\s+(?P<node>[\w.:-]+).*?)?(?:allocat|assign)\w*.*?layers?\s*[\[(]?\s*(?P<start>\d+)\s*(?:,|-|to)\s*(?P<end>\d+)',
+        re.IGNORECASE),
+     lambda m: {'node': m.group('node'), 'start_layer': int(m.group('start')), 'end_layer': int(m.group('end'))}),
+    ('throughput', re.compile(_NUMBER + r'\s*(?:tokens?/s(?:ec)?|tok/s|tps)\b', re.IGNORECASE),
+     lambda m: {'tokens_per_sec': float(m.group(1))}),
+    ('node_join', re.compile(r'node\s+(?P<node>[\w.:-]+)\s+(?:has\s+)?(?:joined|join(?:ed)?\s+the|connected)', re.IGNORECASE),
+     lambda m: {'node': m.group('node')}),
+    ('node_leave', re.compile(r'node\s+(?P<node>[\w.:-]+)\s+(?:has\s+)?(?:left|leaves|disconnected|removed|timed out)',
+                              re.IGNORECASE),
+     lambda m: {'node': m.group('node')}),
+]
+# Only the latest of these matters, so a burst is coalesced into one event
+_COALESCED_EVENTS = ('model_load', 'throughput')
+
+
+def parse_parallax_line(line: str) -> Optional[Dict]:
+    """Structured event for a recognised Parallax log line, or None"""
+    if not _CANDIDATE_RE.search(line):
+        return None
+    for event_type, pattern, build in _PARSERS:
+        match = pattern.search(line)
+        if match:
+            return {'type': event_type, **build(match)}
+    return None
+
+
+class LogRelay:
+    """
+    Relays one binary stream to stdout on background threads
+
+    The reader thread only moves raw chunks off the pipe, so the child never
+    waits on us. The writer thread parses each batch, thins it if stdout is
+    keeping it waiting, and sends it as one log event. Parsed events follow
+    the batch they came from.
+    """
+
+    def __init__(
+        self,
+        stream: IO[bytes],
+        events: Optional[EventStream] = None,
+        source: str = "parallax",
+        on_event: Optional[Callable[[Dict], None]] = None
+    ):
+        """
+        Args:
+            stream: Unbuffered binary pipe to read (Popen(..., stdout=PIPE) without text=True)
+            events: Stream the lines and parsed 'parallax' events go to; the process-wide one by default
+            source: Name put on the relayed log events
+            on_event: Also called with each parsed event
+        """
+        self.stream = stream
+        self.events = events or get_stream()
+        self.source = source
+        self.on_event = on_event
+        self.lines = 0
+        self.dropped = 0
+        self.dropped_bytes = 0
+        self.event_count = 0
+        self._chunks: Deque[bytes] = deque()
+        self._pending_bytes = 0
+        self._gap = False  # Chunks were discarded since the last one queued
+        # Multibyte characters can straddle two reads
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._cond = threading.Condition()
+        self._eof = False
+        self._sample_counter = 0
+        self._reader = threading.Thread(target=self._read, name="log-relay-read", daemon=True)
+        self._writer = threading.Thread(target=self._write, name="log-relay-write", daemon=True)
+
+    def start(self) -> 'LogRelay':
+        self._reader.start()
+        self._writer.start()
+        return self
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for the stream to close and everything read to be written"""
+        self._reader.join(timeout)
+        self._writer.join(timeout)
+
+    def _read(self):
+        fd = self.stream.fileno()
+        try:
+            while True:
+                chunk = os.read(fd, RELAY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                with self._cond:
+                    if self._pending_bytes + len(chunk) > MAX_PENDING_BYTES:
+                        # The writer is this far behind; drop output rather than grow without bound
+                        self.dropped_bytes += len(chunk)
+                        self._gap = True
+                        continue
+                    if self._gap:
+                        # Don't splice the line fragments either side of the gap into one
+                        chunk = b'\n' + chunk
+                        self._gap = False
+                    self._chunks.append(chunk)
+                    self._pending_bytes += len(chunk)
+                    self._cond.notify()
+        except OSError:
+            pass
+        with self._cond:
+            self._eof = True
+            self._cond.notify()
+
+    def _parse(self, text: str) -> List[Tuple[str, Dict]]:
+        """Every line in a batch that parses to an event, with its event"""
+        # Plain substring searches over the whole batch are far cheaper than
+        # a regex per line, and leave only a handful of lines to parse
+        lowered = text.lower()
+        line_starts = set()
+        for keyword in _KEYWORDS:
+            hit = lowered.find(keyword)
+            while hit >= 0:
+                line_starts.add(lowered.rfind('\n', 0, hit) + 1)
+                hit = lowered.find(keyword, hit + 1)
+        parsed = []
+        for start in sorted(line_starts):
+            end = text.find('\n', start)
+            line = text[start:end if end >= 0 else len(text)]
+            event = parse_parallax_line(line)
+            if event is not None:
+                parsed.append((line, event))
+        return parsed
+
+    def _thin(self, lines: List[str], drop_all: bool, parsed: Set[str]) -> List[str]:
+        """Keep important lines and lines that parsed to an event, and a sample (or none) of the rest"""
+        kept = []
+        for line in lines:
+            if line in parsed or _IMPORTANT_RE.search(line):
+                kept.append(line)
+                continue
+            self._sample_counter += 1
+            if not drop_all and self._sample_counter % SAMPLE_EVERY == 0:
+                kept.append(line)
+            else:
+                self.dropped += 1
+        return kept
+
+    def _write(self):
+        partial = ''
+        write_seconds = 0.0
+        reported_discarded = 0
+        while True:
+            with self._cond:
+                while not self._chunks and not self._eof:
+                    self._cond.wait()
+                eof = self._eof
+                chunks = list(self._chunks)
+                self._chunks.clear()
+                self._pending_bytes = 0
+                discarded = self.dropped_bytes - reported_discarded
+                reported_discarded = self.dropped_bytes
+            data = b''.join(chunks)
+            # tqdm redraws progress bars with bare \r, so those end lines too
+            text = (partial + self._decoder.decode(data, final=eof)).replace('\r\n', '\n').replace('\r', '\n')
+            if eof:
+                partial = ''
+            else:
+                cut = text.rfind('\n') + 1
+                text, partial = text[:cut], text[cut:]
+            lines = [line for line in text.split('\n') if line]
+            self.lines += len(lines)
+
+            parsed = self._parse(text)
+
+            # Thin out only when the last write was slow, i.e. stdout is the bottleneck
+            skipped = 0
+            if write_seconds > FLUSH_INTERVAL or len(data) > DROP_ABOVE:
+                dropped = self.dropped
+                lines = self._thin(lines, drop_all=write_seconds > DROP_AFTER or len(data) > DROP_ABOVE,
+                                   parsed={line for line, _ in parsed})
+                skipped = self.dropped - dropped
+            if lines:
+                self.events.emit('log', {'level': 'info', 'source': self.source, 'lines': lines})
+            for _, event in parsed:
+                self.event_count += 1
+                if self.on_event:
+                    self.on_event(event)
+                self.events.emit('parallax', event,
+                                 key=event['type'] if event['type'] in _COALESCED_EVENTS else None)
+            if skipped:
+                self.events.log(f"Log relay skipped {skipped} line(s) to keep up", source=self.source)
+            if discarded:
+                self.events.log(f"Log relay discarded {discarded / 1024:.0f} KB of output to keep up",
+                                source=self.source)
+            started = time.monotonic()
+            self.events.flush()
+            write_seconds = time.monotonic() - started
+            if eof:
+                return
+            # Let more output accumulate so each write and flush carries a batch
+            time.sleep(FLUSH_INTERVAL)
@@ -0,0 +1,386 @@
+"""
+Model Metadata Store
+Transactional SQLite (WAL) store for downloaded models and their files, safe to
+share between several model manager processes
+"""
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Each entry upgrades the schema by one version (tracked in PRAGMA user_version)
+SCHEMA_MIGRATIONS = [
+    """
+    CREATE TABLE models (
+        model_id TEXT PRIMARY KEY,
+        model_dir TEXT NOT NULL,
+        revision TEXT,
+        download_date TEXT
+    );
+    CREATE TABLE files (
+        model_id TEXT NOT NULL REFERENCES models(model_id) ON DELETE CASCADE,
+        filename TEXT NOT NULL,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (model_id, filename)
+    );
+    CREATE INDEX idx_files_model_id ON files(model_id);
+    """,
+    # Content-addressed blobs: files sharing a blob_key share one copy on disk
+    """
+    ALTER TABLE files ADD COLUMN blob_key TEXT;
+    CREATE INDEX idx_files_blob_key ON files(blob_key);
+    """,
+    # Integrity manifest: known content hash plus the mtime at which it was last checked
+    """
+    ALTER TABLE files ADD COLUMN sha256 TEXT;
+    ALTER TABLE files ADD COLUMN hashed_mtime REAL;
+    """,
+    # Cache policy: recency for LRU eviction, plus models that must never be evicted
+    """
+    ALTER TABLE models ADD COLUMN last_used REAL;
+    ALTER TABLE models ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE models ADD COLUMN is_active INTEGER NOT NULL DEFAULT 0;
+    """,
+    # Cached on-disk size, valid while the model directory's mtime is unchanged
+    """
+    ALTER TABLE models ADD COLUMN size_bytes INTEGER;
+    ALTER TABLE models ADD COLUMN size_dir_mtime REAL;
+    """,
+    # Download plan settings (revision, weight format, patterns) as JSON
+    """
+    ALTER TABLE models ADD COLUMN plan TEXT;
+    """,
+    # Persistent download queue
+    """
+    CREATE TABLE download_queue (
+        model_id TEXT PRIMARY KEY,
+        priority INTEGER NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'queued',
+        params TEXT,
+        enqueued_at REAL NOT NULL,
+        owner_pid INTEGER,
+        downloaded_bytes INTEGER NOT NULL DEFAULT 0,
+        total_bytes INTEGER NOT NULL DEFAULT 0,
+        error TEXT
+    );
+    CREATE INDEX idx_download_queue_status ON download_queue(status, priority);
+    """,
+    # Layer-slice downloads: only some of the checkpoint's shards are on disk
+    """
+    ALTER TABLE models ADD COLUMN partial INTEGER NOT NULL DEFAULT 0;
+    """,
+    # Cached size is valid while no directory under the model changed, not just the top one
+    """
+    ALTER TABLE models ADD COLUMN size_dir_mtimes TEXT;
+    """,
+]
+
+
+class MetadataStore:
+    """Per-model and per-file metadata backed by SQLite in WAL mode"""
+
+    def __init__(self, db_path: Path, legacy_json: Optional[Path] = None):
+        """
+        Args:
+            db_path: SQLite database file
+            legacy_json: Old models_metadata.json to import once, if present
+        """
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._migrate_schema()
+        if legacy_json is not None and legacy_json.exists():
+            self._import_legacy_json(legacy_json)
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; sqlite3 connections can't be shared across threads"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run statements atomically; BEGIN IMMEDIATE serializes writers across processes"""
+        conn = self._connection()
+        if conn.in_transaction:
+            # Nested: the outermost transaction commits or rolls back
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _migrate_schema(self):
+        with self.transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for index, script in enumerate(SCHEMA_MIGRATIONS[version:], start=version):
+                for statement in script.split(';'):
+                    if statement.strip():
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {index + 1}")
+
+    def _import_legacy_json(self, legacy_json: Path):
+        """One-time migration from models_metadata.json; the file is renamed afterwards"""
+        try:
+            with open(legacy_json, 'r') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"LOG: Could not read legacy metadata {legacy_json}: {e}")
+            return
+
+        with self.transaction() as conn:
+            for model_id, info in legacy.items():
+                # Don't overwrite anything another process already migrated or downloaded
+                if conn.execute("SELECT 1 FROM models WHERE model_id = ?", (model_id,)).fetchone():
+                    continue
+                self._write_model(conn, model_id, info['model_dir'], info.get('revision'),
+                                  info.get('download_date'), info.get('files', []))
+
+        try:
+            legacy_json.rename(legacy_json.with_suffix('.json.migrated'))
+        except OSError:
+            pass  # Another process got there first
+        print(f"LOG: Migrated {len(legacy)} model(s) from {legacy_json.name}")
+
+    @staticmethod
+    def _write_model(conn: sqlite3.Connection, model_id: str, model_dir: str, revision: Optional[str],
+                     download_date: Optional[str], files: List[Dict], plan: Optional[Dict] = None,
+                     partial: bool = False):
+        # A slice added to a full checkpoint leaves it full, keeping the full download's plan
+        conn.execute(
+            """INSERT INTO models (model_id, model_dir, revision, download_date, plan, partial)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(model_id) DO UPDATE SET
+                   model_dir = excluded.model_dir,
+                   revision = excluded.revision,
+                   download_date = excluded.download_date,
+                   plan = CASE WHEN excluded.partial AND NOT partial THEN plan ELSE COALESCE(excluded.plan, plan) END,
+                   partial = MIN(partial, excluded.partial),
+                   size_bytes = NULL""",
+            (model_id, model_dir, revision, download_date, json.dumps(plan) if plan is not None else None,
+             int(partial))
+        )
+        conn.executemany(
+            """INSERT INTO files (model_id, filename, path, size, blob_key, sha256, hashed_mtime)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(model_id, filename) DO UPDATE SET
+                   path = excluded.path,
+                   size = excluded.size,
+                   blob_key = excluded.blob_key,
+                   sha256 = excluded.sha256,
+                   hashed_mtime = excluded.hashed_mtime""",
+            [(model_id, f['filename'], f['path'], f.get('size', 0), f.get('blob_key'),
+              f.get('sha256'), f.get('hashed_mtime')) for f in files]
+        )
+
+    def save_model(self, model_id: str, model_dir: str, revision: Optional[str],
+                   download_date: Optional[str], files: List[Dict], replace_files: bool = True,
+                   plan: Optional[Dict] = None, partial: bool = False) -> List[str]:
+        """
+        Record a model and its files
+
+        Args:
+            replace_files: Drop file rows not in `files`. Pass False to add or update rows only
+            plan: Download plan settings to remember (kept unchanged when None)
+            partial: `files` are a layer slice, not the whole checkpoint. A model
+                stays partial until a full download is recorded
+
+        Returns:
+            Blob keys the replaced rows pointed at that are no longer referenced
+        """
+        with self.transaction() as conn:
+            old_keys = []
+            if replace_files:
+                old_keys = [row[0] for row in conn.execute(
+                    "SELECT DISTINCT blob_key FROM files WHERE model_id = ? AND blob_key IS NOT NULL", (model_id,)
+                )]
+                conn.execute("DELETE FROM files WHERE model_id = ?", (model_id,))
+            self._write_model(conn, model_id, model_dir, revision, download_date, files, plan, partial)
+            return [key for key in old_keys if self._blob_refcount(conn, key) == 0]
+
+    def delete_model(self, model_id: str) -> Optional[List[str]]:
+        """
+        Remove a model and its files
+
+        Returns:
+            Blob keys that no other model references any more (safe to free),
+            or None if the model wasn't recorded
+        """
+        with self.transaction() as conn:
+            keys = [row[0] for row in conn.execute(
+                "SELECT DISTINCT blob_key FROM files WHERE model_id = ? AND blob_key IS NOT NULL", (model_id,)
+            )]
+            if conn.execute("DELETE FROM models WHERE model_id = ?", (model_id,)).rowcount == 0:
+                return None
+            return [key for key in keys if self._blob_refcount(conn, key) == 0]
+
+    @staticmethod
+    def _blob_refcount(conn: sqlite3.Connection, blob_key: str) -> int:
+        return conn.execute("SELECT COUNT(*) FROM files WHERE blob_key = ?", (blob_key,)).fetchone()[0]
+
+    def unreferenced_blobs(self, blob_keys: List[str]) -> List[str]:
+        """Blob keys no model file points at; only stable for as long as a transaction() is held"""
+        conn = self._connection()
+        return [key for key in blob_keys if self._blob_refcount(conn, key) == 0]
+
+    def blob_refcount(self, blob_key: str) -> int:
+        """Number of model files that point at a blob"""
+        return self._blob_refcount(self._connection(), blob_key)
+
+    def get_model(self, model_id: str) -> Optional[Dict]:
+        """Get the model row, or None"""
+        row = self._connection().execute("SELECT * FROM models WHERE model_id = ?", (model_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get_files(self, model_id: str) -> List[Dict]:
+        """Get all file rows for a model"""
+        rows = self._connection().execute(
+            "SELECT filename, path, size, blob_key, sha256, hashed_mtime FROM files WHERE model_id = ? ORDER BY filename",
+            (model_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def record_file_hashes(self, model_id: str, hashes: List[Dict]):
+        """Store verified content hashes ({'filename', 'sha256', 'hashed_mtime'}) for a model's files"""
+        with self.transaction() as conn:
+            conn.executemany(
+                "UPDATE files SET sha256 = ?, hashed_mtime = ? WHERE model_id = ? AND filename = ?",
+                [(h['sha256'], h['hashed_mtime'], model_id, h['filename']) for h in hashes]
+            )
+
+    def get_blob_paths(self, blob_key: str) -> List[str]:
+        """Paths of every model file that is a view of a blob"""
+        rows = self._connection().execute("SELECT path FROM files WHERE blob_key = ?", (blob_key,)).fetchall()
+        return [row[0] for row in rows]
+
+    def touch_model(self, model_id: str, when: Optional[float] = None):
+        """Mark a model as used now (or at `when`)"""
+        with self.transaction() as conn:
+            conn.execute("UPDATE models SET last_used = ? WHERE model_id = ?", (when or time.time(), model_id))
+
+    def set_pinned(self, model_id: str, pinned: bool) -> bool:
+        """Pin or unpin a model. Returns False if it isn't recorded"""
+        with self.transaction() as conn:
+            return conn.execute(
+                "UPDATE models SET pinned = ? WHERE model_id = ?", (int(pinned), model_id)
+            ).rowcount > 0
+
+    def set_active_model(self, model_id: Optional[str]):
+        """Make one model the active one (None clears it)"""
+        with self.transaction() as conn:
+            conn.execute("UPDATE models SET is_active = 0 WHERE is_active = 1")
+            if model_id:
+                conn.execute("UPDATE models SET is_active = 1, last_used = ? WHERE model_id = ?",
+                             (time.time(), model_id))
+
+    def file_blobs(self) -> List[Tuple[str, Optional[str], int]]:
+        """(model_id, blob_key, size) of every recorded file, for working out what deleting models frees"""
+        return [tuple(row) for row in self._connection().execute("SELECT model_id, blob_key, size FROM files")]
+
+    def total_bytes(self) -> int:
+        """Recorded bytes on disk across all models, counting each shared blob once"""
+        return self._connection().execute(
+            """SELECT COALESCE(SUM(size), 0) FROM (
+                   SELECT MAX(size) AS size FROM files WHERE blob_key IS NOT NULL GROUP BY blob_key
+                   UNION ALL
+                   SELECT size FROM files WHERE blob_key IS NULL
+               )"""
+        ).fetchone()[0]
+
+    def set_model_size(self, model_id: str, size_bytes: int, dir_mtimes: Dict[str, float]):
+        """Cache a model's measured size with the mtime of every directory under it (keyed by relative path)"""
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE models SET size_bytes = ?, size_dir_mtime = ?, size_dir_mtimes = ? WHERE model_id = ?",
+                (size_bytes, dir_mtimes.get('.'), json.dumps(dir_mtimes), model_id)
+            )
+
+    @staticmethod
+    def _queue_row(row: sqlite3.Row) -> Dict:
+        item = dict(row)
+        item['params'] = json.loads(item['params']) if item['params'] else {}
+        return item
+
+    def queue_put(self, model_id: str, priority: int = 0, params: Optional[Dict] = None) -> Dict:
+        """Add a model to the download queue, or requeue it with a new priority and params"""
+        with self.transaction() as conn:
+            conn.execute(
+                """INSERT INTO download_queue (model_id, priority, status, params, enqueued_at)
+                   VALUES (?, ?, 'queued', ?, ?)
+                   ON CONFLICT(model_id) DO UPDATE SET
+                       priority = excluded.priority,
+                       params = excluded.params,
+                       status = CASE WHEN status = 'active' THEN status ELSE 'queued' END,
+                       error = NULL""",
+                (model_id, priority, json.dumps(params or {}), time.time())
+            )
+            return self._queue_row(conn.execute(
+                "SELECT * FROM download_queue WHERE model_id = ?", (model_id,)).fetchone())
+
+    def queue_claim_next(self, owner_pid: int) -> Optional[Dict]:
+        """Atomically mark the highest-priority queued item active and return it"""
+        with self.transaction() as conn:
+            row = conn.execute(
+                """SELECT * FROM download_queue WHERE status = 'queued'
+                   ORDER BY priority DESC, enqueued_at LIMIT 1"""
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE download_queue SET status = 'active', owner_pid = ? WHERE model_id = ?",
+                         (owner_pid, row['model_id']))
+            item = self._queue_row(row)
+            item.update(status='active', owner_pid=owner_pid)
+            return item
+
+    def queue_update(self, model_id: str, **fields):
+        """Update columns of a queue item"""
+        if 'params' in fields:
+            fields['params'] = json.dumps(fields['params'])
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        with self.transaction() as conn:
+            conn.execute(f"UPDATE download_queue SET {assignments} WHERE model_id = ?",
+                         (*fields.values(), model_id))
+
+    def queue_get(self, model_id: str) -> Optional[Dict]:
+        row = self._connection().execute("SELECT * FROM download_queue WHERE model_id = ?", (model_id,)).fetchone()
+        return self._queue_row(row) if row else None
+
+    def queue_list(self) -> List[Dict]:
+        """All queue items, active first, then by priority and age"""
+        rows = self._connection().execute(
+            """SELECT * FROM download_queue
+               ORDER BY status = 'active' DESC, priority DESC, enqueued_at"""
+        ).fetchall()
+        return [self._queue_row(row) for row in rows]
+
+    def queue_remove(self, model_id: str) -> bool:
+        with self.transaction() as conn:
+            return conn.execute("DELETE FROM download_queue WHERE model_id = ?", (model_id,)).rowcount > 0
+
+    def list_models(self) -> List[Dict]:
+        """Get every model with its file count and recorded total size"""
+        rows = self._connection().execute(
+            """SELECT m.*, COUNT(f.filename) AS files_count, COALESCE(SUM(f.size), 0) AS total_size
+               FROM models m LEFT JOIN files f ON f.model_id = m.model_id
+               GROUP BY m.model_id ORDER BY m.model_id"""
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def __contains__(self, model_id: str) -> bool:
+        return self._connection().execute(
+            "SELECT 1 FROM models WHERE model_id = ?", (model_id,)
+        ).fetchone() is not None
@@ -4,23 +4,52 @@ Handles downloading, caching, and managing AI models from Hugging Face
 """
 import os
 import json
+import shutil
 import hashlib
+import sys
+import threading
+import time
+from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Optional, Callable
-from huggingface_hub import hf_hub_download, list_repo_files, model_info, HfApi
-from tqdm import tqdm
-import requests
+from typing import TYPE_CHECKING, Dict, List, Optional, Callable, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from download_engine import DownloadEngine, DownloadTask, ProgressCallback, TokenBucket, DEFAULT_MAX_WORKERS
+from download_planner import DownloadPlan, index_filename, plan_download
+from blob_store import BlobStore, hash_file, is_sha256_key
+from metadata_store import MetadataStore
+from peer_share import BlobServer, DEFAULT_BLOB_PORT, TOKEN_HEADER, cluster_token, find_blobs_on_peers
+from prewarm import DEFAULT_PREWARM_WORKERS, PrewarmCallback, hf_cache_files, prewarm_files, weight_files_first
+
+if TYPE_CHECKING:
+    from huggingface_hub import HfApi
+
+CATALOG_TTL_SECONDS = 15 * 60  # How long a browse listing is served from cache
+CATALOG_FETCH_WORKERS = 8  # Concurrent model_info requests when revalidating
+DEFAULT_MAX_CONNECTIONS = 8  # Concurrent transfers across all downloads
 
 
 class ModelManager:
     """Manages AI model downloads and local cache"""
 
-    def __init__(self, cache_dir: Optional[str] = None):
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_download_workers: int = DEFAULT_MAX_WORKERS,
+        cache_budget_bytes: Optional[int] = None,
+        bandwidth_limit_bytes: Optional[float] = None,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS
+    ):
         """
         Initialize the model manager
 
         Args:
             cache_dir: Directory to store downloaded models. Defaults to ~/.cache/spark-models
+            max_download_workers: Maximum number of concurrent file transfers per download
+            cache_budget_bytes: Disk budget for cached models. Defaults to $SPARK_MODEL_CACHE_GB, or unlimited
+            bandwidth_limit_bytes: Bytes per second shared by all downloads. Defaults to
+                $SPARK_DOWNLOAD_MAX_MB_PER_SEC, or unlimited
+            max_connections: Concurrent transfers across all downloads running at once
         """
         if cache_dir is None:
             self.cache_dir = Path.home() / ".cache" / "spark-models"
@@ -28,81 +57,195 @@ class ModelManager:
             self.cache_dir = Path(cache_dir)
 
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self.metadata_file = self.cache_dir / "models_metadata.json"
-        self.metadata = self._load_metadata()
-        self.api = HfApi()
-
-    def _load_metadata(self) -> Dict:
-        """Load metadata about downloaded models"""
-        if self.metadata_file.exists():
-            with open(self.metadata_file, 'r') as f:
-                return json.load(f)
-        return {}
-
-    def _save_metadata(self):
-        """Save metadata about downloaded models"""
-        with open(self.metadata_file, 'w') as f:
-            json.dump(self.metadata, f, indent=2)
-
-    def get_popular_models(self, task: str = "text-generation", limit: int = 20) -> List[Dict]:
+        self.store = MetadataStore(
+            self.cache_dir / "models_metadata.db",
+            legacy_json=self.cache_dir / "models_metadata.json"
+        )
+        self.blobs = BlobStore(self.cache_dir / "blobs")
+        self.catalog_file = self.cache_dir / "catalog_cache.json"
+        self._api: Optional['HfApi'] = None
+        self.max_download_workers = max_download_workers
+
+        if cache_budget_bytes is None and os.environ.get("SPARK_MODEL_CACHE_GB"):
+            cache_budget_bytes = int(float(os.environ["SPARK_MODEL_CACHE_GB"]) * 1024 ** 3)
+        self.cache_budget_bytes = cache_budget_bytes
+
+        if bandwidth_limit_bytes is None and os.environ.get("SPARK_DOWNLOAD_MAX_MB_PER_SEC"):
+            bandwidth_limit_bytes = float(os.environ["SPARK_DOWNLOAD_MAX_MB_PER_SEC"]) * 1024 * 1024
+        # Shared by every engine this manager creates, so concurrent downloads share one cap
+        self.rate_limiter = TokenBucket(bandwidth_limit_bytes or 0)
+        self.connection_slots = threading.BoundedSemaphore(max_connections)
+        self._size_refresh_lock = threading.Lock()
+        self._size_refresh_thread: Optional[threading.Thread] = None
+        # Called with the model id of every model removed by automatic eviction
+        self.on_evict: Optional[Callable[[str], None]] = None
+        # Base URLs of LAN peers' blob servers, tried before Hugging Face
+        self.peers: List[str] = [p.strip() for p in os.environ.get("SPARK_PEERS", "").split(',') if p.strip()]
+        self.blob_server: Optional[BlobServer] = None
+        # Shared secret our blob server demands and we present to peers
+        self.cluster_token = cluster_token()
+
+    @property
+    def api(self) -> 'HfApi':
+        """Hugging Face client; huggingface_hub is only imported once something needs the Hub"""
+        if self._api is None:
+            from huggingface_hub import HfApi
+            self._api = HfApi()
+        return self._api
+
+    def _load_catalog(self) -> Dict:
+        """Load the cached Hugging Face catalog"""
+        if self.catalog_file.exists():
+            try:
+                with open(self.catalog_file, 'r') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"LOG: Ignoring unreadable catalog cache: {e}")
+        return {'lists': {}, 'models': {}}
+
+    def _save_catalog(self, catalog: Dict):
+        """Save the catalog cache, replacing the old file atomically"""
+        tmp_file = self.catalog_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(catalog, f)
+        os.replace(tmp_file, self.catalog_file)
+
+    def _fetch_catalog_entry(self, model) -> Dict:
+        """Fetch file sizes for one listed model and build its catalog entry"""
+        info = self.api.model_info(model.id, files_metadata=True)
+        size_bytes = sum(s.size or 0 for s in (info.siblings or []))
+        card_data = getattr(info, 'card_data', None) or {}
+        description = card_data.get('description', '') if hasattr(card_data, 'get') else ''
+
+        return {
+            'id': model.id,
+            'name': model.id.split('/')[-1],
+            'author': model.id.split('/')[0] if '/' in model.id else 'unknown',
+            'downloads': getattr(model, 'downloads', 0),
+            'likes': getattr(model, 'likes', 0),
+            'size_mb': round(size_bytes / (1024 * 1024), 2),
+            'tags': getattr(model, 'tags', None) or [],
+            'description': (description or '')[:200]
+        }
+
+    def get_popular_models(
+        self,
+        task: str = "text-generation",
+        limit: int = 20,
+        max_age: float = CATALOG_TTL_SECONDS,
+        refresh: bool = False
+    ) -> List[Dict]:
         """
         Get list of popular models from Hugging Face
 
+        Results are cached under cache_dir. A listing younger than max_age is
+        returned without any network access. Older listings are revalidated: only
+        models whose commit changed are fetched again, concurrently. If the Hub
+        can't be reached the last cached listing is returned.
+
         Args:
             task: Model task type (text-generation, text-to-speech, etc.)
             limit: Maximum number of models to return
+            max_age: Seconds a cached listing is served without revalidation
+            refresh: Ignore max_age and revalidate now
 
         Returns:
             List of model info dictionaries
         """
+        catalog = self._load_catalog()
+        list_key = f"{task}:{limit}"
+        cached_list = catalog['lists'].get(list_key)
+
+        def from_cache() -> List[Dict]:
+            if not cached_list:
+                return []
+            return [catalog['models'][m]['entry'] for m in cached_list['ids'] if m in catalog['models']]
+
+        if cached_list and not refresh and time.time() - cached_list['fetched_at'] < max_age:
+            return from_cache()
+
         try:
-            models = []
-            model_list = self.api.list_models(
-                task=task,
+            model_list = list(self.api.list_models(
+                filter=task,
                 sort="downloads",
                 limit=limit,
-                cardData=True
-            )
-
-            for model in model_list:
-                try:
-                    info = model_info(model.modelId)
-                    size_mb = 0
-
-                    # Try to estimate size
-                    if hasattr(info, 'siblings') and info.siblings:
-                        size_mb = sum(s.size for s in info.siblings if hasattr(s, 'size')) / (1024 * 1024)
-
-                    models.append({
-                        'id': model.modelId,
-                        'name': model.modelId.split('/')[-1],
-                        'author': model.modelId.split('/')[0] if '/' in model.modelId else 'unknown',
-                        'downloads': getattr(model, 'downloads', 0),
-                        'likes': getattr(model, 'likes', 0),
-                        'size_mb': round(size_mb, 2),
-                        'tags': getattr(model, 'tags', []),
-                        'description': getattr(info, 'description', '')[:200] if hasattr(info, 'description') else ''
-                    })
-                except Exception as e:
-                    print(f"Error getting info for {model.modelId}: {e}")
-                    continue
-
-            return models
+                full=True
+            ))
         except Exception as e:
             print(f"Error fetching popular models: {e}")
-            return []
+            if cached_list:
+                print("LOG: Hub unreachable, using cached model catalog")
+            return from_cache()
+
+        # Revalidate: entries whose commit hasn't moved only need fresh counters
+        stale = []
+        for model in model_list:
+            cached = catalog['models'].get(model.id)
+            if cached and cached.get('sha') and cached['sha'] == getattr(model, 'sha', None):
+                cached['entry']['downloads'] = getattr(model, 'downloads', 0)
+                cached['entry']['likes'] = getattr(model, 'likes', 0)
+            else:
+                stale.append(model)
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(CATALOG_FETCH_WORKERS, len(stale))) as pool:
+                futures = {pool.submit(self._fetch_catalog_entry, model): model for model in stale}
+                for future in as_completed(futures):
+                    model = futures[future]
+                    try:
+                        catalog['models'][model.id] = {
+                            'sha': getattr(model, 'sha', None),
+                            'entry': future.result()
+                        }
+                    except Exception as e:
+                        print(f"Error getting info for {model.id}: {e}")
+
+        catalog['lists'][list_key] = {
+            'fetched_at': time.time(),
+            'ids': [m.id for m in model_list if m.id in catalog['models']]
+        }
+        try:
+            self._save_catalog(catalog)
+        except OSError as e:
+            print(f"LOG: Could not write catalog cache: {e}")
+
+        cached_list = catalog['lists'][list_key]
+        return from_cache()
 
     def download_model(
         self,
         model_id: str,
-        progress_callback: Optional[Callable[[int, int], None]] = None
+        progress_callback: Optional[ProgressCallback] = None,
+        max_workers: Optional[int] = None,
+        cancel_event: Optional[threading.Event] = None,
+        revision: Optional[str] = None,
+        weight_format: Optional[str] = None,
+        allow_patterns: Optional[List[str]] = None,
+        deny_patterns: Optional[List[str]] = None,
+        layer_range: Optional[Tuple[int, int]] = None
     ) -> Optional[str]:
         """
         Download a model from Hugging Face
 
+        Files are fetched concurrently and large shards are split into ranged
+        requests. Partial files are kept on failure, so calling this again resumes.
+        Contents go into the shared blob store; files another model already
+        holds are linked instead of downloaded again. Only the files picked by
+        plan_model_download are fetched, and that set is what verification checks.
+        Blobs that LAN peers (self.peers) already hold are pulled from them first,
+        spread across peers, and hash-checked before use.
+
         Args:
             model_id: Hugging Face model identifier (e.g., "meta-llama/Llama-2-7b")
-            progress_callback: Optional callback function(downloaded_bytes, total_bytes)
+            progress_callback: Optional callback function(downloaded_bytes, total_bytes, bytes_per_second)
+            max_workers: Maximum concurrent transfers. Defaults to the manager's setting
+            cancel_event: Optional event that stops the download when set
+            revision: Branch, tag or commit to download. Defaults to main
+            weight_format: Weight format to keep (see download_planner.WEIGHT_FORMATS)
+            allow_patterns: Only download files matching these glob patterns
+            deny_patterns: Never download files matching these glob patterns
+            layer_range: Only fetch the shards holding layers [start, end) plus shared
+                tensors, for worker nodes that serve a slice of the model
 
         Returns:
             Path to downloaded model directory or None if failed
@@ -114,45 +257,86 @@ class ModelManager:
             model_dir = self.cache_dir / model_id.replace('/', '_')
             model_dir.mkdir(parents=True, exist_ok=True)
 
-            # Get list of files in the repo
-            files = list_repo_files(model_id)
-            print(f"LOG: Found {len(files)} files in repository")
-
-            # Download each file
-            downloaded_files = []
-            total_files = len(files)
-
-            for idx, filename in enumerate(files):
-                try:
-                    print(f"LOG: Downloading {filename} ({idx + 1}/{total_files})...")
-
-                    # Download file
-                    local_path = hf_hub_download(
-                        repo_id=model_id,
-                        filename=filename,
-                        cache_dir=str(model_dir),
-                        resume_download=True
-                    )
+            # One call gives us the file list, sizes and the commit to pin downloads to
+            info = self.api.model_info(model_id, revision=revision, files_metadata=True)
+            print(f"LOG: Found {len(info.siblings or [])} files in repository")
+
+            plan = self._plan(model_id, info, weight_format, allow_patterns, deny_patterns, layer_range)
+            siblings = plan.files
+            plan_settings = {
+                'revision': revision,
+                'weight_format': plan.weight_format,
+                'allow_patterns': allow_patterns,
+                'deny_patterns': deny_patterns,
+                'layer_range': list(plan.layer_range) if plan.layer_range else None
+            }
+            print(f"LOG: Planned {len(plan.files)} files ({plan.planned_bytes / (1024 * 1024):.1f} MB, "
+                  f"{plan.weight_format or 'no'} weights), skipping {len(plan.skipped)} files "
+                  f"({plan.skipped_bytes / (1024 * 1024):.1f} MB)")
+            if plan.layer_range:
+                start, end = plan.layer_range
+                print(f"LOG: Layers {start}-{end - 1} need {len(plan.files)} files; skipping {len(plan.layer_skipped)} "
+                      f"shards saves {plan.layer_skipped_bytes / (1024 * 1024):.1f} MB")
+            elif layer_range:
+                print("LOG: No shard index for this checkpoint; downloading every layer")
+
+            blob_keys = {
+                s.rfilename: BlobStore.key_for(s) or f"{info.sha}-{hashlib.sha256(s.rfilename.encode()).hexdigest()}"
+                for s in siblings
+            }
 
+            # Make room first rather than filling the disk halfway through
+            sizes = {blob_keys[s.rfilename]: s.size or 0 for s in siblings}
+            needed = sum(size for key, size in sizes.items() if not self.blobs.has(key, size))
+            if not self.ensure_space(needed, exclude=[model_id]):
+                print(f"ERROR: Not enough space for {model_id}: need {needed / (1024 * 1024):.1f} MB")
+                return None
+            tasks = self._fetch_blobs(
+                model_id, info.sha,
+                [(s.rfilename, blob_keys[s.rfilename], s.size or 0) for s in siblings],
+                progress_callback, cancel_event, max_workers
+            )
+            if cancel_event is not None and cancel_event.is_set():
+                print(f"LOG: Download of {model_id} cancelled; partial files kept for resume")
+                return None
+
+            # Leave the cached copy (if any) untouched until every file is in; fetched blobs stay for the resume
+            failed = [s.rfilename for s in siblings if tasks[blob_keys[s.rfilename]].error is not None]
+            if failed:
+                print(f"ERROR: {len(failed)} file(s) of {model_id} failed to download; "
+                      f"run the download again to resume")
+                return None
+
+            # Link and record under the store's write lock, so no other process frees a blob
+            # between our check that it's there and the row that keeps it
+            with self.store.transaction():
+                missing = [s.rfilename for s in siblings if not self.blobs.has(blob_keys[s.rfilename], s.size or 0)]
+                if missing:
+                    print(f"ERROR: {len(missing)} file(s) of {model_id} were removed before they could be linked; "
+                          f"run the download again to fetch them")
+                    return None
+
+                downloaded_files = []
+                for s in siblings:
+                    key = blob_keys[s.rfilename]
+                    dest = model_dir / s.rfilename
+                    self.blobs.link(key, dest)
                     downloaded_files.append({
-                        'filename': filename,
-                        'path': local_path
+                        'filename': s.rfilename,
+                        'path': str(dest),
+                        'size': s.size or 0,
+                        'blob_key': key,
+                        # LFS keys are the content sha256, but it isn't verified until a deep check
+                        'sha256': key if is_sha256_key(key) else None
                     })
 
-                    if progress_callback:
-                        progress_callback(idx + 1, total_files)
-
-                except Exception as e:
-                    print(f"ERROR: Failed to download {filename}: {e}")
-                    continue
-
-            # Save metadata
-            self.metadata[model_id] = {
-                'model_dir': str(model_dir),
-                'files': downloaded_files,
-                'download_date': str(Path.ctime(model_dir))
-            }
-            self._save_metadata()
+                # Save metadata, dropping blobs only the previous revision used. A layer slice
+                # is merged into whatever is cached instead, so it never drops another node's shards
+                is_slice = plan.layer_range is not None
+                orphaned = self.store.save_model(model_id, str(model_dir), info.sha, time.ctime(), downloaded_files,
+                                                 replace_files=not is_slice, plan=plan_settings, partial=is_slice)
+                self._free_blobs(orphaned)
+            self.store.touch_model(model_id)
 
             print(f"LOG: Successfully downloaded {model_id} to {model_dir}")
             return str(model_dir)
@@ -161,42 +345,297 @@ class ModelManager:
             print(f"ERROR: Failed to download model {model_id}: {e}")
             return None
 
-    def get_local_models(self) -> List[Dict]:
-        """Get list of all locally downloaded models"""
+    def _plan(self, model_id: str, info, weight_format: Optional[str], allow_patterns: Optional[List[str]],
+              deny_patterns: Optional[List[str]], layer_range: Optional[Tuple[int, int]] = None) -> DownloadPlan:
+        """Plan a download, reading the shard index to skip stray duplicate shards and unneeded layers"""
+        siblings = info.siblings or []
+        plan = plan_download(siblings, weight_format, allow_patterns, deny_patterns)
+        index_file = index_filename(plan.files, plan.weight_format) if plan.weight_format else None
+        if index_file:
+            import requests
+            from huggingface_hub import hf_hub_url
+            from huggingface_hub.utils import build_hf_headers
+            try:
+                response = requests.get(hf_hub_url(model_id, index_file, revision=info.sha),
+                                        headers=build_hf_headers(), timeout=30)
+                response.raise_for_status()
+                plan = plan_download(siblings, plan.weight_format, allow_patterns, deny_patterns,
+                                     shard_index=response.json(), layer_range=layer_range)
+            except (requests.RequestException, ValueError) as e:
+                print(f"LOG: Could not read {index_file}, keeping every shard: {e}")
+        return plan
+
+    def plan_model_download(
+        self,
+        model_id: str,
+        revision: Optional[str] = None,
+        weight_format: Optional[str] = None,
+        allow_patterns: Optional[List[str]] = None,
+        deny_patterns: Optional[List[str]] = None,
+        layer_range: Optional[Tuple[int, int]] = None
+    ) -> Dict:
+        """
+        Report what download_model would fetch, without downloading anything
+
+        Returns:
+            Summary with the chosen weight format, planned and skipped files and their byte totals
+        """
+        info = self.api.model_info(model_id, revision=revision, files_metadata=True)
+        summary = self._plan(model_id, info, weight_format, allow_patterns, deny_patterns, layer_range).summary()
+        summary.update({'model_id': model_id, 'revision': info.sha})
+        return summary
+
+    def _fetch_blobs(
+        self,
+        model_id: str,
+        revision: str,
+        files: List[Tuple[str, str, int]],
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        max_workers: Optional[int] = None
+    ) -> Dict[str, DownloadTask]:
+        """
+        Download (filename, blob_key, size) entries into the blob store
+
+        Returns:
+            The download task for each blob key; identical files share one task
+        """
+        from huggingface_hub import hf_hub_url
+        from huggingface_hub.utils import build_hf_headers
+
+        tasks: Dict[str, DownloadTask] = {}
+        reused_bytes = 0
+        for filename, key, size in files:
+            if key in tasks:
+                continue
+            if self.blobs.has(key, size):
+                reused_bytes += size
+            tasks[key] = DownloadTask(
+                filename=filename,
+                url=hf_hub_url(model_id, filename, revision=revision),
+                dest=self.blobs.path(key),
+                size=size
+            )
+        if reused_bytes:
+            print(f"LOG: Reusing {reused_bytes / (1024 * 1024):.1f} MB already in the blob store")
+
+        # Only blobs we can hash-check afterwards are taken from peers
+        wanted = {key: task.size for key, task in tasks.items()
+                  if self._blob_hash_kind(key) and not self.blobs.has(key, task.size)}
+        for key, urls in find_blobs_on_peers(list(self.peers), wanted, self.cluster_token).items():
+            tasks[key].mirrors = urls
+        from_peers = [task for task in tasks.values() if task.mirrors]
+        if from_peers:
+            print(f"LOG: Fetching {len(from_peers)} file(s) "
+                  f"({sum(t.size for t in from_peers) / (1024 * 1024):.1f} MB) from LAN peers")
+
+        engine = DownloadEngine(
+            max_workers=max_workers or self.max_download_workers,
+            headers=build_hf_headers(),
+            mirror_headers={TOKEN_HEADER: self.cluster_token} if self.cluster_token else None,
+            rate_limiter=self.rate_limiter,
+            connection_slots=self.connection_slots
+        )
+        engine.download(list(tasks.values()), progress_callback, cancel_event)
+
+        # Peers aren't trusted: check what they sent and fetch anything bad from Hugging Face
+        bad = [task for task in from_peers if task.error is None and not self._blob_matches(task)]
+        if bad and not (cancel_event is not None and cancel_event.is_set()):
+            for task in bad:
+                print(f"ERROR: Hash mismatch for {task.filename} from a LAN peer; fetching it from Hugging Face")
+                task.dest.unlink(missing_ok=True)
+                task.mirrors = []
+            engine.download(bad, progress_callback, cancel_event)
+        return tasks
+
+    @staticmethod
+    def _blob_hash_kind(key: str) -> Optional[str]:
+        """How a blob key can be checked against content: 'sha256', 'git' (blob sha1) or None"""
+        if is_sha256_key(key):
+            return 'sha256'
+        if len(key) == 40:
+            return 'git'
+        return None
+
+    def _blob_matches(self, task: DownloadTask) -> bool:
+        """True if a downloaded blob's content hashes to its key"""
+        key = task.dest.name
+        kind = self._blob_hash_kind(key)
+        return kind is not None and hash_file(task.dest, git_blob=kind == 'git') == key
+
+    def set_peers(self, peers: List[str]):
+        """Replace the LAN peers downloads try first (base URLs of their blob servers)"""
+        self.peers = [peer.rstrip('/') for peer in peers]
+        print(f"LOG: {len(self.peers)} LAN peer(s) available for model downloads")
+
+    def share_blobs(self, port: int = DEFAULT_BLOB_PORT, host: str = '::') -> int:
+        """
+        Serve the blob store to LAN peers holding the cluster token
+
+        Returns:
+            The port the blob server listens on (ValueError without a cluster token)
+        """
+        if self.blob_server is None:
+            self.blob_server = BlobServer(self.blobs, self.cluster_token, port=port, host=host)
+            self.blob_server.start()
+        return self.blob_server.port
+
+    def _free_blobs(self, keys: List[str]):
+        """
+        Delete blobs that no model references any more
+
+        `keys` is only a candidate list: each refcount is checked again under the
+        store's write lock, which downloads also hold while they link and record
+        blobs, so a blob another process started using in the meantime is kept
+        """
+        with self.store.transaction():
+            freed = sum(self.blobs.remove(key) for key in self.store.unreferenced_blobs(keys))
+        if freed:
+            print(f"LOG: Freed {freed / (1024 * 1024):.1f} MB of unreferenced blobs")
+
+    @staticmethod
+    def _measure_dir(model_dir: Path) -> Tuple[int, Dict[str, float]]:
+        """
+        Count real bytes under a directory with one scandir pass
+
+        Symlinks (e.g. HF snapshot links into blobs/) are skipped and hardlinked
+        files are counted once.
+
+        Returns:
+            Total bytes, and the mtime of every directory visited keyed by its path
+            relative to model_dir ('.' for model_dir itself)
+        """
+        total = 0
+        seen_inodes = set()
+        dir_mtimes = {'.': model_dir.stat().st_mtime}
+        stack = [str(model_dir)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_symlink():
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            relative = os.path.relpath(entry.path, model_dir)
+                            dir_mtimes[relative] = entry.stat(follow_symlinks=False).st_mtime
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            if st.st_nlink > 1:
+                                if (st.st_dev, st.st_ino) in seen_inodes:
+                                    continue
+                                seen_inodes.add((st.st_dev, st.st_ino))
+                            total += st.st_size
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
+                continue
+        return total, dir_mtimes
+
+    @staticmethod
+    def _size_is_current(info: Dict) -> bool:
+        """
+        True while no directory under the model changed since its size was measured
+
+        A file added or replaced in a subdirectory (onnx/, sharded folders) only
+        changes that subdirectory's mtime, so every one of them is checked
+        """
+        if info['size_bytes'] is None or not info['size_dir_mtimes']:
+            return False
+        model_dir = Path(info['model_dir'])
+        for relative, mtime in json.loads(info['size_dir_mtimes']).items():
+            try:
+                if (model_dir / relative).stat().st_mtime != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def _refresh_model_size(self, info: Dict) -> Optional[int]:
+        """Return the model's size, re-measuring only if a directory under it changed since last time"""
+        model_dir = Path(info['model_dir'])
+        if not model_dir.exists():
+            return None
+        if self._size_is_current(info):
+            return info['size_bytes']
+        try:
+            size, dir_mtimes = self._measure_dir(model_dir)
+        except FileNotFoundError:
+            return None
+        self.store.set_model_size(info['model_id'], size, dir_mtimes)
+        return size
+
+    def refresh_sizes_in_background(self) -> threading.Thread:
+        """Re-measure stale model sizes on a background thread (one refresh runs at a time)"""
+        with self._size_refresh_lock:
+            if self._size_refresh_thread and self._size_refresh_thread.is_alive():
+                return self._size_refresh_thread
+
+            def refresh():
+                for info in self.store.list_models():
+                    try:
+                        self._refresh_model_size(info)
+                    except OSError as e:
+                        print(f"LOG: Could not measure {info['model_id']}: {e}")
+
+            self._size_refresh_thread = threading.Thread(target=refresh, name="model-size-refresh", daemon=True)
+            self._size_refresh_thread.start()
+            return self._size_refresh_thread
+
+    def get_local_models(self, background_refresh: bool = False) -> List[Dict]:
+        """
+        Get list of all locally downloaded models
+
+        Sizes come from the metadata store and are only re-measured when a
+        directory under the model changed, so a listing costs one stat per directory.
+
+        Args:
+            background_refresh: Don't measure stale models inline; report their last
+                known (or recorded) size and re-measure on a background thread
+        """
         local_models = []
+        stale = False
 
-        for model_id, info in self.metadata.items():
+        for info in self.store.list_models():
+            model_id = info['model_id']
             model_dir = Path(info['model_dir'])
-            if model_dir.exists():
-                # Calculate total size
-                total_size = sum(
-                    Path(f['path']).stat().st_size if Path(f['path']).exists() else 0
-                    for f in info.get('files', [])
-                )
-
-                local_models.append({
-                    'id': model_id,
-                    'name': model_id.split('/')[-1],
-                    'path': str(model_dir),
-                    'size_mb': round(total_size / (1024 * 1024), 2),
-                    'files_count': len(info.get('files', [])),
-                    'download_date': info.get('download_date', 'Unknown')
-                })
+            if background_refresh:
+                if not model_dir.exists():
+                    continue
+                if not self._size_is_current(info):
+                    stale = True
+                total_size = info['size_bytes'] if info['size_bytes'] is not None else info['total_size']
+            else:
+                total_size = self._refresh_model_size(info)
+                if total_size is None:
+                    continue
 
+            plan = json.loads(info['plan']) if info['plan'] else {}
+            local_models.append({
+                'id': model_id,
+                'name': model_id.split('/')[-1],
+                'path': str(model_dir),
+                'size_mb': round(total_size / (1024 * 1024), 2),
+                'files_count': info['files_count'],
+                'download_date': info['download_date'] or 'Unknown',
+                # Only a layer slice is on disk; it can't be served as a whole model
+                'partial': bool(info['partial']),
+                'layer_range': plan.get('layer_range') if info['partial'] else None
+            })
+
+        if stale:
+            self.refresh_sizes_in_background()
         return local_models
 
     def delete_model(self, model_id: str) -> bool:
         """Delete a locally cached model"""
         try:
-            if model_id in self.metadata:
-                model_dir = Path(self.metadata[model_id]['model_dir'])
+            info = self.store.get_model(model_id)
+            if info:
+                model_dir = Path(info['model_dir'])
                 if model_dir.exists():
-                    import shutil
                     shutil.rmtree(model_dir)
                     print(f"LOG: Deleted model directory: {model_dir}")
 
-                del self.metadata[model_id]
-                self._save_metadata()
+                self._free_blobs(self.store.delete_model(model_id) or [])
                 print(f"LOG: Removed {model_id} from cache")
                 return True
             else:
@@ -207,39 +646,308 @@ class ModelManager:
             return False
 
     def get_model_path(self, model_id: str) -> Optional[str]:
-        """Get the local path to a downloaded model"""
-        if model_id in self.metadata:
-            model_dir = Path(self.metadata[model_id]['model_dir'])
+        """Get the local path to a downloaded model (and mark it as recently used)"""
+        info = self.store.get_model(model_id)
+        if info:
+            model_dir = Path(info['model_dir'])
             if model_dir.exists():
+                self.store.touch_model(model_id)
                 return str(model_dir)
         return None
 
-    def verify_model_integrity(self, model_id: str) -> bool:
-        """Verify that all files for a model are present"""
-        if model_id not in self.metadata:
-            return False
+    def set_active_model(self, model_id: Optional[str]):
+        """Mark the model Parallax is serving; the active model is never evicted"""
+        self.store.set_active_model(model_id)
 
-        for file_info in self.metadata[model_id].get('files', []):
-            if not Path(file_info['path']).exists():
-                print(f"ERROR: Missing file: {file_info['filename']}")
-                return False
+    def pin_model(self, model_id: str, pinned: bool = True) -> bool:
+        """Pin a model so eviction never removes it"""
+        return self.store.set_pinned(model_id, pinned)
+
+    def plan_eviction(self, needed_bytes: int = 0, policy: str = "lru",
+                      exclude: Optional[List[str]] = None) -> Dict:
+        """
+        Work out which models to evict to fit needed_bytes more within the budget
+
+        Active and pinned models are never chosen. With policy="lru" the least
+        recently used go first; "weighted" prefers models that are both idle and
+        large (idle seconds x bytes freed).
 
+        Args:
+            needed_bytes: Bytes about to be added to the cache
+            policy: "lru" or "weighted"
+            exclude: Model ids that must be kept as well
+
+        Returns:
+            Dry-run report: usage, budget, free disk and the models that would be evicted
+        """
+        usage = self.store.total_bytes()
+        disk_free = shutil.disk_usage(self.cache_dir).free
+        # Over budget, or more than the disk can actually take (keeping 1% headroom)
+        overflow = max(
+            usage + needed_bytes - self.cache_budget_bytes if self.cache_budget_bytes else 0,
+            needed_bytes - int(disk_free * 0.99)
+        )
+
+        # One read of the file table; a shared blob is only freed once its last user goes
+        users: Dict[str, Set[str]] = defaultdict(set)
+        blobs_of: Dict[str, Set[str]] = defaultdict(set)
+        blob_sizes: Dict[str, int] = {}
+        exclusive: Dict[str, int] = defaultdict(int)  # Bytes evicting each model would free now
+        for model_id, key, size in self.store.file_blobs():
+            if key is None:
+                exclusive[model_id] += size  # Legacy files aren't shared
+                continue
+            users[key].add(model_id)
+            blobs_of[model_id].add(key)
+            blob_sizes[key] = max(blob_sizes.get(key, 0), size)
+        for key, models in users.items():
+            if len(models) == 1:
+                exclusive[next(iter(models))] += blob_sizes[key]
+
+        now = time.time()
+        candidates = [
+            m for m in self.store.list_models()
+            if not m['pinned'] and not m['is_active'] and m['model_id'] not in (exclude or [])
+        ]
+        candidates.sort(key=lambda m: m['last_used'] or 0)
+        evict, freed = [], 0
+        while overflow > freed and candidates:
+            if policy == "weighted":
+                # Freed bytes grow as victims leave shared blobs with a single user, so re-rank each round
+                candidates.sort(key=lambda m: (now - (m['last_used'] or 0)) * exclusive[m['model_id']], reverse=True)
+            victim = candidates.pop(0)
+            victim_id = victim['model_id']
+            evict.append({
+                'model_id': victim_id,
+                'freed_bytes': exclusive[victim_id],
+                'last_used': victim['last_used']
+            })
+            freed += exclusive[victim_id]
+            for key in blobs_of[victim_id]:
+                users[key].discard(victim_id)
+                if len(users[key]) == 1:
+                    exclusive[next(iter(users[key]))] += blob_sizes[key]
+
+        return {
+            'usage_bytes': usage,
+            'budget_bytes': self.cache_budget_bytes,
+            'disk_free_bytes': disk_free,
+            'needed_bytes': needed_bytes,
+            'evict': evict,
+            'freed_bytes': freed,
+            'sufficient': overflow <= freed
+        }
+
+    def evict(self, needed_bytes: int = 0, policy: str = "lru", dry_run: bool = False,
+              exclude: Optional[List[str]] = None) -> Dict:
+        """Evict models per plan_eviction; with dry_run=True only report what would go"""
+        plan = self.plan_eviction(needed_bytes, policy, exclude)
+        plan['dry_run'] = dry_run
+        if not dry_run:
+            self._apply_eviction(plan)
+        return plan
+
+    def _apply_eviction(self, plan: Dict):
+        for entry in plan['evict']:
+            print(f"LOG: Evicting {entry['model_id']} to free {entry['freed_bytes'] / (1024 * 1024):.1f} MB")
+            if self.delete_model(entry['model_id']) and self.on_evict:
+                self.on_evict(entry['model_id'])
+
+    def ensure_space(self, needed_bytes: int, exclude: Optional[List[str]] = None) -> bool:
+        """Evict as needed so needed_bytes fit. Returns False (evicting nothing) if it can't be made to fit"""
+        if needed_bytes <= 0:
+            return True
+        plan = self.plan_eviction(needed_bytes, exclude=exclude)
+        if not plan['sufficient']:
+            return False
+        self._apply_eviction(plan)
         return True
 
+    def _check_file(self, file_info: Dict, deep: bool) -> Dict:
+        """Check one manifest entry; deep mode hashes it unless its stat is unchanged since the last hash"""
+        path = Path(file_info['path'])
+        result = {'filename': file_info['filename'], 'expected_size': file_info['size']}
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return {**result, 'status': 'missing'}
+        result['size'] = st.st_size
+        if file_info['size'] and st.st_size != file_info['size']:
+            return {**result, 'status': 'size_mismatch'}
+        if not deep:
+            return {**result, 'status': 'ok'}
+        if file_info['sha256'] and file_info['hashed_mtime'] == st.st_mtime:
+            return {**result, 'status': 'ok', 'hashed': False}
+
+        key = file_info['blob_key']
+        if file_info['sha256']:
+            expected, actual = file_info['sha256'], hash_file(path)
+        elif key and not is_sha256_key(key) and len(key) == 40:
+            expected, actual = key, hash_file(path, git_blob=True)
+        else:
+            expected = actual = None  # Legacy entry with nothing to compare against
+        if expected != actual:
+            return {**result, 'status': 'hash_mismatch', 'hashed': True}
+
+        return {
+            **result,
+            'status': 'ok',
+            'hashed': True,
+            # Record sha256 so the next deep check can skip this file while it's untouched
+            'sha256': actual if file_info['sha256'] else hash_file(path),
+            'hashed_mtime': st.st_mtime
+        }
+
+    def verify_model(self, model_id: str, deep: bool = False, repair: bool = False,
+                     max_workers: int = 4) -> Dict:
+        """
+        Verify a model's files against its manifest
+
+        The fast tier only stats files (presence and size). The deep tier also
+        hashes files in parallel, skipping any whose size and mtime are unchanged
+        since they were last hashed.
+
+        Args:
+            model_id: Model to verify
+            deep: Hash file contents as well
+            repair: Re-download only the files that failed
+            max_workers: Files hashed concurrently in deep mode
+
+        Returns:
+            Report with an overall 'ok' flag and a per-file 'files' list
+        """
+        info = self.store.get_model(model_id)
+        if info is None:
+            return {'model_id': model_id, 'ok': False, 'error': 'not downloaded', 'files': []}
+
+        files = self.store.get_files(model_id)
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            results = list(pool.map(lambda f: self._check_file(f, deep), files))
+
+        hashed = [r for r in results if r.get('sha256')]
+        if hashed:
+            self.store.record_file_hashes(model_id, hashed)
+
+        bad = [r['filename'] for r in results if r['status'] != 'ok']
+        for r in results:
+            if r['status'] != 'ok':
+                print(f"ERROR: {r['status'].replace('_', ' ').capitalize()}: {r['filename']}")
+
+        report = {
+            'model_id': model_id,
+            'ok': not bad,
+            # Only a layer slice was downloaded, so 'ok' covers just its files
+            'partial': bool(info['partial']),
+            'deep': deep,
+            'files': results,
+            'hashed_count': sum(1 for r in results if r.get('hashed'))
+        }
+        if bad and repair:
+            report['repaired'] = self._repair_files(info, [f for f in files if f['filename'] in bad])
+            report['ok'] = len(report['repaired']) == len(bad)
+        return report
+
+    def _repair_files(self, model: Dict, files: List[Dict]) -> List[str]:
+        """Re-download damaged files and relink every model view of their blobs"""
+        model_id, revision = model['model_id'], model['revision']
+        print(f"LOG: Re-downloading {len(files)} damaged file(s) of {model_id}")
+        entries = []
+        for f in files:
+            key = f['blob_key'] or f"{revision}-{hashlib.sha256(f['filename'].encode()).hexdigest()}"
+            self.blobs.remove(key)  # The blob itself may be what's damaged
+            entries.append((f['filename'], key, f['size']))
+
+        tasks = self._fetch_blobs(model_id, revision or 'main', entries)
+        repaired, updated = [], []
+        for f, (filename, key, _size) in zip(files, entries):
+            if tasks[key].error is not None:
+                continue
+            for path in set(self.store.get_blob_paths(key)) | {f['path']}:
+                self.blobs.link(key, Path(path))
+            repaired.append(filename)
+            updated.append({**f, 'blob_key': key, 'hashed_mtime': None})
+        if updated:
+            self.store.save_model(model_id, model['model_dir'], revision, model['download_date'],
+                                  updated, replace_files=False)
+        return repaired
+
+    def prewarm_model(
+        self,
+        model_id: str,
+        max_workers: int = DEFAULT_PREWARM_WORKERS,
+        progress_callback: Optional[PrewarmCallback] = None,
+        cancel_event: Optional[threading.Event] = None
+    ) -> Optional[Dict]:
+        """
+        Read a model's files into the page cache ahead of Parallax loading it
+
+        Uses this cache's copy, or else the Hugging Face cache snapshot Parallax
+        downloads into. Safe to run while the scheduler starts up.
+
+        Returns:
+            Prewarm report (see prewarm.prewarm_files), or None if the model isn't on disk
+        """
+        files = [Path(f['path']) for f in self.store.get_files(model_id)]
+        if not files:
+            files = hf_cache_files(model_id)
+        if not files:
+            print(f"LOG: {model_id} is not on disk; nothing to prewarm")
+            return None
+        report = prewarm_files(weight_files_first(files), max_workers=max_workers,
+                               progress_callback=progress_callback, cancel_event=cancel_event)
+        report['model_id'] = model_id
+        return report
+
+    def verify_model_integrity(self, model_id: str, deep: bool = False) -> bool:
+        """Verify that all files for a model are present (and intact, with deep=True); a layer slice never is"""
+        report = self.verify_model(model_id, deep=deep)
+        return report['ok'] and not report['partial']
+
 
 if __name__ == "__main__":
-    # Test the model manager
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command in ("browse", "download"):
+        # Machine-readable commands answer with bridge events; serve frames its own stdout
+        import bridge_events
+        events = bridge_events.install("model_manager")
     manager = ModelManager()
 
-    print("=== Popular Text Generation Models ===")
-    models = manager.get_popular_models(limit=10)
-    for model in models[:5]:
-        print(f"{model['id']}: {model['downloads']} downloads, ~{model['size_mb']} MB")
+    if command == "serve":
+        # Long-lived JSON-RPC service used by Electron
+        from model_service import run_service
+        run_service(manager)
+
+    elif command == "browse":
+        task = sys.argv[2] if len(sys.argv) > 2 else "text-generation"
+        limit = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+        events.emit("models", manager.get_popular_models(task=task, limit=limit))
+
+    elif command == "download" and len(sys.argv) > 2:
+        model_id = sys.argv[2]
+
+        def emit_progress(downloaded, total, bytes_per_sec):
+            events.emit("download.progress", {
+                'model_id': model_id,
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'bytes_per_sec': round(bytes_per_sec, 1)
+            }, key=model_id)
+
+        # Optional "start:end" layer slice for worker nodes, e.g. download Qwen/Qwen3-8B 0:18
+        layers = tuple(int(n) for n in sys.argv[3].split(':')) if len(sys.argv) > 3 else None
+        sys.exit(0 if manager.download_model(model_id, emit_progress, layer_range=layers) else 1)
 
-    print("\n=== Local Models ===")
-    local_models = manager.get_local_models()
-    if local_models:
-        for model in local_models:
-            print(f"{model['id']}: {model['size_mb']} MB, {model['files_count']} files")
     else:
-        print("No models downloaded yet")
+        # Test the model manager
+        print("=== Popular Text Generation Models ===")
+        models = manager.get_popular_models(limit=10)
+        for model in models[:5]:
+            print(f"{model['id']}: {model['downloads']} downloads, ~{model['size_mb']} MB")
+
+        print("\n=== Local Models ===")
+        local_models = manager.get_local_models()
+        if local_models:
+            for model in local_models:
+                print(f"{model['id']}: {model['size_mb']} MB, {model['files_count']} files")
+        else:
+            print("No models downloaded yet")
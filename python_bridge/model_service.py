@@ -0,0 +1,290 @@
+"""
+Model Manager Service
+Long-lived JSON-RPC 2.0 loop over stdin/stdout so Electron pays the Python
+startup and Hugging Face import cost once instead of on every IPC call.
+Replies and notifications go out as 'rpc' bridge events
+"""
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, TextIO, Tuple
+
+from bridge_events import EventStream
+from download_queue import DownloadScheduler
+from peer_share import cluster_token, shared_blob_port
+
+if TYPE_CHECKING:
+    from model_manager import ModelManager
+
+
+# download_model arguments a queued download may carry
+QUEUE_DOWNLOAD_PARAMS = ('revision', 'weight_format', 'allow_patterns', 'deny_patterns', 'max_workers',
+                         'layer_range')
+
+
+def _layer_range(params: Dict) -> Optional[Tuple[int, int]]:
+    """Decode a [start, end) layer_range param sent as a JSON list"""
+    layer_range = params.get('layer_range')
+    return (int(layer_range[0]), int(layer_range[1])) if layer_range else None
+
+
+class RequestCancelled(Exception):
+    """The caller cancelled this request before it finished"""
+
+
+class _NotificationKey:
+    """Internal key of a request sent without an id; compares by identity, so never equal to a caller's id"""
+
+
+def _reply_id(key: Any) -> Any:
+    """The JSON-RPC id behind a request key; None for notifications"""
+    return None if isinstance(key, _NotificationKey) else key
+
+
+class ModelService:
+    """Dispatches JSON-RPC requests to a shared ModelManager"""
+
+    def __init__(self, manager: 'ModelManager', max_concurrent: int = 4, out: Optional[TextIO] = None,
+                 events: Optional[EventStream] = None):
+        """
+        Args:
+            manager: The model manager every request runs against
+            max_concurrent: Maximum number of requests executing at once
+            out: Stream for protocol messages. Defaults to the real stdout
+            events: Event stream shared with other services; one writing to out by default
+        """
+        self.manager = manager
+        self.out = out or sys.stdout
+        self.events = events or EventStream(self.out)
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrent)
+        self.cancel_events: Dict[Any, threading.Event] = {}
+        self._state_lock = threading.Lock()
+        self.methods: Dict[str, Callable[[Any, Dict], Any]] = {
+            'ping': lambda _id, _params: 'pong',
+            'browse': self._browse,
+            'download': self._download,
+            'plan': lambda _id, params: self.manager.plan_model_download(
+                params['model_id'],
+                revision=params.get('revision'),
+                weight_format=params.get('weight_format'),
+                allow_patterns=params.get('allow_patterns'),
+                deny_patterns=params.get('deny_patterns'),
+                layer_range=_layer_range(params)
+            ),
+            'local_models': lambda _id, params: self.manager.get_local_models(
+                background_refresh=bool(params.get('background_refresh', True))
+            ),
+            'delete': lambda _id, params: self.manager.delete_model(params['model_id']),
+            'verify': lambda _id, params: self.manager.verify_model(
+                params['model_id'], deep=bool(params.get('deep')), repair=bool(params.get('repair'))
+            ),
+            'prewarm': lambda request_id, params: self.manager.prewarm_model(
+                params['model_id'], cancel_event=self.cancel_events[request_id]
+            ),
+            'set_active': lambda _id, params: self.manager.set_active_model(params.get('model_id')),
+            'pin': lambda _id, params: self.manager.pin_model(params['model_id'], bool(params.get('pinned', True))),
+            'evict': lambda _id, params: self.manager.evict(
+                needed_bytes=int(params.get('needed_bytes', 0)),
+                policy=params.get('policy', 'lru'),
+                dry_run=bool(params.get('dry_run', True))
+            ),
+        }
+        self.manager.on_evict = lambda model_id: self.notify('evicted', {'model_id': model_id})
+        self.scheduler = DownloadScheduler(
+            manager,
+            on_update=lambda item: self.notify('queue_update', item),
+            on_progress=lambda model_id, progress: self.notify('queue_progress', {'model_id': model_id, **progress},
+                                                               key=model_id)
+        )
+        self.methods.update({
+            'enqueue': lambda _id, params: self.scheduler.enqueue(
+                params['model_id'],
+                priority=int(params.get('priority', 0)),
+                params={k: params[k] for k in QUEUE_DOWNLOAD_PARAMS if params.get(k) is not None}
+            ),
+            'queue': lambda _id, _params: self.scheduler.list(),
+            'pause': lambda _id, params: self.scheduler.pause(params.get('model_id')),
+            'resume': lambda _id, params: self.scheduler.resume(params.get('model_id')),
+            'remove': lambda _id, params: self.scheduler.remove(params['model_id']),
+            'set_priority': lambda _id, params: self.scheduler.set_priority(params['model_id'], int(params['priority'])),
+            'set_bandwidth': self._set_bandwidth,
+            'set_peers': lambda _id, params: self.manager.set_peers(params.get('peers') or []),
+        })
+
+    def send(self, message: Dict, key: Optional[Any] = None):
+        """Queue one protocol message; a key coalesces it with a queued message of the same key"""
+        self.events.emit('rpc', message, key=key)
+
+    def notify(self, method: str, params: Dict, key: Optional[Any] = None):
+        """
+        Send a notification (a message without an id)
+
+        Args:
+            method: Notification name
+            params: Its payload
+            key: Set for progress-style notifications, so only the latest per key is sent
+        """
+        self.send({'jsonrpc': '2.0', 'method': method, 'params': params},
+                  key=(method, key) if key is not None else None)
+
+    def _browse(self, _request_id, params: Dict):
+        return self.manager.get_popular_models(
+            task=params.get('task', 'text-generation'),
+            limit=int(params.get('limit', 20)),
+            refresh=bool(params.get('refresh', False))
+        )
+
+    def _set_bandwidth(self, _request_id, params: Dict):
+        """Set the shared download cap in MB/s; 0 or null removes it"""
+        mb_per_sec = float(params.get('mb_per_sec') or 0)
+        self.manager.rate_limiter.set_rate(mb_per_sec * 1024 * 1024)
+        return {'mb_per_sec': mb_per_sec}
+
+    def _download(self, request_id, params: Dict):
+        model_id = params['model_id']
+        cancel_event = self.cancel_events[request_id]
+
+        def on_progress(downloaded: int, total: int, bytes_per_sec: float):
+            self.notify('progress', {
+                'id': _reply_id(request_id),
+                'model_id': model_id,
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'bytes_per_sec': round(bytes_per_sec, 1)
+            }, key=request_id)
+
+        path = self.manager.download_model(
+            model_id,
+            progress_callback=on_progress,
+            max_workers=params.get('max_workers'),
+            cancel_event=cancel_event,
+            revision=params.get('revision'),
+            weight_format=params.get('weight_format'),
+            allow_patterns=params.get('allow_patterns'),
+            deny_patterns=params.get('deny_patterns'),
+            layer_range=_layer_range(params)
+        )
+        if cancel_event.is_set():
+            raise RequestCancelled()
+        if path is None:
+            raise RuntimeError(f"Download of {model_id} failed")
+        return {'model_id': model_id, 'path': path}
+
+    def _run(self, key, method: str, params: Dict):
+        """Run one request; notifications (no id) get no reply, so their failures are only logged"""
+        request_id = _reply_id(key)
+        try:
+            result = self.methods[method](key, params)
+            if self.cancel_events[key].is_set():
+                raise RequestCancelled()
+            reply = {'result': result}
+        except RequestCancelled:
+            reply = {'error': {'code': -32800, 'message': 'Request cancelled'}}
+        except Exception as e:
+            reply = {'error': {'code': -32000, 'message': str(e)}}
+        finally:
+            with self._state_lock:
+                self.cancel_events.pop(key, None)
+        if request_id is not None:
+            self.send({'jsonrpc': '2.0', 'id': request_id, **reply})
+        elif 'error' in reply:
+            print(f"ERROR: Notification {method} failed: {reply['error']['message']}")
+
+    def cancel_all(self):
+        """Cancel every in-flight request"""
+        with self._state_lock:
+            for event in self.cancel_events.values():
+                event.set()
+
+    def handle(self, message: Dict) -> bool:
+        """Handle one decoded request. Returns False when the service should exit"""
+        request_id = message.get('id')
+        method = message.get('method')
+        params = message.get('params') or {}
+
+        if method == 'shutdown':
+            self.cancel_all()
+            if request_id is not None:
+                self.send({'jsonrpc': '2.0', 'id': request_id, 'result': True})
+            return False
+
+        if method == 'cancel':
+            with self._state_lock:
+                event = self.cancel_events.get(params.get('id'))
+            if event:
+                event.set()
+            if request_id is not None:
+                self.send({'jsonrpc': '2.0', 'id': request_id, 'result': event is not None})
+            return True
+
+        if method not in self.methods:
+            self.send({'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32601, 'message': f"Unknown method: {method}"}})
+            return True
+
+        with self._state_lock:
+            if request_id is None:
+                # Notifications can't be told apart or cancelled by the caller; cancel_all still reaches them
+                key = _NotificationKey()
+            elif request_id in self.cancel_events:
+                self.send({'jsonrpc': '2.0', 'id': request_id, 'error': {'code': -32600, 'message': 'Duplicate request id'}})
+                return True
+            else:
+                key = request_id
+            self.cancel_events[key] = threading.Event()
+        self.pool.submit(self._run, key, method, params)
+        return True
+
+    def start(self):
+        """Start the download queue and announce the methods on offer"""
+        self.scheduler.start()
+        self.notify('ready', {'methods': sorted(self.methods) + ['cancel', 'shutdown']})
+
+    def close(self):
+        """Cancel in-flight requests, stop the queue and wait for running requests to finish"""
+        self.cancel_all()
+        self.scheduler.stop()
+        self.pool.shutdown(wait=True)
+
+    def serve(self, stdin: Optional[TextIO] = None):
+        """Read requests line by line until stdin closes or a shutdown request arrives"""
+        stdin = stdin or sys.stdin
+        self.start()
+
+        for line in stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                message = json.loads(line)
+            except ValueError as e:
+                self.send({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32700, 'message': f"Parse error: {e}"}})
+                continue
+            if not self.handle(message):
+                break
+
+        # Stdin closing means the parent went away; don't keep downloading for nobody
+        self.close()
+        self.events.close()
+
+
+def share_blobs_from_env(manager: 'ModelManager'):
+    """Share our blobs so LAN peers can skip Hugging Face; opt in with SPARK_SHARE_BLOBS=1 and SPARK_CLUSTER_TOKEN"""
+    port = shared_blob_port()
+    if port is None:
+        if os.environ.get('SPARK_SHARE_BLOBS') == '1' and cluster_token() is None:
+            print("ERROR: SPARK_SHARE_BLOBS=1 needs SPARK_CLUSTER_TOKEN; not sharing blobs")
+        return
+    try:
+        manager.share_blobs(port)
+    except OSError as e:
+        print(f"ERROR: Could not start blob sharing: {e}")
+
+
+def run_service(manager: 'ModelManager'):
+    """Serve JSON-RPC on stdout, sending everything the manager prints to stderr"""
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    share_blobs_from_env(manager)
+    ModelService(manager, out=protocol_out).serve()
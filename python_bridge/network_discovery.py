@@ -5,21 +5,137 @@ Allows Spark devices to automatically discover each other on the local network
 import socket
 import json
 import time
-import psutil
-from zeroconf import ServiceInfo, Zeroconf, ServiceBrowser, ServiceListener
-from typing import List, Dict, Callable, Optional
+import asyncio
+from typing import TYPE_CHECKING, List, Dict, Callable, Iterator, Optional, Set
+import heapq
 import threading
+from collections import deque
+from contextlib import contextmanager
+
+import ipaddress
+
+from peer_cache import PeerCache, probe_peers
+from peer_probe import PROBE_INTERVAL, PathStats, PeerProber, ProbeResponder, current_is_close
+from peer_share import shared_blob_port
+from resource_sampler import DEFAULT_SAMPLE_INTERVAL, DEFAULT_WINDOW, ResourceSampler
+
+# zeroconf and psutil are imported where they're first needed, so importing
+# this module (e.g. into the bridge daemon) doesn't pay for them
+if TYPE_CHECKING:
+    from zeroconf import ServiceInfo, Zeroconf
+    from zeroconf.asyncio import AsyncServiceBrowser, AsyncZeroconf
+
+
+# Compact TXT keys for live load: cpu %, memory %, tokens/s, loaded model
+LOAD_FIELDS = ('cpu', 'mem', 'tps', 'lm')
+# On loopback 1 converges as fast as 32 up to 200 devices, joining at once or not (discovery_benchmark.py
+# --max-resolves 32,1): answers arrive as announcements and resolves are served from the cache
+MAX_CONCURRENT_RESOLVES = 32
+RESOLVE_TIMEOUT_MS = 3000
+RESOLVE_SLICE_MS = 250
+DEVICE_TTL = 90.0  # Seconds without a record refresh before a device counts as lost
+HEARTBEAT_INTERVAL = 30.0  # Re-announce our record at least this often so peers renew our lease
+PEER_CACHE_SAVE_DELAY = 2.0  # Seconds to batch device changes before rewriting the peer cache
+LOAD_CHECK_INTERVAL = 1.0  # Seconds between comparisons of current load with what was last published
+MIN_TXT_UPDATE_INTERVAL = 5.0  # Never re-announce the service record more often than this
+PERCENT_THRESHOLD = 5  # cpu/mem points a value must move before it's worth announcing
+TPS_THRESHOLD = 0.10  # Relative tokens/s change worth announcing
+TPS_IDLE_AFTER = 10.0  # Seconds without a throughput report before tokens/s counts as 0
+
+
+def _parse_load(device_info: Dict) -> Dict:
+    """Typed live load fields from TXT properties; absent fields are None"""
+    def number(key: str, cast):
+        try:
+            return cast(device_info[key])
+        except (KeyError, ValueError):
+            return None
+    return {
+        'cpu': number('cpu', int),
+        'mem': number('mem', int),
+        'tps': number('tps', float),
+        'lm': device_info.get('lm') or None,
+    }
+
+
+def load_changed(old: Dict, new: Dict) -> bool:
+    """True when new load differs enough from the last published load to announce"""
+    for key in ('cpu', 'mem'):
+        if abs((new.get(key) or 0) - (old.get(key) or 0)) >= PERCENT_THRESHOLD:
+            return True
+    if new.get('lm') != old.get('lm'):
+        return True
+    old_tps, new_tps = old.get('tps') or 0.0, new.get('tps') or 0.0
+    return abs(new_tps - old_tps) > max(1.0, TPS_THRESHOLD * max(old_tps, new_tps))
+
+
+def _routable(address: str) -> bool:
+    """Worth advertising or probing: not loopback, and not IPv6 link-local (unusable without a scope id)"""
+    ip = ipaddress.ip_address(address)
+    return not (ip.is_loopback or ip.is_multicast or ip.is_unspecified or (ip.version == 6 and ip.is_link_local))
+
+
+def _usable_addresses(info: 'ServiceInfo') -> List[str]:
+    return [a for a in info.parsed_addresses() if _routable(a)]
 
 
 class SparkDevice:
     """Represents a discovered Spark device on the network"""
-    def __init__(self, name: str, address: str, port: int, device_info: Dict):
+    def __init__(self, name: str, address: str, port: int, device_info: Dict,
+                 addresses: Optional[List[str]] = None):
         self.name = name
-        self.address = address
         self.port = port
         self.device_info = device_info
+        self.load = _parse_load(device_info)
+        self.last_seen = time.time()
+        # 'probable' for peers remembered from the last run but not yet confirmed
+        self.status = 'online'
+        # Probe stats per advertised address; best_path is the one to use once measured
+        self.paths: Dict[str, PathStats] = {}
+        self.best_path: Optional[str] = None
+        self._set_addresses(address, addresses)
+
+    def _set_addresses(self, address: str, addresses: Optional[List[str]]):
+        self.advertised_address = address
+        self.addresses = list(addresses or [address])
+        self.paths = {a: stats for a, stats in self.paths.items() if a in self.addresses}
+        if self.best_path not in self.paths:
+            self.best_path = None
+        self.address = self.best_path or self.advertised_address
+
+    def update(self, address: str, port: int, device_info: Dict, addresses: Optional[List[str]] = None):
+        """Apply a re-announced service record"""
+        self._set_addresses(address, addresses)
+        self.port = port
+        self.device_info = device_info
+        self.load = _parse_load(device_info)
         self.last_seen = time.time()
 
+    def choose_path(self) -> bool:
+        """Re-pick the lowest-latency usable address. Returns True if the address in use changed"""
+        usable = [(stats.rtt_ms, a) for a, stats in self.paths.items() if stats.usable]
+        if not usable:
+            self.best_path = None
+        else:
+            best = min(usable)[1]
+            # Stay on the current (or advertised) path unless another is clearly
+            # faster, so two similar paths don't take turns
+            current = self.best_path or self.advertised_address
+            stats = self.paths.get(current)
+            if stats is not None and stats.usable and best != current and \
+                    current_is_close(stats.rtt_ms, self.paths[best].rtt_ms):
+                best = current
+            self.best_path = best
+        previous = self.address
+        self.address = self.best_path or self.advertised_address
+        return self.address != previous
+
+    @property
+    def latency(self) -> Optional[Dict]:
+        """Smoothed stats of the path in use, once probed"""
+        stats = self.paths.get(self.best_path)
+        return stats.to_dict() if stats else None
+
     def to_dict(self) -> Dict:
         return {
             'name': self.name,
@@ -28,49 +144,359 @@ class SparkDevice:
             'role': self.device_info.get('role', 'unknown'),
             'personality': self.device_info.get('personality', ''),
             'model': self.device_info.get('model', ''),
+            # Port of the peer's model blob server, if it shares one
+            'blob_port': self.blob_port,
+            'addresses': self.addresses,
+            'load': self.load,
+            'latency': self.latency,
+            'status': self.status,
             'last_seen': self.last_seen
         }
 
+    @property
+    def blob_port(self) -> Optional[int]:
+        return int(self.device_info['blob_port']) if self.device_info.get('blob_port', '').isdigit() else None
 
-class SparkServiceListener(ServiceListener):
-    """Listens for Spark devices on the network"""
+    @property
+    def probe_port(self) -> Optional[int]:
+        return int(self.device_info['probe_port']) if self.device_info.get('probe_port', '').isdigit() else None
 
-    def __init__(self, on_device_found: Callable, on_device_lost: Callable):
-        self.on_device_found = on_device_found
-        self.on_device_lost = on_device_lost
-        self.devices: Dict[str, SparkDevice] = {}
+    def to_cache_entry(self) -> Dict:
+        """What the peer cache keeps to rebuild this device on the next start"""
+        return {
+            'name': self.name,
+            'address': self.advertised_address,
+            'addresses': self.addresses,
+            'port': self.port,
+            'device_info': self.device_info,
+            'last_seen': self.last_seen
+        }
 
-    def remove_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        print(f"Service {name} removed")
-        if name in self.devices:
-            device = self.devices.pop(name)
-            self.on_device_lost(device)
-
-    def add_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        info = zc.get_service_info(type_, name)
-        if info:
-            address = socket.inet_ntoa(info.addresses[0]) if info.addresses else None
-            port = info.port
-
-            # Parse device info from TXT records
-            device_info = {}
-            if info.properties:
-                for key, value in info.properties.items():
-                    try:
-                        device_info[key.decode('utf-8')] = value.decode('utf-8')
-                    except:
-                        pass
 
-            if address:
-                device = SparkDevice(name, address, port, device_info)
+class DeviceRegistry:
+    """
+    Known devices with TTL expiry, emitting only changes
+
+    Every record refresh renews a device's lease. Expiry times sit in a heap
+    (stale entries are skipped when popped), so one timer thread expires
+    devices that vanished without a goodbye without scanning the whole table.
+    Events carry a sequence number; a consumer that sees a gap resyncs from
+    snapshot(). Peers remembered from a previous run enter as 'probable' and
+    are either confirmed or dropped once probed.
+    """
+
+    def __init__(self, on_event: Callable[[str, Dict], None], ttl: float = DEVICE_TTL):
+        """
+        Args:
+            on_event: Called with ('probable' | 'found' | 'updated' | 'lost', device dict including 'seq')
+            ttl: Seconds a device stays listed without a refresh
+        """
+        self.on_event = on_event
+        self.ttl = ttl
+        self.devices: Dict[str, SparkDevice] = {}
+        self.seq = 0
+        self._expiry: List = []  # (expires_at, name) heap; entries older than _deadlines are stale
+        self._deadlines: Dict[str, float] = {}
+        self._lock = threading.Condition(threading.RLock())
+        self._pending: deque = deque()  # Events numbered under the lock, waiting to be delivered
+        self._dispatching = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def _emit(self, action: str, device: SparkDevice, **extra):
+        self.seq += 1
+        self._pending.append((action, {**device.to_dict(), 'seq': self.seq, **extra}))
+
+    @contextmanager
+    def _changing(self) -> Iterator[None]:
+        """Hold the lock for a change; the events it queued are delivered after the lock is released"""
+        with self._lock:
+            yield
+        self._flush()
+
+    def _flush(self):
+        """
+        Deliver queued events in sequence order, never under the registry lock
+
+        Callbacks do I/O (event stream, peer cache) and may call back into the
+        registry, so resolves and the expiry sweep mustn't wait on them. One
+        thread delivers at a time; a thread that finds another delivering leaves
+        its events to it.
+        """
+        while self._dispatching.acquire(blocking=False):
+            try:
+                while True:
+                    with self._lock:
+                        if not self._pending:
+                            break
+                        action, device = self._pending.popleft()
+                    self.on_event(action, device)
+            finally:
+                self._dispatching.release()
+            # Events queued after the last check but before the release would otherwise wait
+            with self._lock:
+                if not self._pending:
+                    return
+
+    def _set_deadline(self, name: str):
+        deadline = time.monotonic() + self.ttl
+        self._deadlines[name] = deadline
+        heapq.heappush(self._expiry, (deadline, name))
+        self._lock.notify()
+
+    def _renew(self, device: SparkDevice):
+        device.last_seen = time.time()
+        self._set_deadline(device.name)
+
+    def upsert(self, name: str, address: str, port: int, device_info: Dict,
+               addresses: Optional[List[str]] = None):
+        """Record a resolved service; emits 'found' or, if anything but last_seen/latency changed, 'updated'"""
+        with self._changing():
+            device = self.devices.get(name)
+            if device is None:
+                device = SparkDevice(name, address, port, device_info, addresses)
                 self.devices[name] = device
-                print(f"Service {name} added - {address}:{port}")
-                self.on_device_found(device)
+                self._renew(device)
+                self._emit('found', device)
+                return
+            if device.status == 'probable':
+                # mDNS got there before the probe did
+                device.update(address, port, device_info, addresses)
+                device.status = 'online'
+                self._renew(device)
+                self._emit('found', device)
+                return
+            before = device.to_dict()
+            device.update(address, port, device_info, addresses)
+            self._renew(device)
+            after = device.to_dict()
+            # Probe results change constantly; they ride along with real changes
+            for key in ('last_seen', 'latency'):
+                before.pop(key)
+                after.pop(key)
+            if before != after:
+                self._emit('updated', device)
+
+    def add_probable(self, entry: Dict):
+        """List a peer remembered from a previous run until a probe settles it"""
+        with self._changing():
+            if entry['name'] in self.devices:
+                return
+            device = SparkDevice(entry['name'], entry['address'], entry.get('port', 0), entry.get('device_info', {}),
+                                 entry.get('addresses'))
+            device.last_seen = entry.get('last_seen', device.last_seen)
+            device.status = 'probable'
+            self.devices[device.name] = device
+            self._set_deadline(device.name)
+            self._emit('probable', device)
+
+    def settle_probable(self, name: str, reachable: bool):
+        """Promote a probable peer that answered a probe, or drop one that didn't"""
+        with self._changing():
+            device = self.devices.get(name)
+            if device is None or device.status != 'probable':
+                return
+            if reachable:
+                device.status = 'online'
+                self._renew(device)
+                self._emit('found', device)
+            else:
+                self._remove(name, reason='unreachable')
+
+    def remove(self, name: str, reason: str = 'goodbye'):
+        """Drop a device; its heap entries are skipped when they come due"""
+        with self._changing():
+            self._remove(name, reason)
+
+    def _remove(self, name: str, reason: str):
+        device = self.devices.pop(name, None)
+        self._deadlines.pop(name, None)
+        if device is not None:
+            self._emit('lost', device, reason=reason)
+
+    def probe_targets(self) -> List[Dict]:
+        """Online devices with a probe responder, and the addresses and ports to probe them on"""
+        with self._lock:
+            return [{
+                'name': d.name,
+                'addresses': list(d.addresses),
+                'probe_port': d.probe_port,
+                'blob_port': d.blob_port
+            } for d in self.devices.values() if d.status == 'online' and d.probe_port]
+
+    def record_probe(self, name: str, address: str, rtt_ms: Optional[float] = None,
+                     bandwidth_mbps: Optional[float] = None):
+        """
+        Fold a probe result into a path's stats
+
+        Args:
+            name: Device probed
+            address: Which of its addresses
+            rtt_ms: Round-trip time; None (without bandwidth_mbps) records a failed probe
+            bandwidth_mbps: Throughput sample instead of an RTT
+        """
+        with self._changing():
+            device = self.devices.get(name)
+            if device is None or address not in device.addresses:
+                return
+            stats = device.paths.setdefault(address, PathStats())
+            if bandwidth_mbps is not None:
+                stats.add_bandwidth(bandwidth_mbps)
+                return
+            if rtt_ms is None:
+                stats.add_failure()
+            else:
+                stats.add_rtt(rtt_ms)
+            if device.choose_path():
+                print(f"LOG: Now reaching {name} via {device.address}")
+                self._emit('updated', device)
+
+    def best_path(self, name: str) -> Optional[str]:
+        with self._lock:
+            device = self.devices.get(name)
+            return device.address if device else None
+
+    def online(self) -> List[SparkDevice]:
+        """Devices seen on the network this run (not merely remembered)"""
+        with self._lock:
+            return [d for d in self.devices.values() if d.status == 'online']
+
+    def snapshot(self) -> Dict:
+        """Every listed device and the sequence number of the last event included"""
+        with self._lock:
+            return {'seq': self.seq, 'devices': [d.to_dict() for d in self.devices.values()]}
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._expire_loop, name="device-expiry", daemon=True)
+            self._thread.start()
 
-    def update_service(self, zc: Zeroconf, type_: str, name: str) -> None:
-        print(f"Service {name} updated")
-        # Treat update as a new discovery
-        self.add_service(zc, type_, name)
+    def stop(self):
+        with self._lock:
+            self._running = False
+            self._lock.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _expire_loop(self):
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+                now = time.monotonic()
+                while self._expiry and self._expiry[0][0] <= now:
+                    _, name = heapq.heappop(self._expiry)
+                    # Only act if no later renewal pushed this device's deadline out
+                    if self._deadlines.get(name, float('inf')) <= now:
+                        print(f"LOG: {name} not seen for {self.ttl:.0f}s; expiring it")
+                        self._remove(name, reason='expired')
+                if not self._pending:
+                    self._lock.wait(self._expiry[0][0] - now if self._expiry else None)
+                    continue
+            self._flush()
+
+
+class SparkServiceListener:
+    """
+    Listens for Spark devices on the network (a zeroconf ServiceListener;
+    browsers only call its add/update/remove_service methods)
+
+    Browser callbacks run on the discovery event loop and only schedule work:
+    each resolve is its own task, bounded by a semaphore and a timeout, and
+    update events arriving while a resolve for the same service is in flight
+    collapse into a single follow-up resolve.
+    """
+
+    def __init__(self, registry: DeviceRegistry,
+                 max_concurrent_resolves: int = MAX_CONCURRENT_RESOLVES,
+                 resolve_timeout_ms: int = RESOLVE_TIMEOUT_MS):
+        self.registry = registry
+        self.resolve_timeout_ms = resolve_timeout_ms
+        self._max_concurrent_resolves = max_concurrent_resolves
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._resolving: Dict[str, asyncio.Task] = {}
+        self._stale: Set[str] = set()  # Services updated again while being resolved
+
+    def remove_service(self, zc: 'Zeroconf', type_: str, name: str) -> None:
+        print(f"Service {name} removed")
+        task = self._resolving.pop(name, None)
+        if task:
+            task.cancel()
+        self._stale.discard(name)
+        self.registry.remove(name)
+
+    def add_service(self, zc: 'Zeroconf', type_: str, name: str) -> None:
+        self._schedule_resolve(zc, type_, name)
+
+    def update_service(self, zc: 'Zeroconf', type_: str, name: str) -> None:
+        self._schedule_resolve(zc, type_, name)
+
+    def _schedule_resolve(self, zc: 'Zeroconf', type_: str, name: str):
+        if name in self._resolving:
+            self._stale.add(name)
+            return
+        self._resolving[name] = asyncio.ensure_future(self._resolve(zc, type_, name))
+
+    async def _resolve(self, zc: 'Zeroconf', type_: str, name: str):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent_resolves)
+        try:
+            while True:
+                self._stale.discard(name)
+                async with self._semaphore:
+                    resolved, info = await self._request(zc, type_, name)
+                if resolved and _usable_addresses(info):
+                    self._apply(name, info)
+                elif name not in self.registry.devices:
+                    print(f"LOG: Could not resolve {name} within {self.resolve_timeout_ms} ms")
+                if name not in self._stale:
+                    break
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"ERROR: Resolving {name} failed: {e}")
+        finally:
+            self._resolving.pop(name, None)
+
+    async def _request(self, zc: 'Zeroconf', type_: str, name: str):
+        """
+        Resolve a service within resolve_timeout_ms
+
+        Requests are made in short slices with a cache check between them: when
+        many devices announce at once, the answers often arrive as unsolicited
+        announcements that a pending request doesn't pick up on its own.
+        """
+        from zeroconf.asyncio import AsyncServiceInfo
+
+        deadline = time.monotonic() + self.resolve_timeout_ms / 1000
+        info = AsyncServiceInfo(type_, name)
+        while True:
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                return False, info
+            if await info.async_request(zc, min(RESOLVE_SLICE_MS, remaining_ms)):
+                return True, info
+            info = AsyncServiceInfo(type_, name)
+            if info.load_from_cache(zc):
+                return True, info
+
+    def _apply(self, name: str, info: 'ServiceInfo'):
+        # Every address the peer advertises; IPv4 is the default path until probes say otherwise
+        addresses = _usable_addresses(info)
+        address = next((a for a in addresses if ':' not in a), addresses[0])
+        device_info = {}
+        if info.properties:
+            for key, value in info.properties.items():
+                try:
+                    device_info[key.decode('utf-8')] = value.decode('utf-8') if value is not None else ''
+                except:
+                    pass
+
+        self.registry.upsert(name, address, info.port, device_info, addresses)
 
 
 class NetworkDiscovery:
@@ -78,55 +504,136 @@ class NetworkDiscovery:
 
     SERVICE_TYPE = "_spark._tcp.local."
 
-    def __init__(self, device_name: str, port: int = 3001, role: str = "host"):
+    def __init__(self, device_name: str, port: int = 3001, role: str = "host",
+                 sample_interval: float = DEFAULT_SAMPLE_INTERVAL, sample_window: int = DEFAULT_WINDOW,
+                 device_ttl: float = DEVICE_TTL, peer_cache: Optional[PeerCache] = None,
+                 probe_interval: float = PROBE_INTERVAL, interfaces: Optional[List[str]] = None,
+                 sampler: Optional[ResourceSampler] = None, loop: Optional[asyncio.AbstractEventLoop] = None,
+                 max_concurrent_resolves: int = MAX_CONCURRENT_RESOLVES):
+        """
+        Args:
+            probe_interval: Seconds between peer path probes (0 disables probing)
+            interfaces: Addresses of the interfaces mDNS uses; all of them by default
+            sampler: Sampler shared with other services; discovery starts its own if None
+            loop: Running event loop (in another thread) to run zeroconf on instead of starting one
+            max_concurrent_resolves: Services resolved at once when many announce together
+        """
         self.device_name = device_name
         self.port = port
         self.role = role
-        self.zeroconf: Optional[Zeroconf] = None
-        self.service_info: Optional[ServiceInfo] = None
-        self.browser: Optional[ServiceBrowser] = None
+        self.aiozc: Optional['AsyncZeroconf'] = None
+        self.zeroconf: Optional['Zeroconf'] = None
+        self.service_info: Optional['ServiceInfo'] = None
+        self.browser: Optional['AsyncServiceBrowser'] = None
         self.listener: Optional[SparkServiceListener] = None
         self.device_callbacks: List[Callable] = []
+        self.registry = DeviceRegistry(self._on_device_event, ttl=device_ttl)
+        self.peer_cache = peer_cache or PeerCache()
+        self._cache_save_timer: Optional[threading.Timer] = None
+        self.prober = PeerProber(self.registry, interval=probe_interval)
+        self.responder: Optional[ProbeResponder] = None
+        self.probe_interval = probe_interval
+        self.interfaces = interfaces
+        self.max_concurrent_resolves = max_concurrent_resolves
         self.running = False
+        self.sampler = sampler or ResourceSampler(interval=sample_interval, window=sample_window)
+        self._owns_sampler = sampler is None
+        # Live load published in the TXT record; tps/lm come from set_load
+        self.load: Dict = {'tps': 0.0, 'lm': ''}
+        self._tps_at = 0.0  # When tokens/s was last reported
+        self._published_load: Dict = {}
+        self._last_txt_update = 0.0
+        self._announcements = 0
+        self._base_properties: Dict[bytes, bytes] = {}
+        self._service_address = None  # (service name, local addresses, hostname) of our record
+        self._load_thread: Optional[threading.Thread] = None
+        self._load_stop = threading.Event()
+        # Zeroconf runs on its own asyncio loop; the public methods stay synchronous
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._shared_loop = loop
+
+    def _call(self, coro, timeout: float = 10.0):
+        """Run a coroutine on the discovery loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def _ensure_zeroconf(self):
+        """Start the discovery loop and AsyncZeroconf on first use"""
+        if self.aiozc:
+            return
+        from zeroconf.asyncio import AsyncZeroconf
+
+        if self._shared_loop is not None:
+            self._loop = self._shared_loop
+        else:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(target=self._loop.run_forever, name="discovery-loop", daemon=True)
+            self._loop_thread.start()
+
+        async def create():
+            return AsyncZeroconf(interfaces=self.interfaces) if self.interfaces else AsyncZeroconf()
+        self.aiozc = self._call(create())
+        self.zeroconf = self.aiozc.zeroconf
 
     def get_system_info(self) -> Dict:
-        """Get current system resource information"""
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
+        """
+        Get current system resource information without blocking
 
-        # Try to get GPU info if available
-        gpu_info = "N/A"
-        try:
-            import GPUtil
-            gpus = GPUtil.getGPUs()
-            if gpus:
-                gpu_info = f"{gpus[0].name} ({gpus[0].memoryUsed}/{gpus[0].memoryTotal}MB)"
-        except:
-            pass
-
-        return {
-            'cpu_percent': cpu_percent,
-            'memory_percent': memory.percent,
-            'memory_total_gb': round(memory.total / (1024**3), 2),
-            'memory_used_gb': round(memory.used / (1024**3), 2),
-            'gpu_info': gpu_info
-        }
+        Returns the latest background sample (CPU, memory, network, this process)
+        plus averages and percentiles over the sampler's window under 'window'.
+        """
+        if not self.sampler.running:
+            self.sampler.start()
+        return self.sampler.snapshot()
 
     def register_device_callback(self, callback: Callable):
         """Register a callback for when devices are found/lost"""
         self.device_callbacks.append(callback)
 
-    def _on_device_found(self, device: SparkDevice):
-        """Internal callback when a device is found"""
-        print(f"LOG: Discovered device: {device.name} at {device.address}:{device.port}")
-        for callback in self.device_callbacks:
-            callback('found', device.to_dict())
-
-    def _on_device_lost(self, device: SparkDevice):
-        """Internal callback when a device is lost"""
-        print(f"LOG: Lost device: {device.name}")
+    def _on_device_event(self, action: str, device: Dict):
+        """Internal callback for every registry change"""
+        if action == 'found':
+            print(f"LOG: Discovered device: {device['name']} at {device['address']}:{device['port']}")
+        elif action == 'lost':
+            print(f"LOG: Lost device: {device['name']} ({device.get('reason', 'goodbye')})")
         for callback in self.device_callbacks:
-            callback('lost', device.to_dict())
+            callback(action, device)
+        if action in ('found', 'lost'):
+            self._schedule_cache_save()
+
+    @property
+    def _own_service_name(self) -> str:
+        return f"{self.device_name}.{self.SERVICE_TYPE}"
+
+    def _schedule_cache_save(self):
+        """Rewrite the peer cache shortly, batching a burst of changes into one write"""
+        if self._cache_save_timer is not None:
+            return
+        self._cache_save_timer = threading.Timer(PEER_CACHE_SAVE_DELAY, self.save_peer_cache)
+        self._cache_save_timer.daemon = True
+        self._cache_save_timer.start()
+
+    def save_peer_cache(self):
+        """Persist the peers seen this run for the next warm start"""
+        self._cache_save_timer = None
+        try:
+            self.peer_cache.save(d.to_cache_entry() for d in self.registry.online()
+                                 if d.name != self._own_service_name)
+        except OSError as e:
+            print(f"ERROR: Could not save peer cache: {e}")
+
+    def _warm_start(self):
+        """List remembered peers as probable right away, then confirm or drop each with a direct probe"""
+        remembered = [p for p in self.peer_cache.load() if p['name'] != self._own_service_name]
+        if not remembered:
+            return
+        for entry in remembered:
+            self.registry.add_probable(entry)
+        print(f"LOG: Probing {len(remembered)} peer(s) remembered from the last run")
+
+        def probe():
+            probe_peers(remembered, lambda entry, ok: self.registry.settle_probable(entry['name'], ok))
+        threading.Thread(target=probe, name="peer-probe", daemon=True).start()
 
     def _get_local_ip(self) -> str:
         """Get the local network IP address (not 127.0.0.1)"""
@@ -145,6 +652,7 @@ class NetworkDiscovery:
         
         # Method 2: Use psutil to find the first non-loopback interface
         try:
+            import psutil
             for iface, addrs in psutil.net_if_addrs().items():
                 if iface == 'lo' or iface.startswith('lo'):
                     continue
@@ -159,14 +667,38 @@ class NetworkDiscovery:
         local_ip = socket.gethostbyname(hostname)
         return local_ip
 
-    def start_broadcasting(self, personality: str = "", model: str = ""):
-        """Start broadcasting this device's presence on the network"""
-        self.zeroconf = Zeroconf()
+    def _get_local_addresses(self) -> List[str]:
+        """Every routable IPv4 and IPv6 address on every interface, the default-route IPv4 first"""
+        addresses = [self._get_local_ip()]
+        try:
+            import psutil
+            for iface, addrs in psutil.net_if_addrs().items():
+                for addr in addrs:
+                    if addr.family not in (socket.AF_INET, socket.AF_INET6):
+                        continue
+                    address = addr.address.split('%')[0]
+                    try:
+                        if _routable(address) and address not in addresses:
+                            addresses.append(address)
+                    except ValueError:
+                        pass
+        except Exception:
+            pass
+        return addresses
+
+    def start_broadcasting(self, personality: str = "", model: str = "", blob_port: Optional[int] = None):
+        """
+        Start broadcasting this device's presence on the network
+
+        Args:
+            blob_port: Port of this node's model blob server, advertised so peers download from it
+        """
+        self._ensure_zeroconf()
 
         # Get local IP
         hostname = socket.gethostname()
-        local_ip = self._get_local_ip()
-        print(f"LOG: Detected local IP: {local_ip}")
+        local_addresses = self._get_local_addresses()
+        print(f"LOG: Detected local addresses: {', '.join(local_addresses)}")
 
         # Create service info with device metadata
         properties = {
@@ -175,103 +707,235 @@ class NetworkDiscovery:
             b'model': model.encode('utf-8'),
             b'hostname': hostname.encode('utf-8')
         }
+        if blob_port:
+            properties[b'blob_port'] = str(blob_port).encode('utf-8')
+        # Answers peers' path probes with our name, so they know which addresses really reach us
+        if self.responder is None:
+            self.responder = ProbeResponder(self._own_service_name)
+            self.responder.start()
+        properties[b'probe_port'] = str(self.responder.port).encode('utf-8')
+        self._base_properties = properties
+        self.load['lm'] = self.load['lm'] or model
 
         # Create service name
         service_name = f"{self.device_name}.{self.SERVICE_TYPE}"
 
-        self.service_info = ServiceInfo(
+        self._service_address = (service_name, local_addresses, hostname)
+        self._published_load = self._current_load()
+        self.service_info = self._build_service_info(self._published_load)
+
+        self._call(self._register(self.service_info))
+        self._last_txt_update = time.monotonic()
+        print(f"LOG: Broadcasting as {service_name} on {local_addresses[0]}:{self.port}")
+        self.running = True
+
+        self._load_stop.clear()
+        self._load_thread = threading.Thread(target=self._publish_load_loop, name="load-publisher", daemon=True)
+        self._load_thread.start()
+
+    async def _register(self, info: 'ServiceInfo'):
+        await (await self.aiozc.async_register_service(info))
+
+    async def _update(self, info: 'ServiceInfo'):
+        await (await self.aiozc.async_update_service(info))
+
+    async def _unregister(self, info: 'ServiceInfo'):
+        await (await self.aiozc.async_unregister_service(info))
+
+    def _build_service_info(self, load: Dict) -> 'ServiceInfo':
+        from zeroconf import ServiceInfo
+
+        service_name, local_addresses, hostname = self._service_address
+        properties = dict(self._base_properties)
+        for key in LOAD_FIELDS:
+            value = load.get(key)
+            properties[key.encode('utf-8')] = (f"{value:g}" if isinstance(value, float) else str(value)).encode('utf-8')
+        # Browsers only report a re-announce whose record changed, so a counter
+        # makes every heartbeat visible to peers even when load is the same
+        self._announcements += 1
+        properties[b'hb'] = str(self._announcements).encode('utf-8')
+        return ServiceInfo(
             self.SERVICE_TYPE,
             service_name,
-            addresses=[socket.inet_aton(local_ip)],
+            parsed_addresses=local_addresses,
             port=self.port,
             properties=properties,
             server=f"{hostname}.local."
         )
 
-        self.zeroconf.register_service(self.service_info)
-        print(f"LOG: Broadcasting as {service_name} on {local_ip}:{self.port}")
-        self.running = True
+    def _current_load(self) -> Dict:
+        if not self.sampler.running:
+            self.sampler.start()
+        sample = self.sampler.latest()
+        # The window average, so momentary spikes don't trigger announcements
+        cpu = self.sampler.window_stats().get('cpu_percent', {}).get('avg', 0.0)
+        # Parallax only logs throughput while generating, so silence means idle
+        tps = self.load.get('tps') or 0.0 if time.monotonic() - self._tps_at < TPS_IDLE_AFTER else 0.0
+        return {
+            'cpu': int(round(cpu)),
+            'mem': int(round(sample.memory_percent)) if sample else 0,
+            'tps': round(float(tps), 1),
+            'lm': self.load.get('lm') or '',
+        }
+
+    def set_load(self, tokens_per_sec: Optional[float] = None, loaded_model: Optional[str] = None):
+        """Report inference load; it is announced on the next significant change"""
+        if tokens_per_sec is not None:
+            self.load['tps'] = tokens_per_sec
+            self._tps_at = time.monotonic()
+        if loaded_model is not None:
+            self.load['lm'] = loaded_model
+
+    def publish_load(self, force: bool = False) -> bool:
+        """
+        Re-announce the service record if load moved past a threshold
+
+        Updates are rate-limited to one per MIN_TXT_UPDATE_INTERVAL so a busy
+        node doesn't flood the multicast group, and sent at least every
+        HEARTBEAT_INTERVAL. Returns True if one was sent.
+        """
+        if not self.service_info or not self.aiozc:
+            return False
+        load = self._current_load()
+        since_update = time.monotonic() - self._last_txt_update
+        # A heartbeat re-announce renews our lease in peers' registries even when idle
+        if not force and since_update < HEARTBEAT_INTERVAL and (
+                not load_changed(self._published_load, load) or since_update < MIN_TXT_UPDATE_INTERVAL):
+            return False
+        self.service_info = self._build_service_info(load)
+        self._call(self._update(self.service_info))
+        self._published_load = load
+        self._last_txt_update = time.monotonic()
+        return True
+
+    def _publish_load_loop(self):
+        while not self._load_stop.wait(LOAD_CHECK_INTERVAL):
+            try:
+                self.publish_load()
+            except Exception as e:
+                print(f"ERROR: Could not publish load: {e}")
 
     def start_discovery(self):
         """Start discovering other Spark devices on the network"""
-        if not self.zeroconf:
-            self.zeroconf = Zeroconf()
-
-        self.listener = SparkServiceListener(
-            on_device_found=self._on_device_found,
-            on_device_lost=self._on_device_lost
-        )
-
-        self.browser = ServiceBrowser(self.zeroconf, self.SERVICE_TYPE, self.listener)
+        self._ensure_zeroconf()
+
+        self.registry.start()
+        self._warm_start()
+        self.listener = SparkServiceListener(self.registry, max_concurrent_resolves=self.max_concurrent_resolves)
+        if self.probe_interval:
+            self.prober.start()
+
+        async def browse():
+            from zeroconf.asyncio import AsyncServiceBrowser
+            return AsyncServiceBrowser(self.zeroconf, self.SERVICE_TYPE, listener=self.listener)
+        self.browser = self._call(browse())
         print(f"LOG: Started discovery for {self.SERVICE_TYPE}")
         self.running = True
 
-    def get_discovered_devices(self) -> List[Dict]:
-        """Get list of all discovered devices"""
-        if self.listener:
-            return [device.to_dict() for device in self.listener.devices.values()]
-        return []
+    def get_discovered_devices(self, sort: Optional[str] = None) -> List[Dict]:
+        """
+        Get list of all discovered devices
+
+        Args:
+            sort: None for discovery order, or "latency" for the fastest
+                measured path first (unprobed devices last)
+        """
+        devices = self.registry.snapshot()['devices']
+        if sort == "latency":
+            devices.sort(key=lambda d: d['latency']['rtt_ms'] if d['latency'] else float('inf'))
+        elif sort is not None:
+            raise ValueError(f"Unknown sort order: {sort}")
+        return devices
+
+    def snapshot(self) -> Dict:
+        """All current devices plus the sequence number of the last event, for consumers to resync"""
+        return self.registry.snapshot()
 
     def stop(self):
         """Stop broadcasting and discovery"""
         print("LOG: Stopping network discovery...")
         self.running = False
+        self._load_stop.set()
+        if self._load_thread:
+            self._load_thread.join(timeout=LOAD_CHECK_INTERVAL + 1)
+            self._load_thread = None
+        if self._owns_sampler:
+            self.sampler.stop()
+        self.prober.stop()
+        if self.responder is not None:
+            self.responder.stop()
+            self.responder = None
+        if self._cache_save_timer is not None:
+            self._cache_save_timer.cancel()
+        if self.listener:
+            self.save_peer_cache()
+        self.registry.stop()
+
+        if self.aiozc:
+            try:
+                if self.browser:
+                    self._call(self.browser.async_cancel())
+                if self.service_info:
+                    self._call(self._unregister(self.service_info))
+                self._call(self.aiozc.async_close())
+            except Exception as e:
+                print(f"ERROR: Error while stopping discovery: {e}")
+            if self._loop_thread is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loop_thread.join(timeout=5)
+                self._loop.close()
+        self.browser = None
+        self.service_info = None
+        self.aiozc = None
+        self.zeroconf = None
+        self._loop = None
+        self._loop_thread = None
 
-        if self.browser:
-            self.browser.cancel()
-            self.browser = None
-
-        if self.service_info and self.zeroconf:
-            self.zeroconf.unregister_service(self.service_info)
-            self.service_info = None
+        print("LOG: Network discovery stopped")
 
-        if self.zeroconf:
-            self.zeroconf.close()
-            self.zeroconf = None
 
-        print("LOG: Network discovery stopped")
+def stream_device_events(discovery: NetworkDiscovery, events):
+    """Send every registry change to Electron as a discovery.* bridge event"""
+    def on_device_update(action: str, device: Dict):
+        # A device's updates only matter up to the latest one
+        events.emit(f"discovery.{action}", device, key=device['name'] if action == 'updated' else None)
+    discovery.register_device_callback(on_device_update)
 
 
 if __name__ == "__main__":
     # Network discovery service for Spark Voice Assistant
     import sys
-    import json
 
+    import bridge_events
+
+    events = bridge_events.install("network_discovery")
     device_name = sys.argv[1] if len(sys.argv) > 1 else "Spark"
     role = sys.argv[2] if len(sys.argv) > 2 else "host"
 
     print(f"LOG: Starting network discovery for {device_name} as {role}")
-    sys.stdout.flush()
 
     discovery = NetworkDiscovery(device_name, role=role)
-
-    def on_device_update(action, device):
-        """Output device updates in JSON format for Electron to parse"""
-        output = f"{action.upper()}: {json.dumps(device)}"
-        print(output)
-        sys.stdout.flush()
-
-    discovery.register_device_callback(on_device_update)
+    stream_device_events(discovery, events)
     
     try:
-        discovery.start_broadcasting(personality="", model="")
+        # The model service shares blobs on this port when sharing is opted into
+        blob_port = shared_blob_port()
+        discovery.start_broadcasting(personality="", model="", blob_port=blob_port)
         discovery.start_discovery()
         
         print("LOG: Network discovery running...")
-        sys.stdout.flush()
         
-        # Keep running and periodically report discovered devices
+        # Only changes are sent; Electron sends SNAPSHOT when it needs to resync
+        def read_commands():
+            for line in sys.stdin:
+                if line.strip() == "SNAPSHOT":
+                    events.emit("discovery.snapshot", discovery.snapshot(), immediate=True)
+
+        threading.Thread(target=read_commands, name="commands", daemon=True).start()
         while True:
-            time.sleep(10)
-            devices = discovery.get_discovered_devices()
-            if devices:
-                print(f"LOG: Currently see {len(devices)} device(s)")
-                for d in devices:
-                    print(f"DEVICE: {json.dumps(d)}")
-                sys.stdout.flush()
+            time.sleep(3600)
     except KeyboardInterrupt:
         print("LOG: Stopping network discovery...")
         discovery.stop()
     except Exception as e:
         print(f"ERROR: {e}")
-        sys.stdout.flush()
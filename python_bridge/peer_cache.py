@@ -0,0 +1,95 @@
+"""
+Peer Cache
+Remembers the devices discovery last saw so a restart can list them straight
+away as probable peers and confirm them with a direct probe of their probe
+responder, instead of waiting for mDNS to converge
+"""
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from peer_probe import measure_rtt
+
+
+PEER_CACHE_MAX_AGE = 7 * 24 * 3600  # Seconds after which a remembered peer isn't worth probing
+PROBE_CONNECT_TIMEOUT = 0.5  # Seconds for one TCP connect
+PROBE_WORKERS = 32
+
+
+def default_peer_cache_path() -> Path:
+    """Where discovery keeps its peer cache (SPARK_PEER_CACHE overrides it)"""
+    if os.environ.get("SPARK_PEER_CACHE"):
+        return Path(os.environ["SPARK_PEER_CACHE"])
+    return Path.home() / ".cache" / "spark-discovery" / "peers.json"
+
+
+class PeerCache:
+    """JSON file of recently seen peers, written atomically"""
+
+    def __init__(self, path: Optional[Path] = None, max_age: float = PEER_CACHE_MAX_AGE):
+        self.path = Path(path) if path else default_peer_cache_path()
+        self.max_age = max_age
+
+    def load(self) -> List[Dict]:
+        """
+        Remembered peers seen within max_age, most recent first
+
+        Returns:
+            Entries with name, address, port, device_info and last_seen. A
+            missing or unreadable cache gives an empty list
+        """
+        try:
+            with open(self.path, 'r') as f:
+                peers = json.load(f).get('peers', [])
+        except (OSError, ValueError, AttributeError):
+            return []
+        cutoff = time.time() - self.max_age
+        fresh = [p for p in peers if isinstance(p, dict) and p.get('name') and p.get('address')
+                 and p.get('last_seen', 0) >= cutoff]
+        return sorted(fresh, key=lambda p: p['last_seen'], reverse=True)
+
+    def save(self, peers: Iterable[Dict]):
+        """Replace the cache with the given entries"""
+        data = {'saved_at': time.time(), 'peers': list(peers)}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+def peer_reachable(address: str, name: str, probe_port: Optional[int],
+                   timeout: float = PROBE_CONNECT_TIMEOUT) -> bool:
+    """
+    True if the peer's probe responder answers at this address as the named peer
+
+    Addresses get reused (DHCP), so an open port only counts when the greeting
+    names the device we remembered; a peer with no probe port can't be told apart
+    """
+    return bool(probe_port) and measure_rtt(address, probe_port, name, timeout) is not None
+
+
+def probe_peers(peers: List[Dict], on_result: Callable[[Dict, bool], None],
+                timeout: float = PROBE_CONNECT_TIMEOUT):
+    """
+    Probe remembered peers in parallel, reporting each as soon as it answers
+
+    Args:
+        peers: Entries from PeerCache.load
+        on_result: Called with (entry, reachable) per peer, fastest first
+        timeout: Per-connect timeout
+    """
+    if not peers:
+        return
+
+    def probe_port_of(peer: Dict) -> Optional[int]:
+        port = peer.get('device_info', {}).get('probe_port', '')
+        return int(port) if str(port).isdigit() else None
+
+    with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(peers))) as pool:
+        jobs = {pool.submit(peer_reachable, p['address'], p['name'], probe_port_of(p), timeout): p for p in peers}
+        for future in as_completed(jobs):
+            on_result(jobs[future], future.result())
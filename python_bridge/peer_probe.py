@@ -0,0 +1,285 @@
+"""
+Peer Path Probing
+Measures round-trip time and a short throughput sample to every address a
+peer advertises, keeping smoothed per-path stats so callers can pick the
+fastest peer and the fastest way to reach it. Every node runs a probe
+responder that greets connections with its service name, so a path only
+counts once it is known to reach the peer it was advertised for
+"""
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+from peer_share import TOKEN_HEADER, cluster_token, peer_url
+
+if TYPE_CHECKING:
+    from network_discovery import DeviceRegistry
+
+
+EWMA_ALPHA = 0.3  # Weight of the newest sample in the smoothed stats
+PROBE_INTERVAL = 15.0  # Seconds between probe rounds
+THROUGHPUT_EVERY = 4  # Probe rounds between throughput samples
+THROUGHPUT_SAMPLE_BYTES = 256 * 1024
+CONNECT_TIMEOUT = 1.0
+DEFAULT_PROBE_PORT = 3003
+PROBE_GREETING = b'SPARK '
+MAX_GREETING_BYTES = 512
+PROBE_WORKERS = 32
+SWITCH_MARGIN = 0.8  # Another path must be this fraction of the current RTT to take over...
+SWITCH_MIN_GAIN_MS = 0.5  # ...and at least this much faster
+
+
+class PathStats:
+    """Smoothed latency and throughput of one address of a peer"""
+
+    def __init__(self):
+        self.rtt_ms: Optional[float] = None
+        self.rtt_dev_ms = 0.0  # Smoothed deviation, like TCP's RTTVAR
+        self.bandwidth_mbps: Optional[float] = None
+        self.samples = 0
+        self.failures = 0  # Consecutive probes without an answer
+        self.last_probe: Optional[float] = None
+
+    def add_rtt(self, rtt_ms: float):
+        if self.rtt_ms is None:
+            self.rtt_ms = rtt_ms
+            self.rtt_dev_ms = rtt_ms / 2
+        else:
+            self.rtt_dev_ms += EWMA_ALPHA * (abs(rtt_ms - self.rtt_ms) - self.rtt_dev_ms)
+            self.rtt_ms += EWMA_ALPHA * (rtt_ms - self.rtt_ms)
+        self.samples += 1
+        self.failures = 0
+        self.last_probe = time.time()
+
+    def add_failure(self):
+        self.failures += 1
+        self.last_probe = time.time()
+
+    def add_bandwidth(self, mbps: float):
+        if self.bandwidth_mbps is None:
+            self.bandwidth_mbps = mbps
+        else:
+            self.bandwidth_mbps += EWMA_ALPHA * (mbps - self.bandwidth_mbps)
+
+    @property
+    def usable(self) -> bool:
+        return self.rtt_ms is not None and self.failures < 3
+
+    def to_dict(self) -> Dict:
+        return {
+            'rtt_ms': round(self.rtt_ms, 2) if self.rtt_ms is not None else None,
+            'jitter_ms': round(self.rtt_dev_ms, 2),
+            'bandwidth_mbps': round(self.bandwidth_mbps, 1) if self.bandwidth_mbps is not None else None,
+            'samples': self.samples,
+            'failures': self.failures
+        }
+
+
+def current_is_close(current_rtt_ms: float, candidate_rtt_ms: float) -> bool:
+    """True if a candidate path isn't enough faster to be worth switching to"""
+    return candidate_rtt_ms > min(current_rtt_ms * SWITCH_MARGIN, current_rtt_ms - SWITCH_MIN_GAIN_MS)
+
+
+def local_addresses() -> Set[str]:
+    """Every address on this machine's interfaces, including loopback, bridges and VPN tunnels"""
+    addresses = set()
+    try:
+        import psutil
+        for addrs in psutil.net_if_addrs().values():
+            for addr in addrs:
+                if addr.family in (socket.AF_INET, socket.AF_INET6):
+                    addresses.add(addr.address.split('%')[0])
+    except Exception:
+        pass
+    return addresses
+
+
+def _read_greeting(s: socket.socket) -> bytes:
+    data = b''
+    while b'\n' not in data and len(data) < MAX_GREETING_BYTES:
+        block = s.recv(MAX_GREETING_BYTES)
+        if not block:
+            break
+        data += block
+    return data.split(b'\n', 1)[0]
+
+
+def measure_rtt(address: str, port: int, expected_name: str, timeout: float = CONNECT_TIMEOUT) -> Optional[float]:
+    """
+    Time a TCP handshake to a peer's probe responder in milliseconds
+
+    The responder greets with its service name. A refusal, a timeout or a
+    greeting from anyone else (the address leads to another machine, or back
+    to this one) gives None.
+    """
+    family = socket.AF_INET6 if ':' in address else socket.AF_INET
+    with socket.socket(family, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        started = time.perf_counter()
+        try:
+            s.connect((address, port))
+            rtt_ms = (time.perf_counter() - started) * 1000
+            greeting = _read_greeting(s)
+        except OSError:
+            return None
+    return rtt_ms if greeting == PROBE_GREETING + expected_name.encode('utf-8') else None
+
+
+def measure_throughput(address: str, blob_port: int, token: str, nbytes: int = THROUGHPUT_SAMPLE_BYTES,
+                       timeout: float = 5.0) -> Optional[float]:
+    """Download a sample from the peer's blob server (which wants the cluster token); returns megabits per second"""
+    import requests
+
+    url = f"{peer_url(address, blob_port)}/probe?bytes={nbytes}"
+    try:
+        started = time.perf_counter()
+        response = requests.get(url, headers={TOKEN_HEADER: token}, timeout=timeout, stream=True)
+        if response.status_code != 200:
+            return None
+        received = sum(len(chunk) for chunk in response.iter_content(chunk_size=64 * 1024))
+        elapsed = time.perf_counter() - started
+    except requests.RequestException:
+        return None
+    return received * 8 / 1e6 / max(elapsed, 1e-6) if received else None
+
+
+class ProbeResponder:
+    """Greets every TCP connection with this node's service name, so probers can tell whom they reached"""
+
+    def __init__(self, name: str, port: int = DEFAULT_PROBE_PORT):
+        """
+        Args:
+            name: Our mDNS service name, which peers know us by
+            port: TCP port to listen on; a free one is picked if it's taken
+        """
+        self.greeting = PROBE_GREETING + name.encode('utf-8') + b'\n'
+        try:
+            self.sock = self._listen(port)
+        except OSError:
+            self.sock = self._listen(0)
+        self.sock.settimeout(0.5)  # So the accept loop notices stop()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _listen(port: int) -> socket.socket:
+        try:
+            sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+            address = ('::', port)
+        except OSError:
+            # No IPv6 on this machine
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = ('0.0.0.0', port)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(address)
+            sock.listen(64)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    @property
+    def port(self) -> int:
+        return self.sock.getsockname()[1]
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._serve, name="probe-responder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self.sock.close()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                conn, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            with conn:
+                try:
+                    conn.settimeout(CONNECT_TIMEOUT)
+                    conn.sendall(self.greeting)
+                except OSError:
+                    pass
+
+
+class PeerProber:
+    """Probes every path to every online peer on an interval and feeds the registry"""
+
+    def __init__(self, registry: 'DeviceRegistry', interval: float = PROBE_INTERVAL,
+                 throughput_every: int = THROUGHPUT_EVERY):
+        """
+        Args:
+            registry: Registry whose online devices are probed and which records the results
+            interval: Seconds between probe rounds
+            throughput_every: Rounds between throughput samples (0 disables them)
+        """
+        self.registry = registry
+        self.interval = interval
+        self.throughput_every = throughput_every
+        # Peers' blob servers only answer holders of the cluster token
+        self.token = cluster_token()
+        self.rounds = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="peer-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=CONNECT_TIMEOUT + 1)
+            self._thread = None
+
+    def _run(self):
+        # First round shortly after start, once mDNS has had a moment to fill the registry
+        delay = min(self.interval, 2.0)
+        while not self._stop.wait(delay):
+            try:
+                self.probe_once()
+            except Exception as e:
+                print(f"ERROR: Peer probing failed: {e}")
+            delay = self.interval
+
+    def probe_once(self):
+        """One concurrent round: RTT on every path, then throughput on each peer's best path when due"""
+        targets = self.registry.probe_targets()
+        if not targets:
+            return
+        # Peers can advertise addresses this machine has too (Docker and libvirt
+        # bridges, VPN tunnels); probing those only reaches ourselves
+        local = local_addresses()
+        paths = [(t, address) for t in targets for address in t['addresses'] if address not in local]
+        with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as pool:
+            rtts = list(pool.map(lambda p: measure_rtt(p[1], p[0]['probe_port'], p[0]['name']), paths))
+            for (target, address), rtt in zip(paths, rtts):
+                self.registry.record_probe(target['name'], address, rtt_ms=rtt)
+
+            self.rounds += 1
+            if not self.throughput_every or not self.token or (self.rounds - 1) % self.throughput_every:
+                return
+            sampled: List[Dict] = [t for t in targets if t['blob_port']]
+            best = [self.registry.best_path(t['name']) for t in sampled]
+            rates = list(pool.map(
+                lambda pair: measure_throughput(pair[1], pair[0]['blob_port'], self.token) if pair[1] else None,
+                zip(sampled, best)
+            ))
+            for target, address, mbps in zip(sampled, best, rates):
+                if address and mbps is not None:
+                    self.registry.record_probe(target['name'], address, bandwidth_mbps=mbps)
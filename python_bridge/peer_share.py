@@ -0,0 +1,246 @@
+"""
+Peer Blob Sharing
+Serves this node's blob store over HTTP on the LAN and finds which peers
+already hold the blobs a download needs, so N nodes pull a model from
+Hugging Face roughly once instead of N times
+
+Sharing is off unless SPARK_SHARE_BLOBS=1, and every request must carry the
+cluster token (SPARK_CLUSTER_TOKEN) that all nodes of the cluster share, so
+other hosts on the LAN can't read gated or private weights
+"""
+import hmac
+import os
+import re
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from blob_store import BlobStore
+
+
+DEFAULT_BLOB_PORT = 3002
+PROBE_TIMEOUT = 2.0  # Seconds to wait for a peer to answer a HEAD request
+PROBE_WORKERS = 16
+COPY_CHUNK_SIZE = 1024 * 1024
+PROBE_MAX_BYTES = 4 * 1024 * 1024  # Largest throughput sample served on /probe
+TOKEN_HEADER = 'X-Spark-Cluster-Token'
+
+# Blob keys are sha256 or git sha1 digests, optionally with a filename hash suffix
+_BLOB_KEY_RE = re.compile(r'^[0-9a-f]{40,64}(-[0-9a-f]{64})?$')
+_RANGE_RE = re.compile(r'^bytes=(\d+)-(\d*)$')
+_PROBE_RE = re.compile(r'^/probe(?:\?bytes=(\d+))?$')
+
+
+def cluster_token() -> Optional[str]:
+    """The secret shared by every node of the cluster, or None when SPARK_CLUSTER_TOKEN isn't set"""
+    return os.environ.get('SPARK_CLUSTER_TOKEN', '').strip() or None
+
+
+def sharing_enabled() -> bool:
+    """True if this node should serve its blobs: opted in with SPARK_SHARE_BLOBS=1 and a cluster token set"""
+    return os.environ.get('SPARK_SHARE_BLOBS', '0') == '1' and cluster_token() is not None
+
+
+def shared_blob_port() -> Optional[int]:
+    """Port to advertise for our blob server, or None when sharing is off"""
+    if not sharing_enabled():
+        return None
+    return int(os.environ.get('SPARK_BLOB_PORT', DEFAULT_BLOB_PORT))
+
+
+def peer_url(address: str, port: int) -> str:
+    """Base URL of a peer's blob server"""
+    if ':' in address:
+        return f"http://[{address}]:{port}"
+    return f"http://{address}:{port}"
+
+
+class _BlobRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET/HEAD /blobs/<key>, with single-range support so peers can split and
+    resume, plus GET /probe?bytes=N for throughput samples. Requests without
+    the cluster token get 403
+    """
+
+    blobs: BlobStore  # Set on the subclass built by BlobServer
+    token: str
+
+    def log_message(self, format, *args):
+        pass  # Keep stdout for the LOG:/ERROR: protocol
+
+    def _authorized(self) -> bool:
+        if hmac.compare_digest(self.headers.get(TOKEN_HEADER, '').encode(), self.token.encode()):
+            return True
+        self.send_error(403)
+        return False
+
+    def _open_blob(self):
+        key = self.path.rsplit('/', 1)[-1]
+        if not self.path.startswith('/blobs/') or not _BLOB_KEY_RE.match(key):
+            self.send_error(404)
+            return None, 0
+        try:
+            f = open(self.blobs.path(key), 'rb')
+        except FileNotFoundError:
+            self.send_error(404)
+            return None, 0
+        return f, os.fstat(f.fileno()).st_size
+
+    def _serve(self, send_body: bool):
+        f, size = self._open_blob()
+        if f is None:
+            return
+        with f:
+            start, end = 0, size - 1
+            match = _RANGE_RE.match(self.headers.get('Range', ''))
+            if match:
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)), size - 1)
+                if start >= size or start > end:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f"bytes */{size}")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(end - start + 1 if size else 0))
+            self.end_headers()
+            if not send_body or size == 0:
+                return
+            f.seek(start)
+            remaining = end - start + 1
+            try:
+                while remaining > 0:
+                    block = f.read(min(COPY_CHUNK_SIZE, remaining))
+                    if not block:
+                        break
+                    self.wfile.write(block)
+                    remaining -= len(block)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The peer cancelled or switched mirrors
+
+    def _serve_probe(self, nbytes: int):
+        """Zeros for a peer measuring throughput to this node"""
+        nbytes = min(nbytes, PROBE_MAX_BYTES)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(nbytes))
+        self.end_headers()
+        block = bytes(min(COPY_CHUNK_SIZE, nbytes))
+        try:
+            while nbytes > 0:
+                self.wfile.write(block[:nbytes])
+                nbytes -= len(block)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        match = _PROBE_RE.match(self.path)
+        if match:
+            self._serve_probe(int(match.group(1) or 0))
+            return
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        if not self._authorized():
+            return
+        self._serve(send_body=False)
+
+
+class _DualStackServer(ThreadingHTTPServer):
+    """Listens on IPv6 with IPv4-mapped addresses enabled, so one socket serves both"""
+    address_family = socket.AF_INET6
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0)
+        super().server_bind()
+
+
+class BlobServer:
+    """Read-only HTTP server exposing a blob store to LAN peers"""
+
+    def __init__(self, blobs: BlobStore, token: str, port: int = DEFAULT_BLOB_PORT, host: str = '::'):
+        """
+        Args:
+            blobs: Blob store to serve
+            token: Cluster token every request must present
+            port: TCP port to listen on; 0 picks a free port
+            host: Interface to bind; '::' serves IPv4 and IPv6 peers alike
+        """
+        if not token:
+            raise ValueError("Blob sharing needs a cluster token")
+        handler = type('BlobRequestHandler', (_BlobRequestHandler,), {'blobs': blobs, 'token': token})
+        try:
+            self.httpd = _DualStackServer((host, port), handler) if host == '::' else ThreadingHTTPServer((host, port), handler)
+        except OSError:
+            if host != '::':
+                raise
+            # No IPv6 on this machine
+            self.httpd = ThreadingHTTPServer(('0.0.0.0', port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="blob-server", daemon=True)
+        self._thread.start()
+        print(f"LOG: Sharing blobs with LAN peers on port {self.port}")
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def find_blobs_on_peers(peers: List[str], blobs: Dict[str, int], token: Optional[str],
+                        timeout: float = PROBE_TIMEOUT) -> Dict[str, List[str]]:
+    """
+    Ask every peer which of the given blobs it holds
+
+    Args:
+        peers: Base URLs of peer blob servers (see peer_url)
+        blobs: Blob key -> expected size (0 when unknown)
+        token: Cluster token; without one no peer will answer, so none are asked
+        timeout: Per-request timeout; unreachable peers are skipped
+
+    Returns:
+        Blob key -> URLs of peers holding a complete copy. Keys no peer has are left out
+    """
+    if not peers or not blobs or not token:
+        return {}
+    import requests
+
+    headers = {TOKEN_HEADER: token}
+
+    def probe(peer: str, key: str) -> Optional[str]:
+        url = f"{peer}/blobs/{key}"
+        try:
+            response = requests.head(url, headers=headers, timeout=timeout)
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        size = blobs[key]
+        if size and int(response.headers.get('Content-Length', -1)) != size:
+            return None
+        return url
+
+    found: Dict[str, List[str]] = {}
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as pool:
+        jobs = {(peer, key): pool.submit(probe, peer, key) for peer in peers for key in blobs}
+        for (peer, key), future in jobs.items():
+            url = future.result()
+            if url:
+                found.setdefault(key, []).append(url)
+    return found
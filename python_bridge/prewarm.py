@@ -0,0 +1,166 @@
+"""
+Page-Cache Prewarm
+Reads model shards sequentially into the OS page cache so Parallax's cold
+load hits memory instead of doing random reads from disk
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from download_planner import weight_format_of
+
+
+DEFAULT_PREWARM_WORKERS = 4
+PREWARM_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_FREE_FRACTION = 0.10  # Share of RAM warming leaves free for Parallax itself
+MEMORY_CHECK_INTERVAL = 256 * 1024 * 1024  # Bytes claimed (and hinted WILLNEED) per memory check
+
+# progress_callback(warmed_bytes, total_bytes, bytes_per_second)
+PrewarmCallback = Callable[[int, int, float], None]
+
+
+def _advise(fd: int, advice_name: str, offset: int = 0, length: int = 0):
+    """posix_fadvise where the platform has it (Linux); a no-op elsewhere"""
+    advice = getattr(os, advice_name, None)
+    if advice is not None and hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, offset, length, advice)
+        except OSError:
+            pass
+
+
+class _MemoryGuard:
+    """
+    Stops warming under memory pressure, and once more has been read than
+    can stay cached (warming past that just evicts the first shards again)
+    """
+
+    def __init__(self, min_free_fraction: float):
+        import psutil
+        memory = psutil.virtual_memory()
+        self.min_free_bytes = int(memory.total * min_free_fraction)
+        # Memory not held by processes is what the page cache can grow into
+        self.budget = max(0, memory.total - memory.used - self.min_free_bytes)
+        self.claimed = 0
+        self.exhausted = False
+        self._lock = threading.Lock()
+
+    def allow(self, n: int) -> bool:
+        """Claim n more bytes of cache; False once memory is tight"""
+        import psutil
+        with self._lock:
+            if self.exhausted:
+                return False
+            if self.claimed + n > self.budget:
+                self.exhausted = True
+                print(f"LOG: Stopping prewarm: {self.budget / (1024 ** 3):.1f} GB of free memory used up")
+            elif psutil.virtual_memory().available < self.min_free_bytes:
+                self.exhausted = True
+                print(f"LOG: Stopping prewarm: less than {self.min_free_bytes / (1024 ** 3):.1f} GB of memory available")
+            else:
+                self.claimed += n
+            return not self.exhausted
+
+
+def _warm_file(path: Path, guard: _MemoryGuard, on_bytes: Callable[[int], None],
+               cancel_event: Optional[threading.Event]) -> int:
+    """Read one file front to back with sequential readahead. Returns the bytes read"""
+    warmed = 0
+    next_check = 0  # Reads can come up short, so warmed needn't land on a multiple of the interval
+    buffer = bytearray(PREWARM_CHUNK_SIZE)
+    with open(path, 'rb', buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        _advise(f.fileno(), 'POSIX_FADV_SEQUENTIAL', 0, size)
+        while warmed < size:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            # Claim memory a slice at a time, and only hint readahead for what was claimed
+            if warmed >= next_check:
+                # The claim also covers whatever the last read carried past the previous checkpoint
+                end = min(warmed + MEMORY_CHECK_INTERVAL, size)
+                if not guard.allow(end - next_check):
+                    break
+                _advise(f.fileno(), 'POSIX_FADV_WILLNEED', warmed, end - warmed)
+                next_check = end
+            n = f.readinto(buffer)
+            if not n:
+                break
+            warmed += n
+            on_bytes(n)
+    return warmed
+
+
+def prewarm_files(
+    paths: List[Path],
+    max_workers: int = DEFAULT_PREWARM_WORKERS,
+    min_free_fraction: float = MIN_FREE_FRACTION,
+    progress_callback: Optional[PrewarmCallback] = None,
+    cancel_event: Optional[threading.Event] = None
+) -> Dict:
+    """
+    Pull files into the page cache, several at a time
+
+    Args:
+        paths: Files to warm, in the order they should start
+        max_workers: Files read in parallel
+        min_free_fraction: Stop once available memory falls below this fraction of RAM
+        progress_callback: Optional callback(warmed_bytes, total_bytes, bytes_per_second)
+        cancel_event: Stops warming when set
+
+    Returns:
+        Report with bytes warmed, seconds taken, MB/s and whether it stopped early
+    """
+    existing = [Path(p) for p in paths if Path(p).is_file()]
+    total = sum(p.stat().st_size for p in existing)
+    guard = _MemoryGuard(min_free_fraction)
+    lock = threading.Lock()
+    warmed = [0]
+    last_report = [0.0]
+    started = time.monotonic()
+
+    def on_bytes(n: int):
+        with lock:
+            warmed[0] += n
+            now = time.monotonic()
+            if progress_callback is None or now - last_report[0] < 0.5:
+                return
+            last_report[0] = now
+            done = warmed[0]
+        progress_callback(done, total, done / max(now - started, 1e-6))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        list(pool.map(lambda p: _warm_file(p, guard, on_bytes, cancel_event), existing))
+
+    seconds = time.monotonic() - started
+    report = {
+        'files': len(existing),
+        'total_bytes': total,
+        'warmed_bytes': warmed[0],
+        'seconds': round(seconds, 2),
+        'mb_per_sec': round(warmed[0] / (1024 * 1024) / max(seconds, 1e-6), 1),
+        'complete': warmed[0] >= total,
+        'stopped_for_memory': guard.exhausted,
+    }
+    if progress_callback is not None:
+        progress_callback(warmed[0], total, warmed[0] / max(seconds, 1e-6))
+    print(f"LOG: Prewarmed {report['warmed_bytes'] / (1024 * 1024):.1f} of {total / (1024 * 1024):.1f} MB "
+          f"in {report['seconds']}s ({report['mb_per_sec']} MB/s)")
+    return report
+
+
+def hf_cache_files(model_id: str) -> List[Path]:
+    """Files of the newest Hugging Face cache snapshot of a model (where Parallax itself downloads to)"""
+    from huggingface_hub.constants import HF_HUB_CACHE
+    snapshots = Path(HF_HUB_CACHE) / f"models--{model_id.replace('/', '--')}" / "snapshots"
+    if not snapshots.is_dir():
+        return []
+    newest = max(snapshots.iterdir(), key=lambda d: d.stat().st_mtime, default=None)
+    return [p for p in newest.rglob('*') if p.is_file()] if newest else []
+
+
+def weight_files_first(paths: List[Path]) -> List[Path]:
+    """Order files so weight shards come first, in the order loaders read them; other files follow"""
+    return sorted(paths, key=lambda path: (weight_format_of(path.name) is None, path.name))
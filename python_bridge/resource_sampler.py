@@ -0,0 +1,202 @@
+"""
+Resource Sampler
+Background thread that samples CPU, memory, network and process stats into a
+ring buffer, so readers get the latest snapshot and windowed statistics
+without blocking
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+
+DEFAULT_SAMPLE_INTERVAL = 1.0  # Seconds between samples
+DEFAULT_WINDOW = 60  # Samples kept for averages and percentiles
+DEFAULT_GPU_INTERVAL = 30.0  # GPUtil runs nvidia-smi, so probe it far less often
+
+# Fields summarised over the window
+WINDOWED_FIELDS = ('cpu_percent', 'memory_percent', 'net_sent_bytes_per_sec', 'net_recv_bytes_per_sec',
+                   'process_cpu_percent')
+
+
+@dataclass
+class ResourceSample:
+    """One point-in-time reading"""
+    timestamp: float
+    cpu_percent: float
+    memory_percent: float
+    memory_used_gb: float
+    memory_total_gb: float
+    net_sent_bytes_per_sec: float
+    net_recv_bytes_per_sec: float
+    process_cpu_percent: float  # Summed over the watched processes
+    process_rss_mb: float
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(rank, 1)) - 1]
+
+
+class ResourceSampler:
+    """Samples system resources on a fixed interval into a fixed-size ring buffer"""
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+        window: int = DEFAULT_WINDOW,
+        gpu_interval: float = DEFAULT_GPU_INTERVAL,
+        pids: Optional[List[int]] = None
+    ):
+        """
+        Args:
+            interval: Seconds between samples
+            window: Number of samples kept
+            gpu_interval: Seconds between GPU probes (0 disables them)
+            pids: Processes whose CPU and memory are tracked. Defaults to this process
+        """
+        self.interval = interval
+        self.gpu_interval = gpu_interval
+        self.samples: Deque[ResourceSample] = deque(maxlen=max(1, window))
+        self.gpu_info = "N/A"
+        self._stats: Dict[str, Dict[str, float]] = {}
+        # Imported here rather than at module level, so importing the module stays cheap
+        import psutil
+        self._processes = [psutil.Process(pid) for pid in (pids or [os.getpid()])]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_net = None
+        self._last_gpu_probe = float('-inf')
+
+    def watch_process(self, pid: int):
+        """Also track a process (e.g. the Parallax worker this node launched)"""
+        import psutil
+        with self._lock:
+            self._processes.append(psutil.Process(pid))
+
+    def start(self):
+        """Take a first sample (blocking ~0.1s, once), then keep sampling in the background"""
+        if self._thread is not None:
+            return
+        import psutil
+        # Prime the counters cpu_percent(interval=None) measures against, and give
+        # them a moment so the first sample's rates mean something
+        psutil.cpu_percent(interval=None)
+        for process in self._processes:
+            process.cpu_percent(interval=None)
+        self._last_net = (time.monotonic(), psutil.net_io_counters())
+        time.sleep(0.1)
+        self._sample()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def _run(self):
+        # The GPU probe goes first but off the caller's thread, since it spawns nvidia-smi
+        while True:
+            try:
+                if self.gpu_interval and time.monotonic() - self._last_gpu_probe >= self.gpu_interval:
+                    self._probe_gpu()
+                if self._stop.wait(self.interval):
+                    return
+                self._sample()
+            except Exception as e:
+                print(f"ERROR: Resource sampling failed: {e}")
+
+    def _probe_gpu(self):
+        self._last_gpu_probe = time.monotonic()
+        try:
+            import GPUtil
+            gpus = GPUtil.getGPUs()
+            if gpus:
+                self.gpu_info = f"{gpus[0].name} ({gpus[0].memoryUsed}/{gpus[0].memoryTotal}MB)"
+        except Exception:
+            pass
+
+    def _sample(self):
+        import psutil
+        now = time.monotonic()
+        memory = psutil.virtual_memory()
+        net = psutil.net_io_counters()
+        last_time, last_net = self._last_net
+        elapsed = max(now - last_time, 1e-6)
+        self._last_net = (now, net)
+
+        process_cpu = process_rss = 0.0
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process_cpu += process.cpu_percent(interval=None)
+                process_rss += process.memory_info().rss
+            except psutil.Error:
+                with self._lock:
+                    if process in self._processes:
+                        self._processes.remove(process)
+
+        sample = ResourceSample(
+            timestamp=time.time(),
+            cpu_percent=psutil.cpu_percent(interval=None),
+            memory_percent=memory.percent,
+            memory_used_gb=round(memory.used / (1024 ** 3), 2),
+            memory_total_gb=round(memory.total / (1024 ** 3), 2),
+            net_sent_bytes_per_sec=max(0, net.bytes_sent - last_net.bytes_sent) / elapsed,
+            net_recv_bytes_per_sec=max(0, net.bytes_recv - last_net.bytes_recv) / elapsed,
+            process_cpu_percent=process_cpu,
+            process_rss_mb=round(process_rss / (1024 * 1024), 1)
+        )
+        with self._lock:
+            self.samples.append(sample)
+            samples = list(self.samples)
+        # Summarise here, on the sampler thread, so readers only copy a dict
+        stats = self._summarise(samples)
+        with self._lock:
+            self._stats = stats
+
+    def latest(self) -> Optional[ResourceSample]:
+        """The most recent sample, or None before start()"""
+        with self._lock:
+            return self.samples[-1] if self.samples else None
+
+    @staticmethod
+    def _summarise(samples: List[ResourceSample]) -> Dict[str, Dict[str, float]]:
+        stats = {}
+        for name in WINDOWED_FIELDS:
+            values = sorted(getattr(s, name) for s in samples)
+            stats[name] = {
+                'avg': round(sum(values) / len(values), 2),
+                'p50': round(_percentile(values, 0.50), 2),
+                'p95': round(_percentile(values, 0.95), 2),
+                'max': round(values[-1], 2),
+            }
+        return stats
+
+    def window_stats(self) -> Dict[str, Dict[str, float]]:
+        """Average, p50, p95 and max of each windowed field over the buffered samples"""
+        with self._lock:
+            return dict(self._stats)
+
+    def snapshot(self) -> Dict:
+        """Latest sample, GPU info and window statistics as one dict"""
+        latest = self.latest()
+        snapshot = dict(vars(latest)) if latest else {}
+        snapshot['gpu_info'] = self.gpu_info
+        with self._lock:
+            snapshot['window_samples'] = len(self.samples)
+            snapshot['window'] = dict(self._stats)
+        return snapshot
@@ -0,0 +1,237 @@
+"""
+Scheduler Supervisor
+Runs the Parallax scheduler as a child process, checks its HTTP API for
+liveness and readiness, and restarts it with exponential backoff when it
+crashes or stops answering
+"""
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from bridge_events import get_stream
+from log_relay import LogRelay
+
+if TYPE_CHECKING:
+    import requests
+
+SCHEDULER_PORT = 3001
+HEALTH_INTERVAL = 2.0  # Seconds between liveness checks
+HEALTH_TIMEOUT = 3.0
+LIVENESS_FAILURES = 3  # Consecutive unanswered checks before a running scheduler counts as wedged
+STARTUP_GRACE = 180.0  # Seconds a fresh scheduler gets to open its HTTP port before checks count
+READY_INTERVAL = 2.0  # Seconds between readiness probes until the first one passes
+READY_PROBE_TIMEOUT = 20.0  # A first completion can be slow while the model warms up
+INITIAL_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+STABLE_PERIOD = 120.0  # Seconds ready before the restart backoff resets
+DRAIN_TIMEOUT = 15.0  # Seconds between SIGTERM and SIGKILL on shutdown
+WINDOWS = sys.platform == 'win32'
+
+
+def emit(event: str, **fields):
+    """One 'scheduler' status event for Electron"""
+    get_stream().emit('scheduler', {'event': event, 'time': time.time(), **fields})
+
+
+class SchedulerSupervisor:
+    """
+    Keeps a Parallax scheduler process running and reports its state
+
+    Events: 'starting', 'live' (HTTP answers), 'ready' (a completion
+    succeeded), 'unhealthy' (crashed or wedged), 'restarting' and 'stopped'.
+    A scheduler that exits with code 0 shut down on purpose and isn't restarted.
+    """
+
+    def __init__(
+        self,
+        cmd: List[str],
+        model: str,
+        port: int = SCHEDULER_PORT,
+        ready_timeout: float = 0,
+        drain_timeout: float = DRAIN_TIMEOUT,
+        session: Optional['requests.Session'] = None,
+        on_state: Optional[Callable[[str], None]] = None,
+        on_event: Optional[Callable[[Dict], None]] = None
+    ):
+        """
+        Args:
+            cmd: Command that starts the scheduler
+            model: Model name sent in readiness probes
+            port: Port the scheduler's HTTP API listens on
+            ready_timeout: Restart if not ready this many seconds after starting (0 waits
+                forever, since readiness also depends on worker nodes joining)
+            drain_timeout: Seconds in-flight requests get after SIGTERM (CTRL_BREAK on Windows) before a kill
+            session: Shared HTTP session for the health checks; plain requests by default
+            on_state: Also called with each state the scheduler enters
+            on_event: Called with each event parsed from the scheduler's log (see log_relay)
+        """
+        self.cmd = cmd
+        self.model = model
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.ready_timeout = ready_timeout
+        self.drain_timeout = drain_timeout
+        self.http = session
+        self.on_state = on_state
+        self.on_event = on_event
+        self.state = 'stopped'
+        self.restarts = 0
+        self.process: Optional[subprocess.Popen] = None
+        self._backoff = INITIAL_BACKOFF
+        self._stopping = threading.Event()
+
+    def stop(self):
+        """Ask run() to shut the scheduler down; safe to call from a signal handler"""
+        self._stopping.set()
+
+    def _set_state(self, state: str, **fields):
+        self.state = state
+        emit(state, restarts=self.restarts, **fields)
+        if self.on_state:
+            self.on_state(state)
+
+    def _spawn(self) -> subprocess.Popen:
+        # Own process group, so shutdown reaches anything the scheduler started
+        if WINDOWS:
+            group = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            group = {'start_new_session': True}
+        process = subprocess.Popen(
+            self.cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            bufsize=0,
+            **group
+        )
+        LogRelay(process.stdout, on_event=self.on_event).start()
+        return process
+
+    def _live(self) -> bool:
+        """Any HTTP answer short of a server error means the scheduler isn't wedged"""
+        import requests
+        http = self.http or requests
+        try:
+            return http.get(f"{self.base_url}/health", timeout=HEALTH_TIMEOUT).status_code < 500
+        except requests.RequestException:
+            return False
+
+    def _ready(self) -> bool:
+        """A one-token completion is the only proof the API can actually serve"""
+        import requests
+        http = self.http or requests
+        try:
+            response = http.post(f"{self.base_url}/v1/chat/completions", timeout=READY_PROBE_TIMEOUT, json={
+                'model': self.model,
+                'messages': [{'role': 'user', 'content': 'hi'}],
+                'max_tokens': 1,
+                'stream': False
+            })
+            return response.status_code == 200 and bool(response.json().get('choices'))
+        except (requests.RequestException, ValueError):
+            return False
+
+    def _watch(self, process: subprocess.Popen) -> Optional[str]:
+        """Health-check one scheduler run. Returns why it needs a restart, or None when stopping or it exited cleanly"""
+        started = time.monotonic()
+        ready_at = None
+        live = False
+        failures = 0
+        next_ready_probe = started
+        while not self._stopping.wait(HEALTH_INTERVAL):
+            code = process.poll()
+            if code == 0:
+                print("PYTHON_BRIDGE: Scheduler exited cleanly; not restarting it")
+                return None
+            if code is not None:
+                return f"exited with code {code}"
+            now = time.monotonic()
+            if not self._live():
+                if live or now - started > STARTUP_GRACE:
+                    failures += 1
+                    if failures >= LIVENESS_FAILURES:
+                        return f"no answer to {failures} health checks"
+                continue
+            failures = 0
+            if not live:
+                live = True
+                self._set_state('live', pid=process.pid, seconds=round(now - started, 1))
+            if ready_at is None and now >= next_ready_probe:
+                if self._ready():
+                    ready_at = time.monotonic()
+                    self._set_state('ready', pid=process.pid, seconds=round(ready_at - started, 1))
+                elif self.ready_timeout and now - started > self.ready_timeout:
+                    return f"not ready after {self.ready_timeout:.0f}s"
+                else:
+                    next_ready_probe = time.monotonic() + READY_INTERVAL
+            if ready_at is not None and now - ready_at > STABLE_PERIOD:
+                self._backoff = INITIAL_BACKOFF
+        return None
+
+    def _terminate(self, process: subprocess.Popen):
+        """Ask the scheduler's process group to stop, then kill it after the drain timeout"""
+        if process.poll() is not None:
+            return
+        try:
+            self._signal_group(process, kill=False)
+            process.wait(timeout=self.drain_timeout)
+        except subprocess.TimeoutExpired:
+            print(f"PYTHON_BRIDGE: Scheduler still running after {self.drain_timeout:.0f}s; killing it")
+            self._signal_group(process, kill=True)
+            process.wait()
+        except ProcessLookupError:
+            pass
+
+    def _signal_group(self, process: subprocess.Popen, kill: bool):
+        """
+        Stop or kill the scheduler and everything it started
+
+        Windows has no process groups to signal: CTRL_BREAK reaches the console
+        group made by CREATE_NEW_PROCESS_GROUP, and a kill walks the process tree
+        """
+        if not WINDOWS:
+            os.killpg(process.pid, signal.SIGKILL if kill else signal.SIGTERM)
+            return
+        if not kill:
+            process.send_signal(signal.CTRL_BREAK_EVENT)
+            return
+        import psutil
+        try:
+            children = psutil.Process(process.pid).children(recursive=True)
+        except psutil.NoSuchProcess:
+            children = []
+        process.kill()
+        for child in children:
+            try:
+                child.kill()
+            except psutil.NoSuchProcess:
+                pass
+
+    def run(self) -> int:
+        """Run and supervise the scheduler until stop() is called. Returns its last exit code"""
+        self._backoff = INITIAL_BACKOFF
+        while not self._stopping.is_set():
+            self.process = self._spawn()
+            self._set_state('starting', pid=self.process.pid)
+            reason = self._watch(self.process)
+            if reason is None:
+                break
+            print(f"PYTHON_BRIDGE: Scheduler {reason}; restarting in {self._backoff:.0f}s")
+            self._set_state('unhealthy', reason=reason)
+            self._terminate(self.process)
+            self.restarts += 1
+            self._set_state('restarting', delay=self._backoff)
+            if self._stopping.wait(self._backoff):
+                break
+            self._backoff = min(self._backoff * 2, MAX_BACKOFF)
+
+        if self.process is None:
+            return 0
+        self.state = 'stopping'
+        print("PYTHON_BRIDGE: Stopping Parallax Scheduler...")
+        sys.stdout.flush()
+        self._terminate(self.process)
+        self._set_state('stopped', exit_code=self.process.returncode)
+        return self.process.returncode or 0
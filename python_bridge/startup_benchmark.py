@@ -0,0 +1,260 @@
+"""
+Startup Benchmark
+Measures how quickly the bridge entry points start: an `-X importtime`
+breakdown of importing each one, and the wall time until the bridge daemon and
+the model service announce they're ready. Results are checked against
+budgets, so a heavy import creeping back in fails the run.
+
+Usage: python startup_benchmark.py [--runs 5] [--budget-scale 1.0] [--no-check] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import queue
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+BRIDGE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENTRY_POINTS = ['bridge_daemon', 'host', 'client', 'network_discovery', 'voice_assistant', 'model_manager',
+                'model_service']
+# Packages no entry point may import until the path that needs them runs
+HEAVY_PACKAGES = ['requests', 'psutil', 'zeroconf', 'huggingface_hub', 'tqdm', 'speech_recognition', 'edge_tts']
+TOP_PACKAGES = 8  # Packages listed per entry point in the breakdown
+READY_TIMEOUT = 60.0
+
+# Median milliseconds allowed; imports exclude interpreter startup, ready times include it
+BUDGETS_MS = {
+    'import': 100,
+    'daemon_ready': 400,
+    'daemon_models_reply': 400,
+    'model_service_ready': 500,
+}
+
+
+def _importtime(module: str) -> Tuple[float, Dict[str, float], List[str]]:
+    """
+    Import one module in a fresh interpreter with -X importtime
+
+    Returns:
+        Milliseconds the import took, milliseconds per top-level package (self
+        time summed, so nothing is counted twice) and the packages imported
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=BRIDGE_DIR, capture_output=True, text=True, env=_env())
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        # "import time:       412 |       1830 |   some.package"; children come before their parent
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        rows.append((int(self_us), int(cumulative_us), len(name) - len(name.lstrip()), name.strip()))
+    top = next((i for i in range(len(rows) - 1, -1, -1) if rows[i][3] == module), None)
+    if top is None:
+        raise RuntimeError(f"No importtime line for {module}")
+    # The module's own subtree, leaving out interpreter startup (site and friends)
+    start = top
+    while start > 0 and rows[start - 1][2] > rows[top][2]:
+        start -= 1
+    by_package: Dict[str, int] = defaultdict(int)
+    for self_us, _, _, name in rows[start:top + 1]:
+        by_package[name.split('.')[0]] += self_us
+    total_us = rows[top][1]
+    return total_us / 1000, {p: us / 1000 for p, us in by_package.items()}, sorted(by_package)
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    return env
+
+
+def _read_events(process: subprocess.Popen, events: 'queue.Queue'):
+    for line in process.stdout:
+        try:
+            event = json.loads(line)
+        except ValueError:
+            continue
+        events.put((time.perf_counter(), event))
+    events.put((time.perf_counter(), None))
+
+
+def _wait_for(events: 'queue.Queue', predicate: Callable[[Dict], bool], what: str) -> float:
+    """perf_counter time of the first event matching predicate"""
+    deadline = time.perf_counter() + READY_TIMEOUT
+    while True:
+        try:
+            at, event = events.get(timeout=max(0.0, deadline - time.perf_counter()))
+        except queue.Empty:
+            raise TimeoutError(f"No {what} within {READY_TIMEOUT:.0f}s")
+        if event is None:
+            raise RuntimeError(f"Process exited before {what}")
+        if predicate(event):
+            return at
+
+
+def _rpc(event: Dict, method: Optional[str] = None, request_id: Optional[int] = None) -> bool:
+    if event.get('type') != 'rpc':
+        return False
+    data = event.get('data') or {}
+    return data.get('method') == method if method else data.get('id') == request_id
+
+
+def _spawn(args: List[str], home: str) -> Tuple[subprocess.Popen, 'queue.Queue']:
+    env = _env()
+    # Keep the model cache and blob sharing out of the real install
+    env.update({'HOME': home, 'SPARK_SHARE_BLOBS': '0'})
+    process = subprocess.Popen([sys.executable, '-u'] + args, cwd=BRIDGE_DIR, env=env, text=True,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    events: 'queue.Queue' = queue.Queue()
+    threading.Thread(target=_read_events, args=(process, events), daemon=True).start()
+    return process, events
+
+
+def _send(process: subprocess.Popen, message: Dict):
+    process.stdin.write(json.dumps(message) + '\n')
+    process.stdin.flush()
+
+
+def measure_daemon(home: str) -> Dict[str, float]:
+    """Time to the daemon's ready notification, then to its first models.* reply (cold models component)"""
+    started = time.perf_counter()
+    process, events = _spawn(['bridge_daemon.py'], home)
+    try:
+        ready = _wait_for(events, lambda e: _rpc(e, method='ready'), "daemon ready")
+        sent = time.perf_counter()
+        _send(process, {'jsonrpc': '2.0', 'id': 1, 'method': 'models.ping'})
+        replied = _wait_for(events, lambda e: _rpc(e, request_id=1), "models.ping reply")
+        _send(process, {'jsonrpc': '2.0', 'id': 2, 'method': 'shutdown'})
+        process.wait(timeout=READY_TIMEOUT)
+    finally:
+        if process.poll() is None:
+            process.kill()
+    return {'daemon_ready': (ready - started) * 1000, 'daemon_models_reply': (replied - sent) * 1000}
+
+
+def measure_model_service(home: str) -> Dict[str, float]:
+    """Time to the standalone `model_manager.py serve` ready notification"""
+    started = time.perf_counter()
+    process, events = _spawn(['model_manager.py', 'serve'], home)
+    try:
+        ready = _wait_for(events, lambda e: _rpc(e, method='ready'), "model service ready")
+        process.stdin.close()
+        process.wait(timeout=READY_TIMEOUT)
+    finally:
+        if process.poll() is None:
+            process.kill()
+    return {'model_service_ready': (ready - started) * 1000}
+
+
+def _interpreter_ms() -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True, env=_env())
+    return (time.perf_counter() - started) * 1000
+
+
+def run(runs: int) -> Dict:
+    imports: Dict[str, Dict] = {}
+    for module in ENTRY_POINTS:
+        totals = []
+        packages: Dict[str, List[float]] = defaultdict(list)
+        imported = set()
+        for _ in range(runs):
+            total, by_package, names = _importtime(module)
+            totals.append(total)
+            for package, ms in by_package.items():
+                packages[package].append(ms)
+            imported.update(names)
+        breakdown = sorted(((p, statistics.median(v)) for p, v in packages.items()), key=lambda x: -x[1])
+        imports[module] = {
+            'import_ms': round(statistics.median(totals), 1),
+            'import_ms_min': round(min(totals), 1),
+            'top_packages_ms': {p: round(ms, 1) for p, ms in breakdown[:TOP_PACKAGES]},
+            'heavy_imports': sorted(imported.intersection(HEAVY_PACKAGES)),
+        }
+
+    ready: Dict[str, List[float]] = defaultdict(list)
+    interpreter = []
+    with tempfile.TemporaryDirectory(prefix="spark-startup-") as home:
+        for _ in range(runs):
+            interpreter.append(_interpreter_ms())
+            for name, ms in {**measure_daemon(home), **measure_model_service(home)}.items():
+                ready[name].append(ms)
+
+    return {
+        'interpreter_ms': round(statistics.median(interpreter), 1),
+        'imports': imports,
+        'ready_ms': {name: round(statistics.median(values), 1) for name, values in ready.items()},
+        'ready_ms_min': {name: round(min(values), 1) for name, values in ready.items()},
+    }
+
+
+def check(results: Dict, budget_scale: float) -> List[str]:
+    """Every budget the results break"""
+    failures = []
+    budget = BUDGETS_MS['import'] * budget_scale
+    for module, result in results['imports'].items():
+        if result['heavy_imports']:
+            failures.append(f"import {module} loads {', '.join(result['heavy_imports'])}")
+        if result['import_ms'] > budget:
+            failures.append(f"import {module} took {result['import_ms']} ms (budget {budget:.0f} ms)")
+    for name, ms in results['ready_ms'].items():
+        budget = BUDGETS_MS[name] * budget_scale
+        if ms > budget:
+            failures.append(f"{name} took {ms} ms (budget {budget:.0f} ms)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bridge entry point startup against budgets")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions; medians are reported")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="Multiply every time budget, e.g. 3 on a slow board")
+    parser.add_argument("--no-check", action="store_true", help="Report only; don't fail on broken budgets")
+    parser.add_argument("--output", type=str, default=None, help="Write results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    results = {
+        'benchmark': 'startup',
+        'timestamp': time.time(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'budgets_ms': {name: ms * args.budget_scale for name, ms in BUDGETS_MS.items()},
+    }
+    print(f"LOG: Measuring startup over {args.runs} run(s)", file=sys.stderr)
+    results.update(run(args.runs))
+
+    for module, result in results['imports'].items():
+        top = ', '.join(f"{p} {ms}" for p, ms in list(result['top_packages_ms'].items())[:4])
+        print(f"LOG: import {module}: {result['import_ms']} ms ({top})", file=sys.stderr)
+    for name, ms in results['ready_ms'].items():
+        print(f"LOG: {name}: {ms} ms", file=sys.stderr)
+
+    results['failures'] = check(results, args.budget_scale)
+    for failure in results['failures']:
+        print(f"ERROR: Over budget: {failure}", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+        print(f"LOG: Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    if results['failures'] and not args.no_check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,4 @@
 import asyncio
-import speech_recognition as sr
-import requests
-import edge_tts
 import os
 import sys
 import tempfile
@@ -9,13 +6,20 @@ import argparse
 import subprocess
 import time
 
+import bridge_events
+
+# speech_recognition, edge_tts and requests load on first use, not at import
+
 # Constants
 # Parallax scheduler runs on port 3001, nodes on port 3000
-# Use environment variable for host address, default to localhost
-PARALLAX_HOST = os.environ.get("PARALLAX_HOST")
+TEMP_AUDIO_FILE = os.path.join(tempfile.gettempdir(), "spark_response.mp3")
 
-# If not in env, try to read from .parallax_host file
-if not PARALLAX_HOST:
+def resolve_parallax_host():
+    """Parallax host from PARALLAX_HOST, else a .parallax_host file, else localhost"""
+    host = os.environ.get("PARALLAX_HOST")
+    if host:
+        return host
+    # If not in env, try to read from .parallax_host file
     try:
         # Check multiple locations
         possible_paths = [
@@ -28,26 +32,24 @@ if not PARALLAX_HOST:
                 with open(path, "r") as f:
                     content = f.read().strip()
                     if content:
-                        PARALLAX_HOST = content
-                        print(f"LOG: Read host from {path}: {PARALLAX_HOST}")
-                        break
+                        log(f"Read host from {path}: {content}")
+                        return content
     except Exception as e:
-        print(f"LOG: Error reading .parallax_host: {e}")
+        log(f"Error reading .parallax_host: {e}")
+    # Fallback to localhost
+    return "localhost"
 
-# Fallback to localhost
-if not PARALLAX_HOST:
-    PARALLAX_HOST = "localhost"
-
-PARALLAX_API_URL = f"http://{PARALLAX_HOST}:3001/v1/chat/completions"
-TEMP_AUDIO_FILE = os.path.join(tempfile.gettempdir(), "spark_response.mp3")
+def parallax_api_url(host):
+    # Electron may pass the fastest discovered path to the host, which can be an IPv6 address
+    url_host = f"[{host}]" if ":" in host else host
+    return f"http://{url_host}:3001/v1/chat/completions"
 
 def log(msg):
-    print(f"LOG:{msg}")
-    sys.stdout.flush()
+    bridge_events.get_stream().log(msg, source="voice_assistant")
 
 def set_state(state):
-    print(f"STATE:{state}")
-    sys.stdout.flush()
+    # Only the latest state is shown, so quick transitions collapse into one event
+    bridge_events.get_stream().emit("voice.state", {"state": state}, key="state")
 
 def get_platform():
     """Detect the operating system"""
@@ -189,6 +191,7 @@ async def text_to_speech(text, voice="en-US-AriaNeural"):
             except:
                 pass
         
+        import edge_tts
         communicate = edge_tts.Communicate(text, voice)
         await communicate.save(TEMP_AUDIO_FILE)
         
@@ -206,7 +209,9 @@ async def text_to_speech(text, voice="en-US-AriaNeural"):
     except Exception as e:
         log(f"TTS error: {e}")
 
-def get_llm_response(prompt, history):
+def get_llm_response(prompt, history, api_url, http=None):
+    import requests
+    http = http or requests
     headers = {"Content-Type": "application/json"}
     messages = history + [{"role": "user", "content": prompt}]
     
@@ -222,7 +227,7 @@ def get_llm_response(prompt, history):
     
     try:
         log(f"Sending to Parallax: {prompt}")
-        response = requests.post(PARALLAX_API_URL, json=data, headers=headers, timeout=30)
+        response = http.post(api_url, json=data, headers=headers, timeout=30)
         log(f"Parallax status: {response.status_code}")
         if response.status_code == 200:
             result = response.json()
@@ -239,14 +244,22 @@ def get_llm_response(prompt, history):
         log(f"Connection Error: {e}")
         return "I can't reach the server."
 
-async def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--voice", default="en-US-AriaNeural")
-    parser.add_argument("--wake-word", default=None) # Future implementation
-    parser.add_argument("--system-prompt", default=None, help="Custom system prompt for the AI")
-    parser.add_argument("--name", default="Spark", help="Name of the AI assistant")
-    args = parser.parse_args()
+async def run_assistant(name="Spark", voice="en-US-AriaNeural", system_prompt=None, parallax_host=None,
+                        stop_event=None, http=None):
+    """
+    Listen, ask Parallax and speak the answer until stop_event is set
+
+    Args:
+        name: Name of the AI assistant
+        voice: edge-tts voice for replies
+        system_prompt: Custom system prompt; a default built from the name otherwise
+        parallax_host: Host running the Parallax scheduler; resolve_parallax_host() by default
+        stop_event: threading.Event that ends the loop (checked between utterances)
+        http: Shared HTTP session for Parallax requests; plain requests by default
+    """
+    import speech_recognition as sr
 
+    api_url = parallax_api_url(parallax_host or resolve_parallax_host())
     recognizer = sr.Recognizer()
     
     # Initialize microphone once and reuse
@@ -258,18 +271,17 @@ async def main():
         return
     
     # Build system prompt from args or use default
-    if args.system_prompt:
-        system_prompt = args.system_prompt
-        log(f"Using custom system prompt for {args.name}")
+    if system_prompt:
+        log(f"Using custom system prompt for {name}")
     else:
-        system_prompt = f"You are {args.name}, a helpful and witty AI assistant. Keep your answers concise and conversational."
-        log(f"Using default system prompt for {args.name}")
+        system_prompt = f"You are {name}, a helpful and witty AI assistant. Keep your answers concise and conversational."
+        log(f"Using default system prompt for {name}")
     
     history = [
         {"role": "system", "content": system_prompt}
     ]
 
-    log(f"Voice Assistant '{args.name}' Initialized")
+    log(f"Voice Assistant '{name}' Initialized")
     
     # Adjust for ambient noise once at startup
     try:
@@ -280,7 +292,7 @@ async def main():
     except Exception as e:
         log(f"Error adjusting for ambient noise: {e}")
 
-    while True:
+    while not (stop_event and stop_event.is_set()):
         try:
             set_state("LISTENING")
             
@@ -308,7 +320,7 @@ async def main():
                 log(f"User said: {text}")
                 
                 # Get LLM Response
-                response_text = get_llm_response(text, history)
+                response_text = get_llm_response(text, history, api_url, http)
                 log(f"Spark says: {response_text}")
                 
                 # Update history
@@ -321,7 +333,7 @@ async def main():
                 
                 # Speak Response
                 set_state("SPEAKING")
-                await text_to_speech(response_text, args.voice)
+                await text_to_speech(response_text, voice)
                 
             except sr.UnknownValueError:
                 # Silence or unclear audio - just continue
@@ -336,7 +348,17 @@ async def main():
             log(f"Error: {e}")
             time.sleep(0.5)  # Brief pause before retrying
 
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--voice", default="en-US-AriaNeural")
+    parser.add_argument("--wake-word", default=None) # Future implementation
+    parser.add_argument("--system-prompt", default=None, help="Custom system prompt for the AI")
+    parser.add_argument("--name", default="Spark", help="Name of the AI assistant")
+    args = parser.parse_args()
+    await run_assistant(args.name, args.voice, args.system_prompt)
+
 if __name__ == "__main__":
+    bridge_events.install("voice_assistant")
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -22,7 +22,13 @@ interface Window {
 
     // Model Management
     browseModels: (task?: string, limit?: number) => Promise<any[]>
-    downloadModel: (modelId: string) => Promise<any>
+    downloadModel: (modelId: string, priority?: number) => Promise<any>
+    cancelModelDownload: (modelId: string) => Promise<boolean>
+    pauseModelDownload: (modelId?: string) => Promise<boolean>
+    resumeModelDownload: (modelId?: string) => Promise<boolean>
+    getModelDownloadQueue: () => Promise<any[]>
+    setModelDownloadPriority: (modelId: string, priority: number) => Promise<boolean>
+    setModelDownloadBandwidth: (mbPerSec: number | null) => Promise<{ mb_per_sec: number }>
     getLocalModels: () => Promise<any[]>
     setActiveModel: (modelId: string) => Promise<boolean>
     getActiveModel: () => Promise<string | null>
@@ -0,0 +1,23 @@
+#!/bin/bash
+# Benchmark network discovery with simulated devices on loopback
+# Usage: ./tests/bench-discovery.sh [sizes] [output.json] [browse|join] [resolve concurrencies]
+#   e.g. ./tests/bench-discovery.sh 50,100,200 results/discovery.json join 32,1
+
+set -o pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+SIZES="${1:-25,100,200}"
+OUTPUT="${2:-discovery-bench-$(date +%Y%m%d-%H%M%S).json}"
+SCENARIO="${3:-browse}"
+MAX_RESOLVES="${4:-32}"
+
+echo "=== Discovery Scale Benchmark ==="
+echo "Fleet sizes: $SIZES"
+echo "Scenario: $SCENARIO, concurrent resolves: $MAX_RESOLVES"
+echo ""
+
+cd "$SCRIPT_DIR/../python_bridge" || exit 1
+python3 discovery_benchmark.py --devices "$SIZES" --scenario "$SCENARIO" --max-resolves "$MAX_RESOLVES" --output "$OLDPWD/$OUTPUT" 2>&1 | grep -v "Discovered device\|Lost device" || exit 1
+
+echo ""
+echo "Results: $OUTPUT"
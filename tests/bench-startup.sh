@@ -0,0 +1,24 @@
+#!/bin/bash
+# Benchmark bridge startup (imports and time to READY) and check it against budgets
+# Usage: ./tests/bench-startup.sh [runs] [output.json]
+#   e.g. BUDGET_SCALE=3 ./tests/bench-startup.sh 5 results/startup.json   # slower board
+# Exits non-zero when an entry point loads a heavy package at import or breaks a budget
+
+set -o pipefail
+
+SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
+RUNS="${1:-5}"
+OUTPUT="${2:-startup-bench-$(date +%Y%m%d-%H%M%S).json}"
+BUDGET_SCALE="${BUDGET_SCALE:-1.0}"
+
+echo "=== Bridge Startup Benchmark ==="
+echo "Runs: $RUNS, budget scale: $BUDGET_SCALE"
+echo ""
+
+cd "$SCRIPT_DIR/../python_bridge" || exit 1
+python3 startup_benchmark.py --runs "$RUNS" --budget-scale "$BUDGET_SCALE" --output "$OLDPWD/$OUTPUT"
+STATUS=$?
+
+echo ""
+echo "Results: $OUTPUT"
+exit $STATUS
@@ -0,0 +1,148 @@
+"""
+Shared test fixtures: python_bridge on the import path, no SPARK_* settings
+leaking in from the environment, and a stand-in Hugging Face Hub on loopback
+that HF_ENDPOINT points at before huggingface_hub is first imported
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Set
+from urllib.parse import unquote, urlsplit
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'python_bridge'))
+
+_RESOLVE_RE = re.compile(r'^/([^/]+/[^/]+)/resolve/([^/]+)/(.+)$')
+_MODEL_INFO_RE = re.compile(r'^/api/models/([^/]+/[^/]+)(?:/revision/([^/]+))?$')
+_RANGE_RE = re.compile(r'^bytes=(\d+)-(\d*)$')
+
+
+def git_blob_id(content: bytes) -> str:
+    return hashlib.sha1(f"blob {len(content)}\0".encode() + content).hexdigest()
+
+
+class FakeHub:
+    """Serves model_info, list_models and file downloads for the repos added to it"""
+
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.endpoint = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.reset()
+
+    def reset(self):
+        self.repos: Dict[str, Dict] = {}
+        self.requests: List[str] = []  # Paths requested (offline too), query strings included
+        self.offline = False  # Drop every connection, like a network that's down
+        self.broken: Set[str] = set()  # Filenames whose download answers 404
+
+    def add_model(self, repo_id: str, files: Dict[str, bytes], sha: str = 'a' * 40,
+                  lfs: Iterable[str] = (), **card):
+        """Add (or replace) a repo; files named in lfs get an LFS sha256 like real weights"""
+        self.repos[repo_id] = {'sha': sha, 'files': dict(files), 'lfs': set(lfs), 'card': card}
+
+    def model_json(self, repo_id: str) -> Dict:
+        repo = self.repos[repo_id]
+        siblings = []
+        for name, content in repo['files'].items():
+            sibling = {'rfilename': name, 'size': len(content), 'blobId': git_blob_id(content)}
+            if name in repo['lfs']:
+                sibling['lfs'] = {'sha256': hashlib.sha256(content).hexdigest(), 'size': len(content),
+                                  'pointerSize': 134}
+            siblings.append(sibling)
+        card = {'downloads': 0, 'likes': 0, 'tags': [], 'pipeline_tag': 'text-generation'}
+        card.update(repo['card'])
+        return {'id': repo_id, 'modelId': repo_id, 'sha': repo['sha'], 'private': False, 'siblings': siblings,
+                'lastModified': '2024-01-01T00:00:00.000Z', **card}
+
+    def served(self, fragment: str) -> List[str]:
+        return [path for path in self.requests if fragment in path]
+
+    def _handler(self):
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _json(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _file(self, content: bytes, send_body: bool):
+                start, end = 0, len(content) - 1
+                match = _RANGE_RE.match(self.headers.get('Range', ''))
+                if match:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2)), end) if match.group(2) else end
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {start}-{end}/{len(content)}")
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Length', str(end - start + 1))
+                self.send_header('Accept-Ranges', 'bytes')
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(content[start:end + 1])
+
+            def _route(self, send_body: bool):
+                hub.requests.append(self.path)
+                if hub.offline:
+                    self.close_connection = True
+                    return
+                path = unquote(urlsplit(self.path).path)
+                match = _RESOLVE_RE.match(path)
+                if match:
+                    repo = hub.repos.get(match.group(1))
+                    if repo is None or match.group(3) not in repo['files'] or match.group(3) in hub.broken:
+                        self.send_error(404)
+                        return
+                    self._file(repo['files'][match.group(3)], send_body)
+                    return
+                match = _MODEL_INFO_RE.match(path)
+                if match and match.group(1) in hub.repos:
+                    self._json(hub.model_json(match.group(1)))
+                    return
+                if path == '/api/models':
+                    self._json([hub.model_json(repo_id) for repo_id in hub.repos])
+                    return
+                self.send_error(404)
+
+            def do_GET(self):
+                self._route(send_body=True)
+
+            def do_HEAD(self):
+                self._route(send_body=False)
+
+        return Handler
+
+
+_HUB = FakeHub()
+os.environ['HF_ENDPOINT'] = _HUB.endpoint
+os.environ['HF_HUB_DISABLE_TELEMETRY'] = '1'
+os.environ.pop('HF_HUB_OFFLINE', None)
+
+
+@pytest.fixture
+def hub() -> FakeHub:
+    _HUB.reset()
+    return _HUB
+
+
+@pytest.fixture(autouse=True)
+def _isolated_env(monkeypatch, tmp_path):
+    for name in list(os.environ):
+        if name.startswith('SPARK_'):
+            monkeypatch.delenv(name)
+    monkeypatch.setenv('HF_HOME', str(tmp_path / 'hf-home'))
+    monkeypatch.delenv('HF_TOKEN', raising=False)
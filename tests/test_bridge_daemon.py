@@ -0,0 +1,48 @@
+"""Load reported by the daemon's components reaches discovery's TXT record"""
+import io
+import time
+
+from bridge_daemon import HostComponent, SharedResources
+from bridge_events import EventStream
+from network_discovery import TPS_IDLE_AFTER, NetworkDiscovery
+
+
+class _Discovery:
+    def __init__(self):
+        self.load = {}
+
+    def set_load(self, **load):
+        self.load.update(load)
+
+
+def test_parallax_throughput_and_scheduler_state_feed_discovery():
+    shared = SharedResources(EventStream(io.StringIO()), loop=None)
+    host = HostComponent(shared)
+    # Reported before discovery starts, so replayed when it attaches
+    host._on_scheduler_state('ready', 'Qwen/Qwen3-0.6B')
+    discovery = _Discovery()
+    shared.attach_discovery(discovery)
+    assert discovery.load == {'loaded_model': 'Qwen/Qwen3-0.6B'}
+
+    shared.on_parallax_event({'type': 'throughput', 'tokens_per_sec': 42.5})
+    shared.on_parallax_event({'type': 'node_join', 'node': 'n1'})
+    assert discovery.load == {'loaded_model': 'Qwen/Qwen3-0.6B', 'tokens_per_sec': 42.5}
+
+    host._on_scheduler_state('unhealthy', 'Qwen/Qwen3-0.6B')
+    assert discovery.load == {'loaded_model': '', 'tokens_per_sec': 0.0}
+
+    shared.attach_discovery(None)
+    host._on_scheduler_state('ready', 'Qwen/Qwen3-0.6B')
+    assert discovery.load['loaded_model'] == ''
+
+
+def test_announced_throughput_drops_to_zero_when_reports_stop():
+    discovery = NetworkDiscovery('load-test', probe_interval=0)
+    try:
+        discovery.set_load(tokens_per_sec=31.26, loaded_model='Qwen/Qwen3-0.6B')
+        load = discovery._current_load()
+        assert load['tps'] == 31.3 and load['lm'] == 'Qwen/Qwen3-0.6B'
+        discovery._tps_at = time.monotonic() - TPS_IDLE_AFTER - 1
+        assert discovery._current_load()['tps'] == 0.0
+    finally:
+        discovery.sampler.stop()
@@ -0,0 +1,63 @@
+"""Popular-model catalog cache against the stand-in Hub"""
+import huggingface_hub.utils._http as hf_http
+import pytest
+
+from model_manager import ModelManager
+
+
+def _info_requests(hub):
+    """model_info calls (the list call is /api/models?...)"""
+    return hub.served('/api/models/')
+
+
+@pytest.fixture
+def offline(hub, monkeypatch):
+    """Take the Hub off the network, skipping huggingface_hub's retry backoff sleeps"""
+    def go_offline():
+        hub.offline = True
+        monkeypatch.setattr(hf_http.time, 'sleep', lambda seconds: None)
+    return go_offline
+
+
+@pytest.fixture
+def manager(hub, tmp_path):
+    hub.add_model('org/alpha', {'config.json': b'{}', 'model.safetensors': b'a' * 2048}, sha='1' * 40,
+                  downloads=500, lfs=['model.safetensors'])
+    hub.add_model('org/beta', {'config.json': b'{}'}, sha='2' * 40, downloads=300)
+    return ModelManager(cache_dir=str(tmp_path))
+
+
+def test_fresh_listing_is_served_without_the_network(hub, manager, offline):
+    models = manager.get_popular_models(limit=2)
+    assert [m['id'] for m in models] == ['org/alpha', 'org/beta']
+    assert len(_info_requests(hub)) == 2
+
+    hub.requests.clear()
+    offline()
+    assert manager.get_popular_models(limit=2) == models
+    assert hub.requests == []
+
+
+def test_revalidation_only_refetches_models_whose_sha_changed(hub, manager):
+    manager.get_popular_models(limit=2)
+    hub.requests.clear()
+    hub.repos['org/alpha']['card']['downloads'] = 900
+    hub.add_model('org/beta', {'config.json': b'{"v": 2}', 'tokenizer.json': b't' * 1024}, sha='3' * 40,
+                  downloads=300)
+
+    models = {m['id']: m for m in manager.get_popular_models(limit=2, max_age=0)}
+    assert _info_requests(hub) and all('org/beta' in path for path in _info_requests(hub))
+    # Unchanged entries still pick up fresh counters from the listing
+    assert models['org/alpha']['downloads'] == 900
+    assert models['org/beta']['size_mb'] == round((len(b'{"v": 2}') + 1024) / (1024 * 1024), 2)
+
+
+def test_unreachable_hub_falls_back_to_the_cached_listing(hub, manager, offline):
+    models = manager.get_popular_models(limit=2)
+    offline()
+    assert manager.get_popular_models(limit=2, refresh=True) == models
+    assert hub.requests  # It did try the Hub first
+
+    # A fresh manager (new process) reads the same cache from disk
+    again = ModelManager(cache_dir=str(manager.cache_dir))
+    assert again.get_popular_models(limit=2, refresh=True) == models
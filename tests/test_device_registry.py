@@ -0,0 +1,47 @@
+"""Registry events are delivered in order, after the registry lock is released"""
+import threading
+
+from network_discovery import DeviceRegistry
+
+PEER = 'peer._spark._tcp.local.'
+
+
+def test_callbacks_run_without_the_registry_lock():
+    answered = []
+
+    def on_event(action, device):
+        # Another thread (a resolve, the expiry sweep) must get in while we do slow work
+        reader = threading.Thread(target=lambda: answered.append(registry.snapshot()['seq']))
+        reader.start()
+        reader.join(timeout=2)
+
+    registry = DeviceRegistry(on_event)
+    registry.upsert(PEER, '10.0.0.2', 3001, {})
+    assert answered == [1]
+
+
+def test_events_from_inside_a_callback_keep_their_order():
+    events = []
+
+    def on_event(action, device):
+        events.append((action, device['seq']))
+        if action == 'found':
+            registry.remove(device['name'])
+            # Queued, not delivered in the middle of this callback
+            assert events[-1] == ('found', 1)
+
+    registry = DeviceRegistry(on_event)
+    registry.upsert(PEER, '10.0.0.2', 3001, {})
+    assert events == [('found', 1), ('lost', 2)]
+
+
+def test_expired_devices_are_reported():
+    lost = threading.Event()
+    registry = DeviceRegistry(lambda action, device: action == 'lost' and lost.set(), ttl=0.05)
+    registry.start()
+    try:
+        registry.upsert(PEER, '10.0.0.2', 3001, {})
+        assert lost.wait(2)
+        assert registry.snapshot()['devices'] == []
+    finally:
+        registry.stop()
@@ -0,0 +1,31 @@
+"""DownloadScheduler recovery of items left active by other processes"""
+import subprocess
+import sys
+
+from download_queue import DownloadScheduler
+from model_manager import ModelManager
+
+
+def test_start_requeues_only_items_whose_owner_is_gone(tmp_path):
+    manager = ModelManager(cache_dir=str(tmp_path))
+    store = manager.store
+    gone = subprocess.Popen([sys.executable, '-c', 'pass'])
+    gone.wait()
+    alive = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    try:
+        for model_id, owner in (('org/orphaned', gone.pid), ('org/owned', alive.pid)):
+            store.queue_put(model_id)
+            store.queue_update(model_id, status='active', owner_pid=owner)
+
+        scheduler = DownloadScheduler(manager)
+        scheduler.paused = True  # Recover without dispatching anything
+        scheduler.start()
+        scheduler.stop()
+
+        assert store.queue_get('org/orphaned')['status'] == 'queued'
+        assert store.queue_get('org/owned')['status'] == 'active'
+        # Checking the owner must leave it running
+        assert alive.poll() is None
+    finally:
+        alive.kill()
+        alive.wait()
@@ -0,0 +1,67 @@
+"""LogRelay framing, thinning and backpressure"""
+import io
+import json
+import os
+import threading
+import time
+
+import log_relay
+from bridge_events import EventStream
+from log_relay import LogRelay
+
+
+def _events(out: io.StringIO):
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_multibyte_characters_split_across_reads_survive():
+    read_fd, write_fd = os.pipe()
+    out = io.StringIO()
+    relay = LogRelay(os.fdopen(read_fd, 'rb', buffering=0), events=EventStream(out)).start()
+    encoded = 'Modell geladen: größe 4 GB ✓\n'.encode('utf-8')
+    split = encoded.index('ö'.encode('utf-8')) + 1  # Between the two bytes of ö
+    os.write(write_fd, encoded[:split])
+    time.sleep(0.2)  # Let the reader pick up the first half on its own
+    os.write(write_fd, encoded[split:])
+    os.close(write_fd)
+    relay.join(timeout=5)
+    relay.events.close()
+
+    lines = [line for e in _events(out) if e['type'] == 'log' for line in e['data']['lines']]
+    assert lines == ['Modell geladen: größe 4 GB ✓']
+
+
+def test_thinning_keeps_only_parsed_and_important_lines():
+    relay = LogRelay(io.BytesIO(), events=EventStream(io.StringIO()))
+    lines = [
+        'Downloading model.safetensors:  45%|####5     | 1.2G/2.6G [00:10<00:12, 118MB/s]',
+        'Loading checkpoint shards:  50%|#####     | 1/2',
+        'processed batch 7',
+        'ERROR: CUDA out of memory',
+    ]
+    text = '\n'.join(lines) + '\n'
+    parsed = {line for line, _ in relay._parse(text)}
+    assert relay._thin(lines, drop_all=True, parsed=parsed) == [
+        'Loading checkpoint shards:  50%|#####     | 1/2',
+        'ERROR: CUDA out of memory',
+    ]
+    assert relay.dropped == 2
+
+
+def test_reader_discards_output_once_the_writer_is_too_far_behind(monkeypatch):
+    monkeypatch.setattr(log_relay, 'MAX_PENDING_BYTES', 64 * 1024)
+    read_fd, write_fd = os.pipe()
+    relay = LogRelay(os.fdopen(read_fd, 'rb', buffering=0), events=EventStream(io.StringIO()))
+    # Only the reader runs, like a writer stuck on a blocked stdout
+    reader = threading.Thread(target=relay._read, daemon=True)
+    reader.start()
+    line = b'x' * 1023 + b'\n'
+    for _ in range(1024):
+        os.write(write_fd, line)
+    os.close(write_fd)
+    reader.join(timeout=5)
+
+    assert not reader.is_alive()
+    assert relay._pending_bytes <= 64 * 1024
+    assert relay.dropped_bytes > 0
+    assert relay._pending_bytes + relay.dropped_bytes >= 1024 * 1024
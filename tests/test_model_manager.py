@@ -0,0 +1,159 @@
+"""ModelManager downloads and cache bookkeeping against the stand-in Hub"""
+import hashlib
+import json
+import os
+
+import pytest
+
+from model_manager import ModelManager
+
+SHARD_1 = 'model-00001-of-00002.safetensors'
+SHARD_2 = 'model-00002-of-00002.safetensors'
+
+
+@pytest.fixture
+def sharded(hub):
+    """A four-layer checkpoint split into two shards by a shard index"""
+    weight_map = {'model.embed_tokens.weight': SHARD_1, 'lm_head.weight': SHARD_2, 'model.norm.weight': SHARD_2}
+    for layer in range(4):
+        weight_map[f'model.layers.{layer}.mlp.weight'] = SHARD_1 if layer < 2 else SHARD_2
+    files = {
+        'config.json': b'{"num_hidden_layers": 4}',
+        'model.safetensors.index.json': json.dumps({'weight_map': weight_map}).encode(),
+        SHARD_1: os.urandom(100_000),
+        SHARD_2: os.urandom(120_000),
+    }
+    hub.add_model('org/sharded', files, lfs=[SHARD_1, SHARD_2])
+    return files
+
+
+def _model(manager: ModelManager, model_id: str):
+    return next(m for m in manager.get_local_models() if m['id'] == model_id)
+
+
+def test_layer_slice_is_recorded_as_partial(sharded, tmp_path):
+    manager = ModelManager(cache_dir=str(tmp_path))
+    assert manager.download_model('org/sharded', layer_range=(0, 2))
+
+    model = _model(manager, 'org/sharded')
+    assert model['partial'] and model['layer_range'] == [0, 2]
+    assert {f['filename'] for f in manager.store.get_files('org/sharded')} == {
+        'config.json', 'model.safetensors.index.json', SHARD_1}
+    report = manager.verify_model('org/sharded')
+    assert report['ok'] and report['partial']
+    assert not manager.verify_model_integrity('org/sharded')
+
+    # A full download afterwards completes it
+    assert manager.download_model('org/sharded')
+    assert not _model(manager, 'org/sharded')['partial']
+    assert manager.verify_model_integrity('org/sharded')
+
+
+def test_layer_slice_keeps_a_full_checkpoint_intact(sharded, tmp_path):
+    manager = ModelManager(cache_dir=str(tmp_path))
+    model_dir = manager.download_model('org/sharded')
+    assert model_dir
+
+    assert manager.download_model('org/sharded', layer_range=(0, 2)) == model_dir
+    assert not _model(manager, 'org/sharded')['partial']
+    assert len(manager.store.get_files('org/sharded')) == len(sharded)
+    assert json.loads(manager.store.get_model('org/sharded')['plan'])['layer_range'] is None
+    for name, content in sharded.items():
+        assert (tmp_path / 'org_sharded' / name).read_bytes() == content
+    assert manager.verify_model_integrity('org/sharded', deep=True)
+
+
+def test_failed_download_reports_failure_and_resumes(sharded, hub, tmp_path):
+    manager = ModelManager(cache_dir=str(tmp_path))
+    hub.broken.add(SHARD_2)
+    assert manager.download_model('org/sharded') is None
+    assert 'org/sharded' not in manager.store
+
+    hub.broken.clear()
+    hub.requests.clear()
+    assert manager.download_model('org/sharded')
+    # Only the file that failed is fetched again
+    assert hub.served(SHARD_2) and not hub.served(SHARD_1)
+    assert manager.verify_model_integrity('org/sharded', deep=True)
+
+
+def test_freeing_keeps_a_blob_another_model_started_using(sharded, hub, tmp_path):
+    manager = ModelManager(cache_dir=str(tmp_path))
+    assert manager.download_model('org/sharded')
+    key = hashlib.sha256(sharded[SHARD_1]).hexdigest()
+    # Deleting the only user makes the blob a candidate for freeing...
+    assert key in manager.store.delete_model('org/sharded')
+
+    # ...but another download links and records it before the blob is actually removed
+    hub.add_model('org/copy', {SHARD_1: sharded[SHARD_1]}, lfs=[SHARD_1])
+    assert manager.download_model('org/copy')
+    manager._free_blobs([key])
+    assert manager.blobs.has(key)
+    assert manager.verify_model_integrity('org/copy', deep=True)
+
+
+def test_download_never_records_a_blob_freed_under_it(sharded, tmp_path, monkeypatch):
+    manager = ModelManager(cache_dir=str(tmp_path))
+    key = hashlib.sha256(sharded[SHARD_1]).hexdigest()
+    fetch = manager._fetch_blobs
+
+    def fetch_then_lose_one(*args, **kwargs):
+        tasks = fetch(*args, **kwargs)
+        manager.blobs.remove(key)  # What another process's free would do
+        return tasks
+    monkeypatch.setattr(manager, '_fetch_blobs', fetch_then_lose_one)
+
+    assert manager.download_model('org/sharded') is None
+    assert 'org/sharded' not in manager.store
+    monkeypatch.undo()
+    assert manager.download_model('org/sharded')
+    assert manager.verify_model_integrity('org/sharded', deep=True)
+
+
+def test_cached_size_notices_changes_inside_subdirectories(tmp_path, monkeypatch):
+    manager = ModelManager(cache_dir=str(tmp_path))
+    model_dir = tmp_path / 'org_nested'
+    (model_dir / 'onnx').mkdir(parents=True)
+    (model_dir / 'onnx' / 'model.onnx').write_bytes(b'x' * 100)
+    manager.store.save_model('org/nested', str(model_dir), 'rev', None, [])
+    assert manager._refresh_model_size(manager.store.get_model('org/nested')) == 100
+
+    # Unchanged: served from the cache without walking the tree
+    measure = manager._measure_dir
+    monkeypatch.setattr(manager, '_measure_dir', lambda path: pytest.fail("re-measured an unchanged model"))
+    assert manager._refresh_model_size(manager.store.get_model('org/nested')) == 100
+
+    # A new file in onnx/ leaves the top-level mtime alone
+    top_mtime = model_dir.stat().st_mtime
+    (model_dir / 'onnx' / 'model.onnx_data').write_bytes(b'x' * 50)
+    assert model_dir.stat().st_mtime == top_mtime
+    monkeypatch.setattr(manager, '_measure_dir', measure)
+    assert manager._refresh_model_size(manager.store.get_model('org/nested')) == 150
+
+
+def _record(manager: ModelManager, model_id: str, blobs, last_used: float):
+    """Record a model whose files are the given (blob_key, size) pairs, without downloading anything"""
+    files = [{'filename': f'f{i}', 'path': f'/nonexistent/{model_id}/f{i}', 'size': size, 'blob_key': key}
+             for i, (key, size) in enumerate(blobs)]
+    manager.store.save_model(model_id, f'/nonexistent/{model_id}', 'rev', None, files)
+    manager.store.touch_model(model_id, when=last_used)
+
+
+@pytest.mark.parametrize('policy', ['lru', 'weighted'])
+def test_eviction_counts_shared_blobs_once_their_last_user_goes(tmp_path, policy):
+    manager = ModelManager(cache_dir=str(tmp_path), cache_budget_bytes=1)
+    shared = ('s' * 64, 1000)
+    _record(manager, 'org/a', [shared, ('a' * 64, 10)], last_used=100)
+    _record(manager, 'org/b', [shared, ('b' * 64, 20)], last_used=200)
+    _record(manager, 'org/pinned', [('c' * 64, 5)], last_used=50)
+    manager.pin_model('org/pinned')
+
+    plan = manager.plan_eviction(policy=policy)
+    freed = {entry['model_id']: entry['freed_bytes'] for entry in plan['evict']}
+    assert sorted(freed) == ['org/a', 'org/b']
+    # Whichever goes second takes the shared blob with it
+    first, second = (entry['model_id'] for entry in plan['evict'])
+    assert freed[first] == {'org/a': 10, 'org/b': 20}[first]
+    assert freed[second] == {'org/a': 10, 'org/b': 20}[second] + 1000
+    assert plan['freed_bytes'] == 1030
+    assert plan['sufficient'] is False  # The pinned model's 5 bytes still exceed a 1-byte budget
@@ -0,0 +1,42 @@
+"""Requests without an id run side by side and can't be cancelled by anyone else's id"""
+import threading
+
+import pytest
+
+from model_manager import ModelManager
+from model_service import ModelService
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = ModelService(ModelManager(cache_dir=str(tmp_path)))
+    service.sent = []
+    service.send = lambda message, key=None: service.sent.append(message)
+    yield service
+    service.cancel_all()
+    service.pool.shutdown(wait=True)
+
+
+def test_notifications_are_never_duplicates(service):
+    gate = threading.Event()
+    started, finished = [], []
+
+    def block(key, params):
+        started.append(key)
+        gate.wait(5)
+        finished.append(service.cancel_events[key].is_set())
+    service.methods['block'] = block
+
+    service.handle({'jsonrpc': '2.0', 'method': 'block'})
+    service.handle({'jsonrpc': '2.0', 'method': 'block'})
+    service.handle({'jsonrpc': '2.0', 'id': 7, 'method': 'block'})
+    # Cancelling "no id" must not reach either notification
+    service.handle({'jsonrpc': '2.0', 'id': 8, 'method': 'cancel', 'params': {'id': None}})
+    gate.set()
+    service.pool.shutdown(wait=True)
+
+    assert len(started) == 3 and finished == [False, False, False]
+    # Only the request with an id is answered
+    assert {'jsonrpc': '2.0', 'id': 8, 'result': False} in service.sent
+    assert {'jsonrpc': '2.0', 'id': 7, 'result': None} in service.sent
+    assert len(service.sent) == 2
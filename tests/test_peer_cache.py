@@ -0,0 +1,46 @@
+"""Warm start only confirms a remembered peer when the device at its address is still that peer"""
+import socket
+
+import pytest
+
+from peer_cache import probe_peers
+from peer_probe import ProbeResponder
+
+PEER = 'peer._spark._tcp.local.'
+
+
+@pytest.fixture
+def responder():
+    responder = ProbeResponder(PEER, port=0)
+    responder.start()
+    yield responder
+    responder.stop()
+
+
+def _entry(name: str, port: int, **device_info) -> dict:
+    return {'name': name, 'address': '127.0.0.1', 'port': port, 'device_info': device_info, 'last_seen': 0}
+
+
+def _settle(entries) -> dict:
+    results = {}
+    probe_peers(entries, lambda entry, ok: results.__setitem__(entry['name'], ok))
+    return results
+
+
+def test_remembered_peer_is_confirmed_by_its_greeting(responder):
+    assert _settle([_entry(PEER, 3001, probe_port=str(responder.port))]) == {PEER: True}
+
+
+def test_another_device_on_a_reused_address_is_not_the_peer(responder):
+    # The responder answers, but as a different device than the one remembered here
+    stale = 'gone._spark._tcp.local.'
+    assert _settle([_entry(stale, responder.port, probe_port=str(responder.port),
+                           blob_port=str(responder.port))]) == {stale: False}
+
+
+def test_an_open_port_alone_proves_nothing():
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+        assert _settle([_entry(PEER, port, blob_port=str(port))]) == {PEER: False}
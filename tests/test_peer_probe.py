@@ -0,0 +1,59 @@
+"""Path probing: peers must greet with the expected name, and our own addresses are never probed"""
+import socket
+
+import pytest
+
+import peer_probe
+from network_discovery import DeviceRegistry
+from peer_probe import PeerProber, ProbeResponder, measure_rtt
+
+PEER = 'peer._spark._tcp.local.'
+
+
+@pytest.fixture
+def responder():
+    responder = ProbeResponder(PEER, port=0)
+    responder.start()
+    yield responder
+    responder.stop()
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def test_measure_rtt_needs_the_expected_greeting(responder):
+    assert measure_rtt('127.0.0.1', responder.port, PEER) is not None
+    assert measure_rtt('127.0.0.1', responder.port, 'other._spark._tcp.local.') is None
+
+
+def test_refused_connection_is_a_failed_probe():
+    assert measure_rtt('127.0.0.1', _closed_port(), PEER) is None
+
+
+def _probe(name: str, port: int) -> DeviceRegistry:
+    """One probe round over a registry holding a single peer advertised on 127.0.0.1"""
+    registry = DeviceRegistry(lambda action, device: None)
+    registry.upsert(name, '127.0.0.1', 3001, {'probe_port': str(port)})
+    PeerProber(registry, throughput_every=0).probe_once()
+    return registry
+
+
+def test_prober_skips_addresses_local_to_this_machine(responder):
+    registry = _probe(PEER, responder.port)
+    # 127.0.0.1 would answer (with our own responder) but is never tried
+    assert registry.devices[PEER].paths == {}
+
+
+def test_prober_only_uses_paths_that_reach_the_peer(responder, monkeypatch):
+    monkeypatch.setattr(peer_probe, 'local_addresses', set)
+
+    impostor = _probe('impostor._spark._tcp.local.', responder.port).devices['impostor._spark._tcp.local.']
+    assert not impostor.paths['127.0.0.1'].usable
+    assert impostor.best_path is None
+
+    peer = _probe(PEER, responder.port).devices[PEER]
+    assert peer.paths['127.0.0.1'].usable
+    assert peer.best_path == '127.0.0.1'
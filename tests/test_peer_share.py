@@ -0,0 +1,83 @@
+"""Blob sharing between two nodes' stores over loopback"""
+import hashlib
+import os
+
+import requests
+
+from blob_store import BlobStore
+from model_manager import ModelManager
+from peer_share import TOKEN_HEADER, BlobServer, find_blobs_on_peers, peer_url, sharing_enabled
+
+TOKEN = 'cluster-secret'
+
+
+def _serve(store: BlobStore) -> BlobServer:
+    server = BlobServer(store, TOKEN, port=0, host='127.0.0.1')
+    server.start()
+    return server
+
+
+def _put(store: BlobStore, key: str, content: bytes):
+    store.path(key).write_bytes(content)
+
+
+def test_sharing_is_opt_in(monkeypatch):
+    assert not sharing_enabled()
+    monkeypatch.setenv('SPARK_CLUSTER_TOKEN', TOKEN)
+    assert not sharing_enabled()
+    monkeypatch.setenv('SPARK_SHARE_BLOBS', '1')
+    assert sharing_enabled()
+    monkeypatch.delenv('SPARK_CLUSTER_TOKEN')
+    assert not sharing_enabled()
+
+
+def test_requests_without_the_cluster_token_are_refused(tmp_path):
+    store = BlobStore(tmp_path / 'blobs')
+    content = b'weights' * 100
+    key = hashlib.sha256(content).hexdigest()
+    _put(store, key, content)
+    server = _serve(store)
+    try:
+        base = peer_url('127.0.0.1', server.port)
+        for path in (f'/blobs/{key}', '/probe?bytes=1024'):
+            assert requests.get(base + path, timeout=5).status_code == 403
+            assert requests.get(base + path, headers={TOKEN_HEADER: 'wrong'}, timeout=5).status_code == 403
+        response = requests.get(f'{base}/blobs/{key}', headers={TOKEN_HEADER: TOKEN}, timeout=5)
+        assert response.status_code == 200 and response.content == content
+
+        assert find_blobs_on_peers([base], {key: len(content)}, 'wrong') == {}
+        assert find_blobs_on_peers([base], {key: len(content)}, None) == {}
+        assert find_blobs_on_peers([base], {key: len(content)}, TOKEN) == {key: [f'{base}/blobs/{key}']}
+    finally:
+        server.stop()
+
+
+def test_download_fetches_from_peer_and_refetches_bad_blobs_from_hub(hub, tmp_path, monkeypatch):
+    monkeypatch.setenv('SPARK_CLUSTER_TOKEN', TOKEN)
+    good, bad = os.urandom(300_000), os.urandom(200_000)
+    files = {
+        'config.json': b'{"model_type": "tiny"}',
+        'model-00001-of-00002.safetensors': good,
+        'model-00002-of-00002.safetensors': bad,
+    }
+    hub.add_model('org/tiny', files, lfs=['model-00001-of-00002.safetensors', 'model-00002-of-00002.safetensors'])
+
+    # The peer holds the first shard intact and a corrupted copy of the second
+    peer = BlobStore(tmp_path / 'peer' / 'blobs')
+    _put(peer, hashlib.sha256(good).hexdigest(), good)
+    _put(peer, hashlib.sha256(bad).hexdigest(), bytes(len(bad)))
+    server = _serve(peer)
+    try:
+        manager = ModelManager(cache_dir=str(tmp_path / 'node'))
+        manager.set_peers([peer_url('127.0.0.1', server.port)])
+        model_dir = manager.download_model('org/tiny')
+    finally:
+        server.stop()
+
+    assert model_dir is not None
+    for name, content in files.items():
+        assert (tmp_path / 'node' / 'org_tiny' / name).read_bytes() == content
+    # Only the shard the peer got wrong (and the small non-LFS file) came from the Hub
+    assert not hub.served('model-00001-of-00002.safetensors')
+    assert hub.served('model-00002-of-00002.safetensors')
+    assert hub.served('config.json')
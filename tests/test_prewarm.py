@@ -0,0 +1,40 @@
+"""Prewarm keeps claiming memory a window at a time, whatever sizes reads come back in"""
+import io
+import os
+
+import prewarm
+
+
+class _Guard:
+    exhausted = False
+
+    def __init__(self):
+        self.windows = []
+
+    def allow(self, n: int) -> bool:
+        self.windows.append(n)
+        return True
+
+
+class _ShortReads(io.FileIO):
+    """A file whose reads stop 1 KB short, like one still growing or on a network filesystem"""
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer)
+        return super().readinto(view[:max(1, len(view) - 1024)])
+
+
+def test_memory_is_checked_every_window_despite_short_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr(prewarm, 'PREWARM_CHUNK_SIZE', 16 * 1024)
+    monkeypatch.setattr(prewarm, 'MEMORY_CHECK_INTERVAL', 64 * 1024)
+    monkeypatch.setattr(prewarm, 'open', lambda path, mode, buffering: _ShortReads(path, 'rb'), raising=False)
+    path = tmp_path / 'model.safetensors'
+    path.write_bytes(os.urandom(1024 * 1024))
+
+    guard = _Guard()
+    warmed = prewarm._warm_file(path, guard, lambda n: None, None)
+    assert warmed == 1024 * 1024
+    # Every byte read was claimed, a window at a time all the way to the end
+    assert sum(guard.windows) == 1024 * 1024
+    assert len(guard.windows) >= 1024 * 1024 // (64 * 1024 + 16 * 1024)
+    assert max(guard.windows) <= 64 * 1024 + 16 * 1024
@@ -0,0 +1,58 @@
+"""SchedulerSupervisor restart rules against stand-in scheduler processes"""
+import sys
+import threading
+import time
+
+import pytest
+
+import scheduler_supervisor
+from scheduler_supervisor import SchedulerSupervisor
+
+
+@pytest.fixture(autouse=True)
+def fast_checks(monkeypatch):
+    monkeypatch.setattr(scheduler_supervisor, 'HEALTH_INTERVAL', 0.05)
+    monkeypatch.setattr(scheduler_supervisor, 'INITIAL_BACKOFF', 0.05)
+    monkeypatch.setattr(scheduler_supervisor, 'emit', lambda event, **fields: None)
+
+
+def _supervise(code: str):
+    states = []
+    supervisor = SchedulerSupervisor([sys.executable, '-c', code], 'test-model', drain_timeout=2,
+                                     on_state=states.append)
+    supervisor._live = lambda: False
+    return supervisor, states
+
+
+def test_clean_exit_is_not_restarted():
+    supervisor, states = _supervise('pass')
+    assert supervisor.run() == 0
+    assert supervisor.restarts == 0
+    assert states == ['starting', 'stopped']
+
+
+def test_crash_is_restarted_until_stopped():
+    supervisor, states = _supervise('import sys; sys.exit(3)')
+    thread = threading.Thread(target=supervisor.run)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while supervisor.restarts < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    supervisor.stop()
+    thread.join(timeout=10)
+    assert supervisor.restarts >= 2
+    assert 'unhealthy' in states and states[-1] == 'stopped'
+
+
+def test_shutdown_stops_a_running_scheduler():
+    supervisor, states = _supervise('import time; time.sleep(60)')
+    thread = threading.Thread(target=supervisor.run)
+    thread.start()
+    while supervisor.process is None:
+        time.sleep(0.01)
+    supervisor.stop()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert supervisor.process.returncode is not None
+    assert supervisor.restarts == 0
+    assert states[-1] == 'stopped'
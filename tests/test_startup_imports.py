@@ -0,0 +1,17 @@
+"""Entry points start without the heavy packages; the timing budgets stay in startup_benchmark.py"""
+import subprocess
+import sys
+
+import pytest
+
+from startup_benchmark import BRIDGE_DIR, HEAVY_PACKAGES
+
+
+@pytest.mark.parametrize('module', ['bridge_daemon', 'model_service', 'network_discovery'])
+def test_entry_point_imports_no_heavy_packages(module):
+    # A fresh interpreter, so nothing another test imported counts
+    code = (f"import sys, {module}; "
+            f"print(' '.join(sorted({{name.split('.')[0] for name in sys.modules}} & set({HEAVY_PACKAGES!r}))))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=BRIDGE_DIR, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == []